@@ -0,0 +1,244 @@
+"""
+Run the bot in worker mode as several local processes sharing one SQLite store, against the fake Bot Connector,
+and check that broadcasts are split without duplicates and that installs/removals reach every worker.
+
+    python benchmarks/cluster_test.py --workers 3 --recipients 3000
+
+Steps:
+    send          POST /send to everyone; each recipient must be sent exactly once, spread over all workers
+    batch         POST /send/batch with two items for everyone; each recipient gets one merged message, once
+    stream        POST /send streamed as NDJSON; a result line per recipient, each sent once
+    background    POST /send as a background job; the job sends each recipient once and completes
+    digest        POST /send with a digest_window; each recipient's digest is sent once when the window ends
+    install       installationUpdate activities on the shared port; every worker must see the new recipients
+    remove        the bot removed from those conversations; every worker must drop them
+    failover      one worker stopped; the others take over its partition and /send still reaches everyone
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import teamsbot  # noqa: E402
+from fake_connector import FakeConnector, stub_bot_auth  # noqa: E402
+from synthetic import make_install_activity, make_recipients  # noqa: E402
+
+BOT_ID = "cluster-test-bot"
+
+
+def make_remove_activity(i: int, service_url: str, bot_id: str = BOT_ID):
+    """The conversationUpdate Teams sends when the bot is removed from the i-th installed channel"""
+    activity = make_install_activity(i, service_url=service_url, bot_id=bot_id)
+    activity.update(type="conversationUpdate", id=f"f:remove{i}", membersRemoved=[{"id": f"28:{bot_id}"}])
+    del activity["action"]
+    return activity
+
+
+async def worker_statuses(session, workers):
+    """/internal/status of every worker still answering"""
+    statuses = {}
+    for i in workers:
+        try:
+            async with session.get(f"http://{teamsbot.CLUSTER_INTERNAL_HOST}:"
+                                   f"{teamsbot.CLUSTER_INTERNAL_PORT + i}/internal/status") as response:
+                statuses[i] = await response.json()
+        except aiohttp.ClientError:
+            pass
+    return statuses
+
+
+async def wait_for(session, workers, predicate, timeout):
+    """Poll the workers until predicate(statuses) holds; returns (ok, seconds waited)"""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        statuses = await worker_statuses(session, workers)
+        if len(statuses) == len(workers) and predicate(statuses.values()):
+            return True, round(time.monotonic() - started, 2)
+        await asyncio.sleep(0.1)
+    return False, round(time.monotonic() - started, 2)
+
+
+async def broadcast(session, url, connector, expected):
+    before = connector.accepted
+    async with session.post(f"{url}/send", json={"message": "cluster test"}) as response:
+        result = await response.json()
+    return {
+        "sent_count": result.get("sent_count"),
+        "delivered": connector.accepted - before,
+        "partitions": result.get("partitions"),
+        "ok": result.get("sent_count") == expected and connector.accepted - before == expected
+              and len(result.get("partitions") or {}) > 1
+    }
+
+
+async def batch_broadcast(session, url, connector, expected):
+    before = connector.accepted
+    async with session.post(f"{url}/send/batch", json={
+        "items": [{"message": "cluster test"}, {"message": "cluster test again"}]
+    }) as response:
+        result = await response.json()
+    return {
+        "sent_count": result.get("sent_count"),
+        "merged_conversations": result.get("merged_conversations"),
+        "delivered": connector.accepted - before,
+        "partitions": result.get("partitions"),
+        "ok": result.get("sent_count") == expected and result.get("merged_conversations") == expected
+              and connector.accepted - before == expected and len(result.get("partitions") or {}) > 1
+    }
+
+
+async def stream_broadcast(session, url, connector, expected):
+    before = connector.accepted
+    events = {}
+    async with session.post(f"{url}/send", json={"message": "cluster test", "stream": "ndjson"}) as response:
+        async for line in response.content:
+            event = json.loads(line)
+            events.setdefault(event["event"], []).append(event)
+    sent = {event["conversation_id"] for event in events.get("result", []) if event["status"] == "sent"}
+    summary = (events.get("summary") or [{}])[-1]
+    return {
+        "results": len(events.get("result", [])),
+        "delivered": connector.accepted - before,
+        "partitions": summary.get("partitions"),
+        "ok": len(sent) == expected == len(events.get("result", [])) and connector.accepted - before == expected
+              and len(summary.get("partitions") or {}) > 1
+    }
+
+
+async def background_broadcast(session, url, connector, expected, timeout):
+    before = connector.accepted
+    async with session.post(f"{url}/send", json={"message": "cluster test", "background": True}) as response:
+        job_id = (await response.json())["job_id"]
+    started = time.monotonic()
+    job = {}
+    while time.monotonic() - started < timeout:
+        async with session.get(f"{url}/jobs/{job_id}") as response:
+            job = await response.json()
+        if job.get("status") in ("completed", "failed"):
+            break
+        await asyncio.sleep(0.1)
+    return {
+        "status": job.get("status"),
+        "sent": job.get("sent"),
+        "delivered": connector.accepted - before,
+        "ok": job.get("status") == "completed" and job.get("sent") == expected and connector.accepted - before == expected
+    }
+
+
+async def digest_broadcast(session, url, connector, expected, timeout):
+    before = connector.accepted
+    async with session.post(f"{url}/send", json={"message": "cluster test", "digest_window": 0.5}) as response:
+        await response.read()
+    started = time.monotonic()
+    while time.monotonic() - started < timeout and connector.accepted - before < expected:
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(0.5)  # Anything sent twice would arrive by now
+    return {"delivered": connector.accepted - before, "ok": connector.accepted - before == expected}
+
+
+async def main(args):
+    connector = FakeConnector(args.latency)
+    connector_runner = await connector.start(port=args.connector_port)
+    connector_url = f"http://127.0.0.1:{args.connector_port}/"
+
+    store = teamsbot.SqliteRecipientStore()
+    store.apply(make_recipients(args.recipients, service_url=connector_url, personal_every=10))
+    store.close()
+
+    processes = {
+        i: await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--worker-index", str(i), "--workers", str(args.workers),
+            "--bot-port", str(args.bot_port), "--rate", str(args.rate)
+        )
+        for i in range(args.workers)
+    }
+    live = list(processes)
+    url = f"http://127.0.0.1:{args.bot_port}"
+    results = {}
+    try:
+        # A new connection per request so the kernel spreads them over the workers' shared port
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(force_close=True)) as session:
+            ok, waited = await wait_for(session, live, lambda s: all(len(st["workers"]) == len(live) for st in s),
+                                        args.timeout)
+            results["join"] = {"ok": ok, "seconds": waited}
+
+            results["send"] = await broadcast(session, url, connector, args.recipients)
+            results["batch"] = await batch_broadcast(session, url, connector, args.recipients)
+            results["stream"] = await stream_broadcast(session, url, connector, args.recipients)
+            results["background"] = await background_broadcast(session, url, connector, args.recipients, args.timeout)
+            results["digest"] = await digest_broadcast(session, url, connector, args.recipients, args.timeout)
+
+            for i in range(args.installs):
+                activity = make_install_activity(i, service_url=connector_url, bot_id=BOT_ID)
+                async with session.post(f"{url}/api/messages", json=activity) as response:
+                    await response.read()
+            expected = args.recipients + args.installs
+            ok, waited = await wait_for(session, live, lambda s: all(st["recipients_count"] == expected for st in s),
+                                        args.timeout)
+            results["install"] = {"ok": ok, "seconds": waited, "expected_recipients": expected}
+
+            for i in range(args.installs):
+                async with session.post(f"{url}/api/messages", json=make_remove_activity(i, connector_url)) as response:
+                    await response.read()
+            ok, waited = await wait_for(
+                session, live, lambda s: all(st["recipients_count"] == args.recipients for st in s), args.timeout
+            )
+            results["remove"] = {"ok": ok, "seconds": waited, "expected_recipients": args.recipients}
+
+            stopped = live.pop()
+            processes[stopped].send_signal(signal.SIGTERM)
+            await processes[stopped].wait()
+            ok, waited = await wait_for(session, live, lambda s: all(len(st["workers"]) == len(live) for st in s),
+                                        args.timeout)
+            results["failover"] = {"ok": ok, "seconds": waited, **await broadcast(session, url, connector,
+                                                                                  args.recipients)}
+            results["failover"]["ok"] = ok and results["failover"]["ok"]
+    finally:
+        for process in processes.values():
+            if process.returncode is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes.values():
+            await process.wait()
+        await connector_runner.cleanup()
+    return results
+
+
+def run_test_worker(args):
+    """A worker process: fake auth, then teamsbot's own worker entrypoint"""
+    stub_bot_auth()
+    teamsbot.BOT_ID = BOT_ID
+    teamsbot.RATE_LIMIT_GLOBAL = teamsbot.RATE_LIMIT_PER_TENANT = args.rate  # Split between the workers
+    teamsbot.configure_logging("WARNING")
+    asyncio.run(teamsbot.run_worker(args.worker_index, args.workers, '127.0.0.1', args.bot_port))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process worker mode test against a fake Bot Connector")
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--recipients', type=int, default=3000)
+    parser.add_argument('--installs', type=int, default=50, help="Conversations installed and then removed")
+    parser.add_argument('--latency', type=float, default=0.005, help="Fake connector response latency (seconds)")
+    parser.add_argument('--rate', type=float, default=100000.0, help="Global/tenant send rate (msgs/sec)")
+    parser.add_argument('--timeout', type=float, default=15.0, help="Seconds to wait for workers to converge")
+    parser.add_argument('--connector-port', type=int, default=3979)
+    parser.add_argument('--bot-port', type=int, default=3980)
+    parser.add_argument('--worker-index', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_index is not None:
+        run_test_worker(args)
+        sys.exit(0)
+
+    # Workers inherit the working directory, so they all open this run's recipients.db
+    os.chdir(tempfile.mkdtemp(prefix="teamsbot-cluster-"))
+    results = asyncio.run(main(args))
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if all(step["ok"] for step in results.values()) else 1)
@@ -0,0 +1,148 @@
+"""
+Local stand-in for the Bot Connector REST API, used to exercise proactive sends without Teams.
+
+Point recipients' service_url at it (e.g. http://127.0.0.1:3979/) and call stub_bot_auth()
+in the bot process so no token is requested from (or validated against) Azure AD.
+
+    python benchmarks/fake_connector.py --port 3979 --max-rps 20 --retry-after 1 --error-rate 0.01 --gone-rate 0.05
+"""
+import argparse
+import asyncio
+import random
+import time
+import zlib
+from collections import deque
+from typing import Optional
+
+from aiohttp import web
+
+
+def stub_bot_auth():
+    """
+    Make the Bot Framework credentials return a fixed token instead of calling Azure AD, and accept
+    inbound /api/messages requests without a JWT as if the Bot Connector had sent them
+    """
+    from botframework.connector.auth import (
+        AuthenticationConstants,
+        ClaimsIdentity,
+        JwtTokenValidation,
+        MicrosoftAppCredentials
+    )
+
+    MicrosoftAppCredentials.get_access_token = lambda self, force_refresh=False: "fake-token"
+
+    async def authenticate_request(activity, auth_header, credentials, channel_service_or_provider="",
+                                   auth_configuration=None):
+        app_id = getattr(credentials, "app_id", None)
+        return ClaimsIdentity({
+            AuthenticationConstants.AUDIENCE_CLAIM: app_id,
+            AuthenticationConstants.APP_ID_CLAIM: app_id,
+            AuthenticationConstants.VERSION_CLAIM: "1.0"
+        }, True)
+
+    JwtTokenValidation.authenticate_request = staticmethod(authenticate_request)
+
+
+class FakeConnector:
+    """
+    Accepts activities like the Bot Connector and injects latency, throttling (429), failures (500)
+    and conversations the bot was removed from (403)
+    """
+
+    def __init__(self, latency: float = 0.0, throttle_rate: float = 0.0, max_rps: Optional[float] = None,
+                 retry_after: float = 1.0, error_rate: float = 0.0, gone_rate: float = 0.0):
+        self.latency = latency  # Seconds added to every response
+        self.throttle_rate = throttle_rate  # Fraction of requests answered with a random 429
+        self.max_rps = max_rps  # Accepted messages/sec before answering 429
+        self.retry_after = retry_after  # Retry-After header sent with 429s
+        self.error_rate = error_rate  # Fraction of requests answered with a 500
+        self.gone_rate = gone_rate  # Fraction of conversations always answered with a 403
+        self._accepted_at = deque()
+        self.last_activity = None
+        self.received = 0
+        self.accepted = 0
+        self.throttled = 0
+        self.failed = 0
+        self.gone = 0
+
+    def _over_limit(self) -> bool:
+        if not self.max_rps:
+            return False
+        now = time.monotonic()
+        while self._accepted_at and now - self._accepted_at[0] >= 1.0:
+            self._accepted_at.popleft()
+        return len(self._accepted_at) >= self.max_rps
+
+    async def activities_handler(self, request: web.Request) -> web.Response:
+        """POST /v3/conversations/{conversation_id}/activities[/{activity_id}]"""
+        self.received += 1
+        self.last_activity = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        # The same conversations are gone on every request
+        conversation_id = request.match_info['conversation_id']
+        if zlib.crc32(conversation_id.encode()) % 10000 < self.gone_rate * 10000:
+            self.gone += 1
+            return web.json_response(
+                {"error": {"code": "BotNotInConversationRoster",
+                           "message": "The bot is not part of the conversation roster."}},
+                status=403
+            )
+
+        if self._over_limit() or random.random() < self.throttle_rate:
+            self.throttled += 1
+            return web.json_response(
+                {"error": {"code": "Throttled", "message": "Too many requests"}},
+                status=429,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+
+        if random.random() < self.error_rate:
+            self.failed += 1
+            return web.json_response(
+                {"error": {"code": "ServiceError", "message": "Injected failure"}},
+                status=500
+            )
+
+        self.accepted += 1
+        self._accepted_at.append(time.monotonic())
+        return web.json_response({"id": f"activity-{self.accepted}"})
+
+    async def stats_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def stats(self):
+        return {"received": self.received, "accepted": self.accepted, "throttled": self.throttled,
+                "failed": self.failed, "gone": self.gone}
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/v3/conversations/{conversation_id}/activities', self.activities_handler)
+        app.router.add_post('/v3/conversations/{conversation_id}/activities/{activity_id}', self.activities_handler)
+        app.router.add_get('/stats', self.stats_handler)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 3979) -> web.AppRunner:
+        """Serve the fake connector in the running event loop"""
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Bot Connector")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3979)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--max-rps', type=float, default=None, help="Accepted messages/sec before answering 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument('--gone-rate', type=float, default=0.0, help="Fraction of conversations answered with 403")
+    args = parser.parse_args()
+
+    connector = FakeConnector(args.latency, args.throttle_rate, args.max_rps, args.retry_after, args.error_rate,
+                              args.gone_rate)
+    web.run_app(connector.create_app(), host=args.host, port=args.port)
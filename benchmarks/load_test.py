@@ -0,0 +1,228 @@
+"""
+Load-test scenarios that drive create_app() against the fake Bot Connector and report a throughput/latency table.
+
+    python benchmarks/load_test.py --sizes 10,1000,50000 --json > results.json
+    python benchmarks/load_test.py --sizes 10,1000 --baseline results.json  # exit 1 if throughput regressed
+
+Scenarios:
+    send_fanout      POST /send to every recipient (one row per --sizes entry); latency is per recipient
+    install_storm    concurrent installationUpdate activities on /api/messages
+    install_storm_queued       the same with ACTIVITY_PROCESSING = "queued" (latency is the time to the ack)
+    status / targets concurrent GETs against a populated registry
+    status_304 / targets_304   the same with If-None-Match, answered 304
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import teamsbot  # noqa: E402
+from fake_connector import FakeConnector, stub_bot_auth  # noqa: E402
+from synthetic import make_install_activity, make_recipients  # noqa: E402
+
+BOT_ID = "load-test-bot"
+
+
+def row(scenario, size, operations, errors, elapsed, latencies):
+    """One result table row; latencies are milliseconds"""
+    summary = teamsbot._latency_summary(latencies)
+    return {
+        "scenario": scenario,
+        "size": size,
+        "operations": operations,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "ops_per_s": round(operations / elapsed, 1) if elapsed else None,
+        "p50_ms": summary.get("p50"),
+        "p95_ms": summary.get("p95"),
+        "p99_ms": summary.get("p99")
+    }
+
+
+@asynccontextmanager
+async def serve_bot(args, recipient_count):
+    """Run the bot (create_app) on args.bot_port with recipient_count synthetic recipients on the fake connector"""
+    if os.path.exists(teamsbot.RECIPIENTS_FILE):
+        os.remove(teamsbot.RECIPIENTS_FILE)
+    if recipient_count:
+        with open(teamsbot.RECIPIENTS_FILE, 'w') as f:
+            json.dump(make_recipients(recipient_count, service_url=args.connector_url, personal_every=10), f)
+
+    app = teamsbot.create_app()
+    server = next(route.handler.__self__ for route in app.router.routes() if route.resource.canonical == '/send')
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.bot_port).start()
+    try:
+        await server.wait_ready()
+        server.delivery = teamsbot.DeliveryEngine(
+            max_concurrency=args.concurrency,
+            rate_limiter=teamsbot.AdaptiveRateLimiter(global_rate=args.rate, tenant_rate=args.rate),
+            health=server.health
+        )
+        yield server, f"http://127.0.0.1:{args.bot_port}"
+    finally:
+        await runner.cleanup()
+
+
+async def run_clients(clients, operations, request):
+    """Issue `operations` requests from `clients` concurrent workers; request(i) returns True on success"""
+    latencies = []
+    errors = 0
+    next_operation = iter(range(operations))
+
+    async def worker():
+        nonlocal errors
+        for i in next_operation:
+            started = time.perf_counter()
+            try:
+                ok = await request(i)
+            except aiohttp.ClientError:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def send_fanout(args, size):
+    async with serve_bot(args, size) as (server, url):
+        async with aiohttp.ClientSession() as session:
+            started = time.perf_counter()
+            async with session.post(f"{url}/send", json={"message": "load test"}) as response:
+                result = await response.json()
+            elapsed = time.perf_counter() - started
+
+    # Per-recipient latencies come from the /send response itself
+    latency = result["latency_ms"]
+    fanout = row("send_fanout", size, result["sent_count"], len(result["errors"]), elapsed, [])
+    fanout.update({"p50_ms": latency.get("p50"), "p95_ms": latency.get("p95"), "p99_ms": latency.get("p99")})
+    return fanout
+
+
+async def install_storm(args, processing="inline"):
+    teamsbot.ACTIVITY_PROCESSING = processing
+    async with serve_bot(args, 0) as (server, url):
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.clients)) as session:
+            async def install(i):
+                activity = make_install_activity(i, service_url=args.connector_url, bot_id=BOT_ID)
+                async with session.post(f"{url}/api/messages", json=activity) as response:
+                    return response.status < 300
+
+            latencies, errors, elapsed = await run_clients(args.clients, args.installs, install)
+    # Counted after shutdown, which lets queued activities finish
+    installed = len(server.bot.recipients)
+
+    # An install counts as failed if its request failed or it never reached the registry
+    scenario = "install_storm" if processing == "inline" else f"install_storm_{processing}"
+    return row(scenario, args.installs, installed, max(errors, args.installs - installed), elapsed, latencies)
+
+
+async def read_load(args):
+    rows = []
+    async with serve_bot(args, args.read_recipients) as (server, url):
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.clients)) as session:
+            for path in ("status", "targets"):
+                async with session.get(f"{url}/{path}") as response:
+                    etag = response.headers.get("ETag")
+
+                for scenario, headers, expected in ((path, {}, 200), (f"{path}_304", {"If-None-Match": etag}, 304)):
+                    async def get(i):
+                        async with session.get(f"{url}/{path}", headers=headers) as response:
+                            await response.read()
+                            return response.status == expected
+
+                    latencies, errors, elapsed = await run_clients(args.clients, args.reads, get)
+                    rows.append(row(scenario, args.read_recipients, args.reads, errors, elapsed, latencies))
+    return rows
+
+
+def regressions(rows, baseline_path, tolerance):
+    """Rows whose throughput fell more than `tolerance` below the baseline run's"""
+    with open(baseline_path) as f:
+        baseline = {(r["scenario"], r["size"]): r for r in json.load(f)["rows"]}
+    found = []
+    for current in rows:
+        previous = baseline.get((current["scenario"], current["size"]))
+        if previous and previous["ops_per_s"] and current["ops_per_s"] < previous["ops_per_s"] * (1 - tolerance):
+            found.append(f"{current['scenario']} (size {current['size']}): {current['ops_per_s']} ops/s, "
+                         f"baseline {previous['ops_per_s']}")
+    return found
+
+
+async def main(args):
+    stub_bot_auth()
+    teamsbot.BOT_ID = BOT_ID
+
+    connector = FakeConnector(args.latency, args.throttle_rate, None, args.retry_after, args.error_rate,
+                              args.gone_rate)
+    connector_runner = await connector.start(port=args.connector_port)
+    args.connector_url = f"http://127.0.0.1:{args.connector_port}/"
+
+    rows = []
+    try:
+        for size in args.sizes:
+            rows.append(await send_fanout(args, size))
+        if args.installs:
+            rows.append(await install_storm(args))
+            rows.append(await install_storm(args, "queued"))
+        if args.reads:
+            rows.extend(await read_load(args))
+    finally:
+        await connector_runner.cleanup()
+    return rows, connector.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the bot against a fake Bot Connector")
+    parser.add_argument('--sizes', default="10,1000,50000", help="Comma-separated /send fan-out sizes")
+    parser.add_argument('--installs', type=int, default=2000, help="installationUpdate activities (0 to skip)")
+    parser.add_argument('--reads', type=int, default=2000, help="GETs per read scenario (0 to skip)")
+    parser.add_argument('--read-recipients', type=int, default=10000, help="Registry size for the read scenarios")
+    parser.add_argument('--clients', type=int, default=50, help="Concurrent HTTP clients")
+    parser.add_argument('--concurrency', type=int, default=teamsbot.SEND_CONCURRENCY, help="Bot send concurrency")
+    parser.add_argument('--rate', type=float, default=100000.0, help="Bot global/tenant send rate (msgs/sec)")
+    parser.add_argument('--latency', type=float, default=0.01, help="Fake connector response latency (seconds)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of sends answered with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of sends answered with 429")
+    parser.add_argument('--gone-rate', type=float, default=0.0, help="Fraction of conversations answered with 403")
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--connector-port', type=int, default=3979)
+    parser.add_argument('--bot-port', type=int, default=3980)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    parser.add_argument('--baseline', help="Earlier --json output to compare throughput against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed throughput drop vs the baseline")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',') if size]
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # Keep the recipients file and job database out of the working directory
+    os.chdir(tempfile.mkdtemp(prefix="teamsbot-load-"))
+    rows, connector_stats = asyncio.run(main(args))
+
+    if args.json:
+        print(json.dumps({"rows": rows, "connector": connector_stats}, indent=2))
+    else:
+        columns = ("scenario", "size", "operations", "errors", "elapsed_s", "ops_per_s", "p50_ms", "p95_ms", "p99_ms")
+        print(f"{columns[0]:>20} " + " ".join(f"{column:>13}" for column in columns[1:]))
+        for result in rows:
+            print(f"{result['scenario']:>20} " + " ".join(f"{str(result[column]):>13}" for column in columns[1:]))
+        print(f"connector: {connector_stats}")
+
+    if baseline:
+        found = regressions(rows, baseline, args.tolerance)
+        for regression in found:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        sys.exit(1 if found else 0)
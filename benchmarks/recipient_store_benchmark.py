@@ -0,0 +1,109 @@
+"""
+Compare recipient store backends: bulk load, install, lookup and filtered-scan throughput.
+
+    python benchmarks/recipient_store_benchmark.py --recipients 100000
+    python benchmarks/recipient_store_benchmark.py --recipients 100000 --json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import teamsbot  # noqa: E402
+from synthetic import make_recipients, sample_ids  # noqa: E402
+
+
+def timed(results, backend, operation, ops, fn):
+    """Run fn() and record its throughput"""
+    started = time.perf_counter()
+    # Stores print a line per write; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    seconds = time.perf_counter() - started
+    results.append({
+        "backend": backend,
+        "operation": operation,
+        "ops": ops,
+        "seconds": round(seconds, 4),
+        "ops_per_sec": round(ops / seconds, 1) if seconds else None
+    })
+
+
+def bench_backend(results, backend, store, recipients, installs, lookups, scans):
+    timed(results, backend, "bulk_load", len(recipients), lambda: store.apply(recipients))
+
+    new_recipients = list(make_recipients(installs, start=len(recipients)).items())
+
+    def install():
+        for conversation_id, recipient_info in new_recipients:
+            store.put(conversation_id, recipient_info)
+
+    timed(results, backend, "install", installs, install)
+
+    lookup_ids = sample_ids(recipients, lookups)
+
+    def lookup():
+        for conversation_id in lookup_ids:
+            store.get(conversation_id)
+
+    timed(results, backend, "lookup", lookups, lookup)
+
+    sample = next(iter(recipients.values()))
+    filters = {
+        "tenant_id": {"tenant_id": sample["tenant_id"]},
+        "team_name": {"team_name": sample["team_name"]},
+        "channel_name": {"channel_name": sample["channel_name"]},
+        "tag": {"tag": sample["tags"][1]}
+    }
+    for name, criteria in filters.items():
+        def scan():
+            for _ in range(scans):
+                for _ in store.scan(**criteria):
+                    pass
+
+        timed(results, backend, f"scan_{name}", scans, scan)
+        results[-1]["matched"] = store.count(**criteria)
+
+    timed(results, backend, "count", scans, lambda: [store.count() for _ in range(scans)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recipient store benchmark")
+    parser.add_argument('--recipients', type=int, default=100000)
+    parser.add_argument('--installs', type=int, default=2000, help="Individually persisted installs (SQLite)")
+    parser.add_argument('--json-installs', type=int, default=10,
+                        help="Individually persisted installs (JSON rewrites the whole file for each)")
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--scans', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    recipients = make_recipients(args.recipients)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="teamsbot-store-") as directory:
+        json_store = teamsbot.JsonRecipientStore(os.path.join(directory, "recipients.json"))
+        bench_backend(results, "json", json_store, recipients, args.json_installs, args.lookups, args.scans)
+
+        sqlite_store = teamsbot.SqliteRecipientStore(os.path.join(directory, "recipients.db"))
+        bench_backend(results, "sqlite", sqlite_store, recipients, args.installs, args.lookups, args.scans)
+        sqlite_store.close()
+
+    if args.json:
+        print(json.dumps({"recipients": args.recipients, "results": results}, indent=2))
+        return
+
+    print(f"{args.recipients} recipients")
+    print(f"{'backend':<8} {'operation':<18} {'ops':>8} {'seconds':>10} {'ops/sec':>12} {'matched':>8}")
+    for row in results:
+        print(f"{row['backend']:<8} {row['operation']:<18} {row['ops']:>8} {row['seconds']:>10} "
+              f"{row['ops_per_sec'] or '-':>12} {row.get('matched', ''):>8}")
+
+
+if __name__ == "__main__":
+    main()
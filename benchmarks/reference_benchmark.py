@@ -0,0 +1,129 @@
+"""
+Per-send overhead of rebuilding ConversationReference objects versus the registry's prebuilt cache.
+
+    python benchmarks/reference_benchmark.py --sends 50000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import teamsbot  # noqa: E402
+from botbuilder.core import BotFrameworkAdapter, BotFrameworkAdapterSettings  # noqa: E402
+from botbuilder.schema import ChannelAccount, ConversationAccount, ConversationReference  # noqa: E402
+from fake_connector import stub_bot_auth  # noqa: E402
+from synthetic import make_recipients  # noqa: E402
+
+
+def rebuild_reference(recipient_info):
+    """How /send built a reference for every recipient before the cache"""
+    conv_ref_data = recipient_info.get('conversation_reference', {})
+    return ConversationReference(
+        activity_id=conv_ref_data.get('activity_id'),
+        bot=ChannelAccount(
+            id=conv_ref_data.get('bot', {}).get('id'),
+            name=conv_ref_data.get('bot', {}).get('name')
+        ) if conv_ref_data.get('bot') else None,
+        channel_id=conv_ref_data.get('channel_id'),
+        conversation=ConversationAccount(
+            conversation_type=conv_ref_data.get('conversation', {}).get('conversation_type'),
+            id=conv_ref_data.get('conversation', {}).get('id'),
+            is_group=conv_ref_data.get('conversation', {}).get('is_group'),
+            name=conv_ref_data.get('conversation', {}).get('name'),
+            tenant_id=conv_ref_data.get('conversation', {}).get('tenant_id')
+        ) if conv_ref_data.get('conversation') else None,
+        service_url=conv_ref_data.get('service_url'),
+        user=ChannelAccount(
+            id=conv_ref_data.get('user', {}).get('id'),
+            name=conv_ref_data.get('user', {}).get('name')
+        ) if conv_ref_data.get('user') else None
+    )
+
+
+async def noop(turn_context):
+    pass
+
+
+def before(recipients, message_text="hello"):
+    for conversation_id, recipient_info in recipients.items():
+        rebuild_reference(recipient_info)
+        # A new turn callback closure per recipient
+        (lambda turn_context: (turn_context, message_text))
+
+
+def after(registry, recipients, message_text="hello"):
+    callback = (lambda turn_context: (turn_context, message_text))
+    for conversation_id, recipient_info in recipients.items():
+        registry.reference(conversation_id, recipient_info)
+        callback
+
+
+def measure(fn, sends, repeat=3):
+    """Best-of-repeat microseconds per send"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / sends * 1e6, 3)
+
+
+async def adapter_overhead(adapter, references):
+    """continue_conversation with a no-op callback: the adapter cost a send pays besides HTTP"""
+    started = time.perf_counter()
+    for conversation_ref in references:
+        await adapter.continue_conversation(conversation_ref, noop, "benchmark-bot")
+    return (time.perf_counter() - started) / len(references) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ConversationReference cache micro-benchmark")
+    parser.add_argument('--sends', type=int, default=50000)
+    parser.add_argument('--adapter-sends', type=int, default=2000)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    recipients = make_recipients(args.sends, personal_every=10)
+    store = teamsbot.JsonRecipientStore(os.path.join(tempfile.mkdtemp(prefix="teamsbot-ref-"), "recipients.json"))
+    registry = teamsbot.RecipientRegistry(store)
+    # Fill the registry directly; put() would persist each recipient individually outside an event loop
+    for conversation_id, recipient_info in recipients.items():
+        registry._recipients[conversation_id] = recipient_info
+
+    # Warm the cache the way first use (or an install) does
+    after(registry, recipients)
+
+    results = {
+        "sends": args.sends,
+        "before": measure(lambda: before(recipients), args.sends),
+        "after": measure(lambda: after(registry, recipients), args.sends)
+    }
+    results["speedup"] = round(results["before"] / results["after"], 1)
+
+    stub_bot_auth()
+    adapter = BotFrameworkAdapter(BotFrameworkAdapterSettings("benchmark-bot", ""))
+    sample = dict(list(recipients.items())[:args.adapter_sends])
+    results["continue_conversation_us_per_send"] = round(asyncio.run(adapter_overhead(
+        adapter, [registry.reference(conversation_id) for conversation_id in sample]
+    )), 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.sends} sends")
+    print(f"{'':<8} {'us/send':>10}")
+    for name in ("before", "after"):
+        print(f"{name:<8} {results[name]:>10}")
+    print(f"reference preparation speedup: {results['speedup']}x")
+    print(f"adapter.continue_conversation overhead (no HTTP): {results['continue_conversation_us_per_send']} us/send")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Time a cold start: how long until /health answers and until /ready reports the recipients loaded, first from the
+store and then again from the recipient snapshot the first run wrote on shutdown.
+
+    python benchmarks/startup_benchmark.py --recipients 100000
+    python benchmarks/startup_benchmark.py --recipients 100000 --backend sqlite --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic import make_recipients  # noqa: E402
+
+
+async def wait_for(session, url, timeout):
+    """Poll url until it answers 200; returns its JSON body"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return await response.json()
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.005)
+    raise TimeoutError(f"{url} didn't answer within {timeout}s")
+
+
+async def start_once(args, run):
+    """Start a bot process, time /health and /ready, then stop it (which writes the snapshot)"""
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--serve", "--backend", args.backend, "--port", str(args.port)
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_for(session, f"{url}/health", args.timeout)
+            health_ms = (time.perf_counter() - started) * 1000
+            ready = await wait_for(session, f"{url}/ready", args.timeout)
+            ready_ms = (time.perf_counter() - started) * 1000
+    finally:
+        process.send_signal(signal.SIGINT)
+        await process.wait()
+    startup = ready["startup"]
+    return {
+        "run": run,
+        "recipients_source": startup.get("recipients_source"),
+        "health_ms": round(health_ms, 1),
+        "ready_ms": round(ready_ms, 1),
+        "phases_ms": startup["phases_ms"]
+    }
+
+
+def serve(args):
+    """The bot process: import teamsbot (timed as part of the start) and serve"""
+    import teamsbot
+    from aiohttp import web
+
+    teamsbot.configure_logging("WARNING")
+    teamsbot.RECIPIENTS_BACKEND = args.backend
+    teamsbot.RECIPIENTS_SNAPSHOT_FILE = "recipients.snapshot"
+    web.run_app(teamsbot.create_app(), host='127.0.0.1', port=args.port, print=None)
+
+
+async def main(args):
+    rows = [await start_once(args, "cold")]
+    if os.path.exists("recipients.snapshot"):
+        rows.append(await start_once(args, "snapshot"))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the bot's cold start with and without a recipient snapshot")
+    parser.add_argument('--recipients', type=int, default=100000)
+    parser.add_argument('--backend', choices=("json", "sqlite"), default="json")
+    parser.add_argument('--port', type=int, default=3981)
+    parser.add_argument('--timeout', type=float, default=120.0, help="Seconds to wait for each start")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        sys.exit(0)
+
+    # The bot reads recipients.json (migrated into recipients.db for sqlite) from its working directory
+    os.chdir(tempfile.mkdtemp(prefix="teamsbot-startup-"))
+    with open("recipients.json", 'w') as f:
+        json.dump(make_recipients(args.recipients, personal_every=10), f)
+    if args.backend == "sqlite":
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        import teamsbot
+        teamsbot.create_recipient_store("sqlite").close()
+
+    rows = asyncio.run(main(args))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"{'run':>10} {'source':>10} {'health_ms':>10} {'ready_ms':>10}  phases_ms")
+        for result in rows:
+            print(f"{result['run']:>10} {result['recipients_source']:>10} {result['health_ms']:>10} "
+                  f"{result['ready_ms']:>10}  {result['phases_ms']}")
@@ -0,0 +1,159 @@
+"""
+Synthetic recipients shaped like the ones NotificationBot._store_recipient writes.
+
+    python benchmarks/synthetic.py --count 50000 --service-url http://127.0.0.1:3979/ --output recipients.json
+"""
+import argparse
+import json
+import random
+from typing import Any, Dict
+
+DEFAULT_SERVICE_URL = "https://smba.trafficmanager.net/amer/"
+CHANNEL_NAMES = ["General", "Alerts", "Deployments", "Incidents", "Releases", "On Call", "Random", "Announcements"]
+
+
+def make_recipient(i: int, service_url: str = DEFAULT_SERVICE_URL, tenants: int = 4,
+                   channels_per_team: int = 4) -> Dict[str, Any]:
+    """Build the i-th synthetic channel recipient"""
+    team_index = i // channels_per_team
+    team_name = f"Team {team_index}"
+    channel_name = CHANNEL_NAMES[i % channels_per_team % len(CHANNEL_NAMES)]
+    conversation_id = f"19:synthetic{i}@thread.tacv2"
+    tenant_id = f"tenant-{team_index % tenants}"
+
+    return {
+        "conversation_id": conversation_id,
+        "conversation_type": "channel",
+        "conversation_name": None,
+        "service_url": service_url,
+        "channel_id": "msteams",
+        "tenant_id": tenant_id,
+        "team_id": f"19:team{team_index}@thread.tacv2",
+        "team_name": team_name,
+        "channel_name": channel_name,
+        "teams_channel_id": conversation_id,
+        "display_name": f"{team_name} > {channel_name}",
+        "tags": [
+            "channel",
+            f"team:{team_name.lower().replace(' ', '-')}",
+            f"channel:{channel_name.lower().replace(' ', '-')}"
+        ],
+        "conversation_reference": {
+            "activity_id": None,
+            "bot": {"id": "28:synthetic-bot", "name": "Notify"},
+            "channel_id": "msteams",
+            "conversation": {
+                "conversation_type": "channel",
+                "id": conversation_id,
+                "is_group": True,
+                "name": None,
+                "tenant_id": tenant_id
+            },
+            "service_url": service_url,
+            "user": {"id": "29:synthetic-user", "name": "Installer"}
+        },
+        "added_at": "2024-01-01T00:00:00"
+    }
+
+
+def make_personal_recipient(i: int, service_url: str = DEFAULT_SERVICE_URL,
+                            tenants: int = 4) -> Dict[str, Any]:
+    """Build the i-th synthetic personal-chat recipient (no team or channel)"""
+    conversation_id = f"a:synthetic-personal{i}"
+    user_name = f"User {i}"
+    tenant_id = f"tenant-{i % tenants}"
+
+    return {
+        "conversation_id": conversation_id,
+        "conversation_type": "personal",
+        "conversation_name": user_name,
+        "service_url": service_url,
+        "channel_id": "msteams",
+        "tenant_id": tenant_id,
+        "team_id": None,
+        "team_name": None,
+        "channel_name": None,
+        "teams_channel_id": None,
+        "display_name": f"Personal Chat ({user_name})",
+        "tags": ["personal", f"name:{user_name.lower().replace(' ', '-')}"],
+        "conversation_reference": {
+            "activity_id": None,
+            "bot": {"id": "28:synthetic-bot", "name": "Notify"},
+            "channel_id": "msteams",
+            "conversation": {
+                "conversation_type": "personal",
+                "id": conversation_id,
+                "is_group": False,
+                "name": user_name,
+                "tenant_id": tenant_id
+            },
+            "service_url": service_url,
+            "user": {"id": f"29:synthetic-user{i}", "name": user_name}
+        },
+        "added_at": "2024-01-01T00:00:00"
+    }
+
+
+def make_recipients(count: int, start: int = 0, personal_every: int = 0, **kwargs) -> Dict[str, Dict[str, Any]]:
+    """Build `count` synthetic recipients keyed by conversation ID (every Nth one a personal chat, if set)"""
+    recipients = {}
+    for i in range(start, start + count):
+        if personal_every and i % personal_every == 0:
+            recipient = make_personal_recipient(i, service_url=kwargs.get('service_url', DEFAULT_SERVICE_URL),
+                                                tenants=kwargs.get('tenants', 4))
+        else:
+            recipient = make_recipient(i, **kwargs)
+        recipients[recipient["conversation_id"]] = recipient
+    return recipients
+
+
+def sample_ids(recipients: Dict[str, Any], count: int, seed: int = 0):
+    """Random conversation IDs from a recipient map (with replacement)"""
+    ids = list(recipients)
+    rng = random.Random(seed)
+    return [rng.choice(ids) for _ in range(count)]
+
+
+def make_install_activity(i: int, service_url: str = DEFAULT_SERVICE_URL, bot_id: str = "synthetic-bot",
+                          tenants: int = 4, channels_per_team: int = 4) -> Dict[str, Any]:
+    """Build the installationUpdate activity Teams sends when the bot is added to the i-th synthetic channel"""
+    team_index = i // channels_per_team
+    conversation_id = f"19:installed{i}@thread.tacv2"
+
+    return {
+        "type": "installationUpdate",
+        "action": "add",
+        "id": f"f:install{i}",
+        "timestamp": "2024-01-01T00:00:00Z",
+        "serviceUrl": service_url,
+        "channelId": "msteams",
+        "from": {"id": f"29:synthetic-user{i}", "name": "Installer"},
+        "conversation": {
+            "id": conversation_id,
+            "conversationType": "channel",
+            "isGroup": True,
+            "tenantId": f"tenant-{team_index % tenants}"
+        },
+        "recipient": {"id": f"28:{bot_id}", "name": "Notify"},
+        "channelData": {
+            "team": {"id": f"19:team{team_index}@thread.tacv2", "name": f"Team {team_index}"},
+            "channel": {"id": conversation_id, "name": CHANNEL_NAMES[i % channels_per_team % len(CHANNEL_NAMES)]},
+            "tenant": {"id": f"tenant-{team_index % tenants}"}
+        }
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic recipients.json")
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--service-url', default=DEFAULT_SERVICE_URL, help="Point at a fake connector to send to it")
+    parser.add_argument('--tenants', type=int, default=4)
+    parser.add_argument('--personal-every', type=int, default=0, help="Make every Nth recipient a personal chat")
+    parser.add_argument('--output', default="recipients.json")
+    args = parser.parse_args()
+
+    recipients = make_recipients(args.count, personal_every=args.personal_every, service_url=args.service_url,
+                                 tenants=args.tenants)
+    with open(args.output, 'w') as f:
+        json.dump(recipients, f, indent=2)
+    print(f"Wrote {len(recipients)} recipients to {args.output}")
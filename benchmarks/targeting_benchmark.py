@@ -0,0 +1,130 @@
+"""
+Compare the inverted TargetingIndex with the original linear /send filter, and check they agree.
+
+    python benchmarks/targeting_benchmark.py --recipients 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import teamsbot  # noqa: E402
+from synthetic import make_recipients, sample_ids  # noqa: E402
+
+
+def linear_filter(recipients, target_conversation_ids, target_tags, target_teams, target_channels,
+                  exclude_conversation_ids):
+    """The original TeamsNotificationServer._filter_recipients (None team/channel names treated as '')"""
+    filtered = {}
+
+    for conversation_id, recipient_info in recipients.items():
+        if conversation_id in exclude_conversation_ids:
+            continue
+
+        if not any([target_conversation_ids, target_tags, target_teams, target_channels]):
+            filtered[conversation_id] = recipient_info
+            continue
+
+        if target_conversation_ids and conversation_id in target_conversation_ids:
+            filtered[conversation_id] = recipient_info
+            continue
+
+        if target_tags:
+            recipient_tags = recipient_info.get('tags', [])
+            if any(tag in recipient_tags for tag in target_tags):
+                filtered[conversation_id] = recipient_info
+                continue
+
+        if target_teams:
+            team_name = (recipient_info.get('team_name') or '').lower()
+            if any(team.lower() in team_name for team in target_teams):
+                filtered[conversation_id] = recipient_info
+                continue
+
+        if target_channels:
+            channel_name = (recipient_info.get('channel_name') or '').lower()
+            if any(channel.lower() in channel_name for channel in target_channels):
+                filtered[conversation_id] = recipient_info
+                continue
+
+    return filtered
+
+
+def queries(recipients):
+    """Targeting requests covering each criterion, combinations, short substrings and exclusions"""
+    ids = sample_ids(recipients, 50, seed=1)
+    return {
+        "all": ([], [], [], [], []),
+        "all_minus_excluded": ([], [], [], [], ids),
+        "conversation_ids": (ids, [], [], [], []),
+        "tag_team": ([], ["team:team-42"], [], [], []),
+        "tag_channel": ([], ["channel:alerts"], [], [], []),
+        "team_exact": ([], [], ["Team 1234"], [], []),
+        "team_substring": ([], [], ["am 12"], [], []),
+        "team_short_substring": ([], [], ["7"], [], []),
+        "channel_substring": ([], [], [], ["DEPLOY"], []),
+        "combined_or": (ids[:10], ["personal"], ["team 9"], ["incid"], ids[10:20]),
+        "no_match": ([], ["nope"], ["no such team"], ["zz"], []),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Targeting index benchmark")
+    parser.add_argument('--recipients', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    recipients = make_recipients(args.recipients, personal_every=10)
+
+    started = time.perf_counter()
+    index = teamsbot.TargetingIndex()
+    for conversation_id, recipient_info in recipients.items():
+        index.add(conversation_id, recipient_info)
+    build_seconds = time.perf_counter() - started
+
+    results = []
+    for name, criteria in queries(recipients).items():
+        expected = list(linear_filter(recipients, *criteria))
+        actual = index.match(*criteria)
+        if actual != expected:
+            raise SystemExit(f"Mismatch for {name}: index={len(actual)} linear={len(expected)}")
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            linear_filter(recipients, *criteria)
+        linear_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            index.match(*criteria)
+        index_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+        results.append({
+            "query": name,
+            "matched": len(expected),
+            "linear_ms": round(linear_ms, 3),
+            "index_ms": round(index_ms, 3),
+            "speedup": round(linear_ms / index_ms, 1) if index_ms else None
+        })
+
+    if args.json:
+        print(json.dumps({
+            "recipients": args.recipients,
+            "index_build_ms": round(build_seconds * 1000, 1),
+            "results": results
+        }, indent=2))
+        return
+
+    print(f"{args.recipients} recipients, index built in {build_seconds * 1000:.1f} ms, all results identical")
+    print(f"{'query':<22} {'matched':>8} {'linear ms':>10} {'index ms':>10} {'speedup':>8}")
+    for row in results:
+        print(f"{row['query']:<22} {row['matched']:>8} {row['linear_ms']:>10} {row['index_ms']:>10} "
+              f"{row['speedup']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Broadcast to synthetic recipients through a throttling fake connector and report sustained throughput.
+
+    python benchmarks/throttle_demo.py --recipients 300 --max-rps 40 --rate 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import teamsbot  # noqa: E402
+from fake_connector import FakeConnector, stub_bot_auth  # noqa: E402
+from synthetic import make_recipients  # noqa: E402
+
+
+def write_recipients(path: str, count: int, service_url: str):
+    """Write a recipients file whose conversations all live on the fake connector"""
+    with open(path, 'w') as f:
+        json.dump(make_recipients(count, service_url=service_url, tenants=2), f)
+
+
+async def main(args):
+    stub_bot_auth()
+    teamsbot.BOT_ID = "demo-bot"
+
+    connector = FakeConnector(args.latency, args.throttle_rate, args.max_rps, args.retry_after)
+    connector_runner = await connector.start(port=args.connector_port)
+    write_recipients(teamsbot.RECIPIENTS_FILE, args.recipients, f"http://127.0.0.1:{args.connector_port}/")
+
+    app = teamsbot.create_app()
+    server = next(route.handler.__self__ for route in app.router.routes() if route.resource.canonical == '/send')
+    bot_runner = web.AppRunner(app)
+    await bot_runner.setup()
+    await web.TCPSite(bot_runner, '127.0.0.1', args.bot_port).start()
+    await server.wait_ready()
+    server.delivery = teamsbot.DeliveryEngine(
+        rate_limiter=teamsbot.AdaptiveRateLimiter(global_rate=args.rate, tenant_rate=args.rate)
+    )
+
+    try:
+        started = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"http://127.0.0.1:{args.bot_port}/send", json={"message": "demo"}) as response:
+                result = await response.json()
+        elapsed = time.perf_counter() - started
+
+        print(json.dumps({
+            "recipients": args.recipients,
+            "sent_count": result["sent_count"],
+            "errors": len(result["errors"]),
+            "retries": result["retries"],
+            "throttled": result["throttled"],
+            "elapsed_s": round(elapsed, 2),
+            "messages_per_sec": round(result["sent_count"] / elapsed, 2),
+            "rate_limits": result["rate_limits"],
+            "connector": connector.stats()
+        }, indent=2))
+    finally:
+        await bot_runner.cleanup()
+        await connector_runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throttled broadcast against a fake connector")
+    parser.add_argument('--recipients', type=int, default=300)
+    parser.add_argument('--rate', type=float, default=100.0, help="Initial global/tenant send rate (msgs/sec)")
+    parser.add_argument('--max-rps', type=float, default=40.0, help="Connector limit before it answers 429")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of random 429s")
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--connector-port', type=int, default=3979)
+    parser.add_argument('--bot-port', type=int, default=3980)
+    args = parser.parse_args()
+
+    # Keep the recipients file and job database out of the working directory
+    os.chdir(tempfile.mkdtemp(prefix="teamsbot-demo-"))
+    asyncio.run(main(args))
@@ -1,66 +1,1369 @@
+from __future__ import annotations
+
+import time
+
+_IMPORT_STARTED = time.perf_counter()  # Start of the startup profile
+
 import os
+import re
+import sys
+import gc
+import copy
+import hashlib
+import ipaddress
+import heapq
+import inspect
+import math
 import json
+import marshal
+import base64
+import queue
+import atexit
+import logging
+import logging.handlers
+import string
 import asyncio
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+import uuid
+import random
+import signal
+import sqlite3
+import argparse
+import subprocess
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Iterable, Iterator, Tuple, Set
 
-from aiohttp import web
-from aiohttp.web import Request, Response, json_response
-from botbuilder.core import (
-    BotFrameworkAdapter,
-    BotFrameworkAdapterSettings,
-    TurnContext,
-    ActivityHandler,
-    MessageFactory
-)
-from botbuilder.schema import (
-    Activity,
-    ActivityTypes,
-    ChannelAccount,
-    ConversationAccount,
-    ConversationParameters,
-    ConversationReference
+from aiohttp import (
+    ClientConnectorError, ClientResponseError, ClientSession, ClientTimeout, TCPConnector, web
 )
+from aiohttp.web import Request, Response, json_response
+
+if TYPE_CHECKING:
+    # Imported on first use by _import_bot_framework(); botbuilder and its dependencies dominate import time
+    from botbuilder.core import (
+        BotFrameworkAdapter,
+        BotFrameworkAdapterSettings,
+        TurnContext,
+        ActivityHandler,
+        MessageFactory
+    )
+    from botbuilder.schema import (
+        Activity,
+        ActivityEventNames,
+        ActivityTypes,
+        ChannelAccount,
+        ConversationAccount,
+        ConversationParameters,
+        ConversationReference,
+        DeliveryModes
+    )
+    from botframework.connector.auth import JwtTokenValidation, MicrosoftAppCredentials
+    from jwt import InvalidTokenError
+
+_IMPORT_FINISHED = time.perf_counter()
 
 # Configuration - Replace with your actual Bot ID and App Password
 BOT_ID = ""  # From your manifest
 APP_PASSWORD = ""  # From Teams Developer Portal
 RECIPIENTS_FILE = "recipients.json"
+RECIPIENTS_BACKEND = "json"  # "json" (RECIPIENTS_FILE) or "sqlite" (RECIPIENTS_DB_FILE)
+RECIPIENTS_DB_FILE = "recipients.db"
+RECIPIENTS_SAVE_DELAY = 1.0  # Seconds to coalesce recipient changes into a single write
+RECIPIENT_CHANGES_KEPT = 100000  # SQLite change log rows kept for other workers to catch up from
+RECIPIENTS_SNAPSHOT_FILE = None  # Registry + targeting index written on shutdown, e.g. "recipients.snapshot" (None = off)
+
+# Proactive delivery tuning
+SEND_CONCURRENCY = 50  # Max proactive sends in flight across all broadcasts
+SEND_CONCURRENCY_PER_SERVICE_URL = 20  # Max proactive sends in flight per Bot Connector service_url
+
+# Rate limiting (messages/sec) - limits are halved on throttling and recover gradually on success
+RATE_LIMIT_GLOBAL = 50.0  # Across all conversations
+RATE_LIMIT_PER_TENANT = 25.0  # Per Azure AD tenant
+RATE_LIMIT_PER_CONVERSATION = 1.0  # Per conversation
+RATE_LIMIT_CONVERSATION_BURST = 7  # Messages a single conversation may receive back to back
+RATE_LIMIT_RECOVERY = 0.02  # Fraction of the configured rate restored after each successful send
+SEND_MAX_RETRIES = 5  # Retries for throttled (429) and transient failures
+SEND_BACKOFF_BASE = 0.5  # Seconds; doubled on every retry and jittered
+SEND_BACKOFF_MAX = 30.0  # Upper bound for a single backoff delay
+
+# Recipient health - conversations answering 403/404 (bot removed, chat deleted) are skipped, then quarantined
+HEALTH_CIRCUIT_FAILURES = 3  # Consecutive 403/404 failures before a recipient's sends are skipped
+HEALTH_PROBE_INTERVAL = 6 * 3600.0  # Seconds between trial sends to a recipient that is being skipped
+HEALTH_QUARANTINE_AFTER = 7 * 24 * 3600.0  # Seconds of 403/404 failures before a recipient is quarantined
+HEALTH_PRUNE_INTERVAL = 3600.0  # Seconds between background pruning passes
+
+# Bot Connector HTTP clients used for proactive sends
+CONNECTOR_TIMEOUT = 60.0  # Seconds for a single send request
+CONNECTOR_KEEPALIVE_TIMEOUT = 120.0  # Seconds an idle connection to a service_url is kept open
+CONNECTOR_TOKEN_REFRESH_MARGIN = 240.0  # Seconds before the app token expires that it's renewed in the background
+CONNECTOR_TOKEN_RETRY_DELAY = 10.0  # Seconds between attempts when a background token renewal fails
+
+# Background delivery jobs
+JOBS_DB_FILE = "jobs.db"
+JOB_WORKERS = 2  # Async workers draining the job queue
+JOB_CHUNK_SIZE = 500  # Recipients delivered between job progress checkpoints
+SCHEDULE_MIN_INTERVAL = 60.0  # Shortest recurrence interval (seconds) /send accepts
+SCHEDULE_JITTER = 0.0  # Default seconds a scheduled run may be delayed by at random, to spread load
+SCHEDULE_MAX_SLEEP = 300.0  # Longest the scheduler sleeps before re-reading the wall clock
+SCHEDULE_RETRY_DELAY = 30.0  # Seconds before a run that failed to fire or be recorded is tried again
+
+# Inbound /api/messages activities
+ACTIVITY_PROCESSING = "inline"  # "inline" (answer once handled) or "queued" (answer once authenticated)
+ACTIVITY_QUEUE_SIZE = 1000  # Queued activities before /api/messages waits for room
+ACTIVITY_WORKERS = 4  # Async workers handling queued activities
+ACTIVITY_DRAIN_TIMEOUT = 10.0  # Seconds shutdown waits for queued activities to be handled
+
+# Worker mode (python teamsbot.py --workers N): processes on one host share RECIPIENTS_DB_FILE and split broadcasts
+CLUSTER_INTERNAL_HOST = "127.0.0.1"  # Loopback address workers reach each other on (the internal app has no auth)
+CLUSTER_INTERNAL_PORT = 3990  # Worker i accepts broadcast partitions on CLUSTER_INTERNAL_PORT + i
+CLUSTER_SYNC_INTERVAL = 0.5  # Seconds between heartbeats and recipient change syncs
+CLUSTER_VIRTUAL_NODES = 64  # Points per worker on the consistent-hash ring
+CLUSTER_WORKER_TIMEOUT = 3.0  # Seconds without a heartbeat before a worker's partitions move to the others
+CLUSTER_FORWARD_CHUNK = 1000  # Recipients forwarded to another worker per request; results come back per chunk
+
+# Streaming /send responses
+STREAM_PROGRESS_INTERVAL = 1.0  # Seconds between progress events
+STREAM_BUFFER_SIZE = 1000  # Results buffered for a slow client before delivery waits for it
+STREAM_WRITE_TIMEOUT = 10.0  # Seconds a write may wait on a client that stopped reading before the stream is dropped
+LATENCY_SAMPLE_SIZE = 10000  # Latencies sampled for the summary when results aren't collected
+
+# Idempotent /send and duplicate suppression
+IDEMPOTENCY_CACHE_SIZE = 10000  # Idempotency keys remembered; the least recently used completed ones are evicted first
+IDEMPOTENCY_TTL = 24 * 3600  # Seconds a key's result is replayed for
+IDEMPOTENCY_DB_FILE = None  # e.g. "idempotency.db" to keep results across restarts
+DEDUP_WINDOW = 0.0  # Default seconds to skip conversations that already got identical content (0 = off)
+DEDUP_CACHE_SIZE = 100000  # (conversation, content) sends remembered for dedup windows
+BATCH_MAX_ITEMS = 100  # Notifications accepted by one /send/batch request
+DIGEST_WINDOW = 0.0  # Default seconds /send buffers a message to combine it with others for the conversation (0 = off)
+DIGEST_MAX_MESSAGES = 10  # Buffered messages that send a conversation's digest before its window ends
+DIGEST_MAX_BYTES = 16000  # Buffered text and card JSON that send a digest early (Teams rejects messages over ~28 KB)
+
+# /status and /targets pagination
+PAGE_SIZE = 100  # Items per page when a cursor but no limit is given (/status and /targets list everything without either)
+PAGE_SIZE_MAX = 1000  # Largest limit a client may request
+
+# Logging
+LOG_LEVEL = "INFO"  # DEBUG adds full activity dumps and a line per delivered message
+LOG_FORMAT = "json"  # "json" (one object per line) or "text"
+SEND_ERROR_LOG_LIMIT = 10  # Failed sends logged individually per broadcast; the rest are summarised
+
+# Metrics
+EVENT_LOOP_LAG_INTERVAL = 0.5  # Seconds between event loop lag probes
+
+logger = logging.getLogger("teamsbot")
+
+# Attributes every LogRecord has; anything else was passed via extra= and is logged as a field
+_LOG_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonLogFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects, including fields passed via extra=
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _LOG_RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _LogQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback on the calling thread (the formatter runs on the
+        # listener thread), but leave the extra= fields for the formatter to serialize
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT) -> logging.handlers.QueueListener:
+    """
+    Send the teamsbot logger through a queue to a background thread that formats and writes to stderr,
+    so logging never blocks the event loop on I/O
+    """
+    stream_handler = logging.StreamHandler()
+    if log_format == "json":
+        stream_handler.setFormatter(JsonLogFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(_LogQueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+    return listener
+
+
+def _label_value(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    labels = [f'{name}="{_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class MetricCounter(_Metric):
+    """
+    Monotonic counter, one series per label value combination
+    """
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, *label_values: Any, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, values)} {value}" for values, value in self._values.items()]
+
+
+class MetricGauge(_Metric):
+    """
+    Value that can go up and down, one series per label value combination
+    """
+
+    TYPE = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def set(self, value: float, *label_values: Any):
+        self._values[label_values] = value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, values)} {value}" for values, value in self._values.items()]
+
+
+class MetricHistogram(_Metric):
+    """
+    Histogram with fixed buckets; observing is a bisect and two additions, cumulative counts are
+    only computed when rendered
+    """
+
+    TYPE = "histogram"
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}  # Per-bucket counts (+Inf last), then sum
+
+    def observe(self, value: float, *label_values: Any):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
 
-class NotificationBot(ActivityHandler):
+    def _samples(self) -> List[str]:
+        samples = []
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                samples.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+            label_text = _format_labels(self.labels, values)
+            samples.append(f"{self.name}_sum{label_text} {series[-1]}")
+            samples.append(f"{self.name}_count{label_text} {cumulative}")
+        return samples
+
+
+class BotMetrics:
     """
-    Notification-only bot that stores recipient information and sends proactive messages
+    The bot's counters and histograms, rendered in the Prometheus text exposition format by /metrics
     """
 
     def __init__(self):
-        super().__init__()
-        self.recipients = self._load_recipients()
-        self._processed_installations = set()  # Track processed installations to avoid duplicates
+        self.inbound_seconds = MetricHistogram(
+            "teamsbot_inbound_activity_seconds", "Time to process an /api/messages activity",
+            ("activity_type", "outcome")
+        )
+        self.send_seconds = MetricHistogram(
+            "teamsbot_send_seconds", "Latency of a single proactive send attempt",
+            ("service_url", "outcome")
+        )
+        self.broadcast_seconds = MetricHistogram(
+            "teamsbot_broadcast_seconds", "Time to fan a broadcast (or job chunk) out to its recipients",
+            buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+        )
+        self.broadcast_recipients = MetricCounter(
+            "teamsbot_broadcast_recipients_total", "Recipients by broadcast stage (targeted, skipped, sent, failed)",
+            ("stage",)
+        )
+        self.connector_sessions = MetricCounter(
+            "teamsbot_connector_sessions_total", "Proactive sends by whether a pooled service_url session was reused",
+            ("result",)
+        )
+        self.token_refreshes = MetricCounter(
+            "teamsbot_token_refreshes_total", "App token fetches (background renewals, or inline when a send had to wait)",
+            ("trigger",)
+        )
+        self.activity_queue_depth = MetricGauge(
+            "teamsbot_activity_queue_depth", "Inbound activities waiting to be handled (queued processing)"
+        )
+        self.activity_queue_full = MetricCounter(
+            "teamsbot_activity_queue_full_total", "Inbound activities that had to wait for room in a full queue"
+        )
+        self.activity_queue_wait_seconds = MetricHistogram(
+            "teamsbot_activity_queue_wait_seconds", "Time a queued activity waited before a worker picked it up"
+        )
+        self.queued_activity_seconds = MetricHistogram(
+            "teamsbot_queued_activity_seconds", "Time to handle a queued activity after it was acknowledged",
+            ("activity_type", "outcome")
+        )
+        self.schedules_pending = MetricGauge(
+            "teamsbot_schedules_pending", "Scheduled and recurring broadcasts waiting for their next run"
+        )
+        self.scheduled_runs = MetricCounter(
+            "teamsbot_scheduled_runs_total", "Scheduled broadcast runs by result (queued as a job, or failed)",
+            ("result",)
+        )
+        self.digest_messages = MetricCounter(
+            "teamsbot_digest_messages_total", "Messages buffered for a conversation's digest (one per conversation)"
+        )
+        self.digest_flushes = MetricCounter(
+            "teamsbot_digest_flushes_total", "Digests sent by trigger (window, full, shutdown)", ("trigger",)
+        )
+        self.digest_calls_saved = MetricCounter(
+            "teamsbot_digest_calls_saved_total", "Bot Connector calls saved by combining buffered messages into digests"
+        )
+        self.digest_pending = MetricGauge(
+            "teamsbot_digest_pending_conversations", "Conversations with a digest waiting for its window to end"
+        )
+        self.recipients = MetricGauge("teamsbot_recipients", "Recipients in the registry")
+        self.quarantined_recipients = MetricGauge(
+            "teamsbot_quarantined_recipients", "Stored recipients quarantined after failing with 403/404"
+        )
+        self.recipients_quarantined = MetricCounter(
+            "teamsbot_recipients_quarantined_total", "Recipients quarantined, by a broadcast or the pruning pass",
+            ("trigger",)
+        )
+        self.event_loop_lag = MetricHistogram(
+            "teamsbot_event_loop_lag_seconds", "How late the event loop ran a scheduled probe",
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+        )
+        self.startup_seconds = MetricGauge(
+            "teamsbot_startup_seconds", "Time each startup phase took (see GET /ready)", ("phase",)
+        )
+
+    def render(self) -> str:
+        lines = []
+        for metric in vars(self).values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = BotMetrics()
+
+
+class StartupProfile:
+    """
+    Wall-clock time of each startup phase, from the first import to the bot being ready
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}  # Phase -> milliseconds, in the order they ran
+        self.details: Dict[str, Any] = {}
+        self.ready_ms: Optional[float] = None  # Since the first import
+        self.add("import", _IMPORT_FINISHED - _IMPORT_STARTED)
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = round(seconds * 1000, 1)
+        metrics.startup_seconds.set(round(seconds, 4), phase)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the body of a with block as a startup phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def ready(self):
+        self.ready_ms = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+        metrics.startup_seconds.set(round(self.ready_ms / 1000, 4), "total")
+
+    def summary(self) -> Dict[str, Any]:
+        return {"ready_ms": self.ready_ms, "phases_ms": dict(self.phases), **self.details}
+
+
+class RecipientStore:
+    """
+    Persistent recipient storage backend
+    """
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, conversation_id: str, recipient_info: Dict[str, Any]):
+        raise NotImplementedError
+
+    def delete(self, conversation_id: str) -> bool:
+        raise NotImplementedError
+
+    def scan(self, tenant_id: Optional[str] = None, team_name: Optional[str] = None,
+             channel_name: Optional[str] = None, tag: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate (conversation_id, recipient_info) pairs, optionally filtered by exact field values or a tag"""
+        raise NotImplementedError
+
+    def count(self, tenant_id: Optional[str] = None, team_name: Optional[str] = None,
+              channel_name: Optional[str] = None, tag: Optional[str] = None) -> int:
+        return sum(1 for _ in self.scan(tenant_id, team_name, channel_name, tag))
+
+    def apply(self, changes: Dict[str, Optional[Dict[str, Any]]]):
+        """Persist a batch of changes (None removes the recipient)"""
+        for conversation_id, recipient_info in changes.items():
+            if recipient_info is None:
+                self.delete(conversation_id)
+            else:
+                self.put(conversation_id, recipient_info)
 
-    def _load_recipients(self) -> Dict[str, Any]:
+    def last_change(self) -> int:
+        """Sequence number of the latest change (0 if the store doesn't track changes)"""
+        return 0
+
+    def changes_since(self, seq: int) -> Optional[Tuple[int, Dict[str, Optional[Dict[str, Any]]]]]:
+        """
+        Changes made by any process after seq: the latest sequence number and each changed recipient's
+        current info (None if removed), or None if seq is too old to catch up from
+        """
+        raise NotImplementedError
+
+    def snapshot_key(self) -> Optional[str]:
+        """
+        Identifies the stored data a registry snapshot is taken from; a snapshot is only restored if the key still
+        matches (None if the store doesn't support snapshots)
+        """
+        return None
+
+    def restore(self, recipients: Dict[str, Any]):
+        """Called with every stored recipient after a registry was restored from a matching snapshot"""
+
+    def close(self):
+        pass
+
+
+def _matches(recipient_info: Dict[str, Any], tenant_id: Optional[str], team_name: Optional[str],
+             channel_name: Optional[str], tag: Optional[str]) -> bool:
+    """Whether a recipient matches RecipientStore.scan filters"""
+    return ((tenant_id is None or recipient_info.get('tenant_id') == tenant_id)
+            and (team_name is None or recipient_info.get('team_name') == team_name)
+            and (channel_name is None or recipient_info.get('channel_name') == channel_name)
+            and (tag is None or tag in recipient_info.get('tags', [])))
+
+
+class JsonRecipientStore(RecipientStore):
+    """
+    Recipients in a single JSON file (RECIPIENTS_FILE), rewritten atomically on every persisted change
+    """
+
+    def __init__(self, path: str = RECIPIENTS_FILE):
+        self.path = path
+        self._loaded: Optional[Dict[str, Any]] = None  # Read on first use, unless restore() provides it
+
+    @property
+    def _recipients(self) -> Dict[str, Any]:
+        if self._loaded is None:
+            self._loaded = self._load()
+        return self._loaded
+
+    def _load(self) -> Dict[str, Any]:
         """Load recipients from file"""
         try:
-            if os.path.exists(RECIPIENTS_FILE):
-                with open(RECIPIENTS_FILE, 'r') as f:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
                     return json.load(f)
         except Exception as e:
-            print(f"Error loading recipients: {e}")
+            logger.error("Error loading recipients from %s: %s", self.path, e)
         return {}
 
-    def _save_recipients(self):
-        """Save recipients to file"""
+    def _write(self):
+        """Save recipients to file atomically (temp file + rename)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._recipients, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        logger.debug("Saved %d recipients to %s", len(self._recipients), self.path)
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self._recipients.get(conversation_id)
+
+    def put(self, conversation_id: str, recipient_info: Dict[str, Any]):
+        self._recipients[conversation_id] = recipient_info
+        self._write()
+
+    def delete(self, conversation_id: str) -> bool:
+        if self._recipients.pop(conversation_id, None) is None:
+            return False
+        self._write()
+        return True
+
+    def scan(self, tenant_id: Optional[str] = None, team_name: Optional[str] = None,
+             channel_name: Optional[str] = None, tag: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for conversation_id, recipient_info in list(self._recipients.items()):
+            if _matches(recipient_info, tenant_id, team_name, channel_name, tag):
+                yield conversation_id, recipient_info
+
+    def count(self, tenant_id: Optional[str] = None, team_name: Optional[str] = None,
+              channel_name: Optional[str] = None, tag: Optional[str] = None) -> int:
+        if tenant_id is None and team_name is None and channel_name is None and tag is None:
+            return len(self._recipients)
+        return super().count(tenant_id, team_name, channel_name, tag)
+
+    def apply(self, changes: Dict[str, Optional[Dict[str, Any]]]):
+        # The whole file is rewritten anyway, so write once for the batch
+        for conversation_id, recipient_info in changes.items():
+            if recipient_info is None:
+                self._recipients.pop(conversation_id, None)
+            else:
+                self._recipients[conversation_id] = recipient_info
+        self._write()
+
+    def snapshot_key(self) -> Optional[str]:
+        # Any write replaces the file, changing its modification time
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return f"json:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def restore(self, recipients: Dict[str, Any]):
+        # The snapshot holds exactly what the file does, so skip parsing it
+        self._loaded = recipients
+
+
+class SqliteRecipientStore(RecipientStore):
+    """
+    Recipients in SQLite (RECIPIENTS_DB_FILE) with per-row upserts/deletes and indexed filter columns
+    """
+
+    def __init__(self, path: str = RECIPIENTS_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        """Create the recipient tables and indexes if they don't exist"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS recipients (
+                    conversation_id TEXT PRIMARY KEY,
+                    tenant_id TEXT,
+                    team_name TEXT,
+                    channel_name TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS recipient_tags (
+                    tag TEXT NOT NULL,
+                    conversation_id TEXT NOT NULL,
+                    PRIMARY KEY (tag, conversation_id)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_recipients_tenant_id ON recipients (tenant_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_recipients_team_name ON recipients (team_name)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_recipients_channel_name ON recipients (channel_name)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_recipient_tags_conversation_id ON recipient_tags (conversation_id)"
+            )
+            # Change log so workers sharing the database can follow each other's writes
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS recipient_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL
+                )
+            """)
+            for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                self._conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS recipients_{event.lower()}_logged AFTER {event} ON recipients
+                    BEGIN
+                        INSERT INTO recipient_changes (conversation_id) VALUES ({row}.conversation_id);
+                    END
+                """)
+            # Random ID telling this database apart from a recreated one, whose change sequence starts over
+            self._conn.execute("CREATE TABLE IF NOT EXISTS store_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO store_info (key, value) VALUES ('id', ?)", (uuid.uuid4().hex,))
+
+    def _upsert(self, conversation_id: str, recipient_info: Dict[str, Any]):
+        self._conn.execute(
+            """
+            INSERT INTO recipients (conversation_id, tenant_id, team_name, channel_name, data)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (conversation_id) DO UPDATE SET
+                tenant_id = excluded.tenant_id,
+                team_name = excluded.team_name,
+                channel_name = excluded.channel_name,
+                data = excluded.data
+            """,
+            (conversation_id, recipient_info.get('tenant_id'), recipient_info.get('team_name'),
+             recipient_info.get('channel_name'), json.dumps(recipient_info))
+        )
+        self._conn.execute("DELETE FROM recipient_tags WHERE conversation_id = ?", (conversation_id,))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO recipient_tags (tag, conversation_id) VALUES (?, ?)",
+            ((tag, conversation_id) for tag in recipient_info.get('tags', []))
+        )
+
+    def _delete(self, conversation_id: str) -> bool:
+        self._conn.execute("DELETE FROM recipient_tags WHERE conversation_id = ?", (conversation_id,))
+        return self._conn.execute("DELETE FROM recipients WHERE conversation_id = ?", (conversation_id,)).rowcount > 0
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM recipients WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, conversation_id: str, recipient_info: Dict[str, Any]):
+        with self._lock, self._conn:
+            self._upsert(conversation_id, recipient_info)
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock, self._conn:
+            return self._delete(conversation_id)
+
+    def _where(self, tenant_id, team_name, channel_name, tag) -> Tuple[str, List[Any]]:
+        clauses = []
+        params = []
+        for column, value in (("tenant_id", tenant_id), ("team_name", team_name), ("channel_name", channel_name)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if tag is not None:
+            clauses.append("conversation_id IN (SELECT conversation_id FROM recipient_tags WHERE tag = ?)")
+            params.append(tag)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def scan(self, tenant_id: Optional[str] = None, team_name: Optional[str] = None,
+             channel_name: Optional[str] = None, tag: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        where, params = self._where(tenant_id, team_name, channel_name, tag)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT conversation_id, data FROM recipients{where}", params).fetchall()
+        for conversation_id, data in rows:
+            yield conversation_id, json.loads(data)
+
+    def count(self, tenant_id: Optional[str] = None, team_name: Optional[str] = None,
+              channel_name: Optional[str] = None, tag: Optional[str] = None) -> int:
+        where, params = self._where(tenant_id, team_name, channel_name, tag)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM recipients{where}", params).fetchone()[0]
+
+    def apply(self, changes: Dict[str, Optional[Dict[str, Any]]]):
+        # One transaction for the whole batch
+        with self._lock, self._conn:
+            for conversation_id, recipient_info in changes.items():
+                if recipient_info is None:
+                    self._delete(conversation_id)
+                else:
+                    self._upsert(conversation_id, recipient_info)
+            self._conn.execute(
+                "DELETE FROM recipient_changes WHERE seq <= (SELECT MAX(seq) FROM recipient_changes) - ?",
+                (RECIPIENT_CHANGES_KEPT,)
+            )
+
+    def last_change(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM recipient_changes").fetchone()[0]
+
+    def changes_since(self, seq: int) -> Optional[Tuple[int, Dict[str, Optional[Dict[str, Any]]]]]:
+        with self._lock:
+            oldest = self._conn.execute("SELECT MIN(seq) FROM recipient_changes").fetchone()[0]
+            if oldest is not None and oldest > seq + 1:
+                return None
+            rows = self._conn.execute(
+                """
+                SELECT c.seq, c.conversation_id, r.data
+                FROM recipient_changes c LEFT JOIN recipients r ON r.conversation_id = c.conversation_id
+                WHERE c.seq > ? ORDER BY c.seq
+                """,
+                (seq,)
+            ).fetchall()
+        changes = {}
+        for seq, conversation_id, data in rows:
+            if conversation_id not in changes:
+                changes[conversation_id] = json.loads(data) if data is not None else None
+        return seq, changes
+
+    def snapshot_key(self) -> Optional[str]:
+        # Snapshots are brought up to date from the change log, so only the database's identity has to match
+        with self._lock:
+            return "sqlite:" + self._conn.execute("SELECT value FROM store_info WHERE key = 'id'").fetchone()[0]
+
+    def import_json(self, path: str = RECIPIENTS_FILE) -> int:
+        """One-shot migration of an existing recipients.json; returns the number of recipients imported"""
+        with open(path, 'r') as f:
+            recipients = json.load(f)
+        self.apply(recipients)
+        return len(recipients)
+
+    def json_migrated(self) -> bool:
+        """Whether the recipients.json migration has been considered for this database"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM store_info WHERE key = 'json_migrated'").fetchone() is not None
+
+    def mark_json_migrated(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_info (key, value) VALUES ('json_migrated', ?)", (str(time.time()),)
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+def create_recipient_store(backend: str = RECIPIENTS_BACKEND) -> RecipientStore:
+    """
+    Create the configured recipient store, migrating recipients.json into a new SQLite store. The migration
+    is recorded in the database, so recipients removed later don't come back from the old file.
+    """
+    if backend == "json":
+        return JsonRecipientStore()
+    if backend == "sqlite":
+        store = SqliteRecipientStore()
+        if not store.json_migrated():
+            if store.count() == 0 and os.path.exists(RECIPIENTS_FILE):
+                imported = store.import_json(RECIPIENTS_FILE)
+                logger.info("Migrated %d recipients from %s to %s", imported, RECIPIENTS_FILE, RECIPIENTS_DB_FILE)
+            store.mark_json_migrated()
+        return store
+    raise ValueError(f"Unknown recipients backend: {backend}")
+
+
+class SubstringIndex:
+    """
+    Case-insensitive substring search over names (team/channel) using a trigram index
+    """
+
+    GRAM = 3
+
+    def __init__(self):
+        self._ids: Dict[str, Set[str]] = {}  # Lowercased name -> conversation IDs
+        self._grams: Dict[str, Set[str]] = {}  # Trigram -> lowercased names containing it
+
+    def _grams_of(self, name: str) -> Set[str]:
+        return {name[i:i + self.GRAM] for i in range(len(name) - self.GRAM + 1)}
+
+    def add(self, name: str, conversation_id: str):
+        ids = self._ids.get(name)
+        if ids is None:
+            ids = self._ids[name] = set()
+            for gram in self._grams_of(name):
+                self._grams.setdefault(gram, set()).add(name)
+        ids.add(conversation_id)
+
+    def remove(self, name: str, conversation_id: str):
+        ids = self._ids.get(name)
+        if ids is None:
+            return
+        ids.discard(conversation_id)
+        if not ids:
+            del self._ids[name]
+            for gram in self._grams_of(name):
+                names = self._grams[gram]
+                names.discard(name)
+                if not names:
+                    del self._grams[gram]
+
+    def search(self, query: str) -> Set[str]:
+        """Conversation IDs whose name contains query (case-insensitive)"""
+        query = query.lower()
+        if len(query) < self.GRAM:
+            # Too short for trigrams - check the distinct names instead
+            names = [name for name in self._ids if query in name]
+        else:
+            gram_names = [self._grams.get(gram) for gram in self._grams_of(query)]
+            if not all(gram_names):
+                return set()
+            # Intersect starting from the rarest trigram to keep the candidate set small
+            gram_names.sort(key=len)
+            candidates = set(gram_names[0])
+            for names_with_gram in gram_names[1:]:
+                candidates &= names_with_gram
+                if not candidates:
+                    return set()
+            names = [name for name in candidates if query in name]
+
+        matched = set()
+        for name in names:
+            matched |= self._ids[name]
+        return matched
+
+
+class TargetingIndex:
+    """
+    Inverted index over recipients answering /send targeting queries without scanning every recipient
+    """
+
+    def __init__(self):
+        self._order: Dict[str, int] = {}  # Conversation ID -> insertion sequence (keeps registry order)
+        self._sequence = 0
+        self._ordered: Optional[Tuple[List[str], List[int]]] = None  # Order as lists for paging, rebuilt lazily
+        # What each recipient was indexed under: tags, team, channel, tenant ID, conversation type
+        self._entries: Dict[str, Tuple[Tuple[str, ...], str, str, str, str]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        self._teams = SubstringIndex()
+        self._channels = SubstringIndex()
+        self._tenants: Dict[str, Set[str]] = {}
+        self._conversation_types: Dict[str, Set[str]] = {}
+        self._team_counts: Counter = Counter()  # Display-cased team name -> recipients
+        self._channel_counts: Counter = Counter()  # Display-cased channel name -> recipients
+        self._facets: Optional[Dict[str, Any]] = None  # Sorted facets, rebuilt lazily after a change
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The index as plain dicts, sets and tuples for a registry snapshot, without the lazily rebuilt caches"""
+        state = {name: value for name, value in vars(self).items() if name not in ("_ordered", "_facets")}
+        state.update(_teams=vars(self._teams), _channels=vars(self._channels),
+                     _team_counts=dict(self._team_counts), _channel_counts=dict(self._channel_counts))
+        return state
+
+    @classmethod
+    def from_snapshot(cls, state: Dict[str, Any]) -> 'TargetingIndex':
+        index = cls()
+        for name, value in state.items():
+            if name in ("_teams", "_channels"):
+                vars(getattr(index, name)).update(value)
+            elif name in ("_team_counts", "_channel_counts"):
+                setattr(index, name, Counter(value))
+            else:
+                setattr(index, name, value)
+        return index
+
+    def add(self, conversation_id: str, recipient_info: Dict[str, Any]):
+        """Index a new or updated recipient"""
+        if conversation_id in self._entries:
+            self._unindex(conversation_id)
+        else:
+            self._order[conversation_id] = self._sequence
+            self._sequence += 1
+            self._ordered = None
+
+        tags = tuple(recipient_info.get('tags', []))
+        team_name = recipient_info.get('team_name') or ''
+        channel_name = recipient_info.get('channel_name') or ''
+        tenant_id = recipient_info.get('tenant_id') or ''
+        conversation_type = recipient_info.get('conversation_type') or ''
+        self._entries[conversation_id] = (tags, team_name, channel_name, tenant_id, conversation_type)
+
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(conversation_id)
+        self._teams.add(team_name.lower(), conversation_id)
+        self._channels.add(channel_name.lower(), conversation_id)
+        self._tenants.setdefault(tenant_id, set()).add(conversation_id)
+        self._conversation_types.setdefault(conversation_type, set()).add(conversation_id)
+        if team_name:
+            self._team_counts[team_name] += 1
+        if channel_name:
+            self._channel_counts[channel_name] += 1
+        self._facets = None
+
+    def remove(self, conversation_id: str):
+        """Drop a recipient from the index"""
+        if conversation_id in self._entries:
+            self._unindex(conversation_id)
+            del self._entries[conversation_id]
+            del self._order[conversation_id]
+            self._ordered = None
+            self._facets = None
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, conversation_id: str):
+        ids = index[key]
+        ids.discard(conversation_id)
+        if not ids:
+            del index[key]
+
+    @staticmethod
+    def _decrement(counts: Counter, name: str):
+        if name:
+            counts[name] -= 1
+            if counts[name] <= 0:
+                del counts[name]
+
+    def _unindex(self, conversation_id: str):
+        tags, team_name, channel_name, tenant_id, conversation_type = self._entries[conversation_id]
+        for tag in tags:
+            self._discard(self._tags, tag, conversation_id)
+        self._teams.remove(team_name.lower(), conversation_id)
+        self._channels.remove(channel_name.lower(), conversation_id)
+        self._discard(self._tenants, tenant_id, conversation_id)
+        self._discard(self._conversation_types, conversation_type, conversation_id)
+        self._decrement(self._team_counts, team_name)
+        self._decrement(self._channel_counts, channel_name)
+
+    def match(self, conversation_ids: List[str], tags: List[str], teams: List[str], channels: List[str],
+              exclude_conversation_ids: List[str]) -> List[str]:
+        """
+        Conversation IDs matching ANY of the criteria (all recipients if none are given), minus exclusions.
+        Results are in registry order.
+        """
+        if not any([conversation_ids, tags, teams, channels]):
+            matched = set(self._order)
+        else:
+            matched = {conversation_id for conversation_id in conversation_ids if conversation_id in self._order}
+            for tag in tags:
+                matched |= self._tags.get(tag, set())
+            for team in teams:
+                matched |= self._teams.search(team)
+            for channel in channels:
+                matched |= self._channels.search(channel)
+
+        matched.difference_update(exclude_conversation_ids)
+        if len(matched) * 8 > len(self._order):
+            # Large result - walking the (insertion ordered) registry is cheaper than sorting
+            return [conversation_id for conversation_id in self._order if conversation_id in matched]
+        return sorted(matched, key=self._order.__getitem__)
+
+    def select(self, tag: Optional[str] = None, team: Optional[str] = None, channel: Optional[str] = None,
+               tenant_id: Optional[str] = None, conversation_type: Optional[str] = None) -> Optional[Set[str]]:
+        """
+        Conversation IDs matching ALL of the given filters (team/channel are case-insensitive substrings,
+        the rest exact), or None if no filter is given
+        """
+        selections = []
+        if tag is not None:
+            selections.append(self._tags.get(tag, set()))
+        if team is not None:
+            selections.append(self._teams.search(team))
+        if channel is not None:
+            selections.append(self._channels.search(channel))
+        if tenant_id is not None:
+            selections.append(self._tenants.get(tenant_id, set()))
+        if conversation_type is not None:
+            selections.append(self._conversation_types.get(conversation_type, set()))
+        if not selections:
+            return None
+
+        selections.sort(key=len)
+        selected = set(selections[0])
+        for ids in selections[1:]:
+            selected &= ids
+        return selected
+
+    def page(self, selected: Optional[Set[str]], after: int,
+             limit: Optional[int]) -> Tuple[List[str], Optional[int]]:
+        """
+        Up to limit conversation IDs (all recipients, or those in selected) positioned after the cursor
+        `after`, in registry order. Returns the page and the cursor for the next one (None on the last page).
+        Cursors are insertion sequences, so pages stay consistent while recipients are added or removed.
+        A limit of None returns every match.
+        """
+        if limit is None:
+            limit = len(self._order)
+        if self._ordered is None:
+            self._ordered = (list(self._order), list(self._order.values()))
+        ordered_ids, sequences = self._ordered
+
+        if selected is None:
+            start = bisect_right(sequences, after)
+            page = ordered_ids[start:start + limit]
+            more = start + limit < len(ordered_ids)
+        elif len(selected) * 8 > len(self._order):
+            page = []
+            more = False
+            for conversation_id in ordered_ids[bisect_right(sequences, after):]:
+                if conversation_id in selected:
+                    if len(page) == limit:
+                        more = True
+                        break
+                    page.append(conversation_id)
+        else:
+            remaining = sorted(
+                (conversation_id for conversation_id in selected if self._order[conversation_id] > after),
+                key=self._order.__getitem__
+            )
+            page = remaining[:limit]
+            more = len(remaining) > limit
+
+        return page, (self._order[page[-1]] if more else None)
+
+    def facets(self) -> Dict[str, Dict[str, int]]:
+        """Recipient counts per tag, team and channel, sorted by name"""
+        if self._facets is None:
+            self._facets = {
+                "tags": {tag: len(self._tags[tag]) for tag in sorted(self._tags)},
+                "teams": dict(sorted(self._team_counts.items())),
+                "channels": dict(sorted(self._channel_counts.items()))
+            }
+        return self._facets
+
+
+def _channel_account(data: Optional[Dict[str, Any]]) -> Optional[ChannelAccount]:
+    return ChannelAccount(id=data.get('id'), name=data.get('name')) if data else None
+
+
+def _build_conversation_reference(recipient_info: Dict[str, Any]) -> ConversationReference:
+    """Reconstruct the ConversationReference stored by NotificationBot._store_recipient"""
+    _import_bot_framework()
+    conv_ref_data = recipient_info.get('conversation_reference') or {}
+    conversation = conv_ref_data.get('conversation')
+
+    return ConversationReference(
+        activity_id=conv_ref_data.get('activity_id'),
+        bot=_channel_account(conv_ref_data.get('bot')),
+        channel_id=conv_ref_data.get('channel_id'),
+        conversation=ConversationAccount(
+            conversation_type=conversation.get('conversation_type'),
+            id=conversation.get('id'),
+            is_group=conversation.get('is_group'),
+            name=conversation.get('name'),
+            tenant_id=conversation.get('tenant_id')
+        ) if conversation else None,
+        service_url=conv_ref_data.get('service_url'),
+        user=_channel_account(conv_ref_data.get('user'))
+    )
+
+
+def _is_quarantined(recipient_info: Dict[str, Any]) -> bool:
+    return bool((recipient_info.get('health') or {}).get('quarantined_at'))
+
+
+class RecipientRegistry(Mapping):
+    """
+    Authoritative in-memory recipient registry with debounced write-behind to a RecipientStore.
+    Given a snapshot_path, it starts from the snapshot written by save_snapshot() when that still matches the store.
+    """
+
+    SNAPSHOT_FORMAT = 2  # Bump when the registry or TargetingIndex attributes change
+    # A snapshot file is this header, the SHA-256 of the rest, then the snapshot as marshal data (plain values only)
+    SNAPSHOT_HEADER = b"teamsbot-recipients\n"
+
+    def __init__(self, store: Optional[RecipientStore] = None, save_delay: float = RECIPIENTS_SAVE_DELAY,
+                 snapshot_path: Optional[str] = None):
+        self.store = store or create_recipient_store()
+        self.save_delay = save_delay
+        self.snapshot_path = snapshot_path
+        self.change_seq = self.store.last_change()  # Read before the scan so no change is missed by sync()
+        self._recipients: Dict[str, Any] = {}
+        self.quarantined: Dict[str, Any] = {}  # Stored recipients left out of targeting until reinstalled
+        self.index = TargetingIndex()
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}  # Unsaved changes, None = removed
+        self._saving: Dict[str, Optional[Dict[str, Any]]] = {}  # Changes being written by the running save
+        self._references: Dict[str, ConversationReference] = {}  # Prebuilt references, filled on put or first use
+        self._save_timer: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self.version = 0  # Incremented on every change
+        self._epoch = uuid.uuid4().hex[:12]  # Distinguishes versions across restarts
+        if snapshot_path and self._load_snapshot():
+            self.loaded_from = "snapshot"
+        else:
+            self.loaded_from = "store"
+            for conversation_id, recipient_info in self.store.scan():
+                if _is_quarantined(recipient_info):
+                    self.quarantined[conversation_id] = recipient_info
+                else:
+                    self._recipients[conversation_id] = recipient_info
+                    self.index.add(conversation_id, recipient_info)
+
+    def _load_snapshot(self) -> bool:
+        """Restore the recipients and targeting index from snapshot_path if it matches the store"""
+        key = self.store.snapshot_key()
+        if key is None or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = f.read()
+            start = len(self.SNAPSHOT_HEADER) + 32
+            if (not data.startswith(self.SNAPSHOT_HEADER)
+                    or hashlib.sha256(data[start:]).digest() != data[len(self.SNAPSHOT_HEADER):start]):
+                raise ValueError("not a recipient snapshot, or its checksum doesn't match")
+            snapshot = marshal.loads(data[start:])
+            if not isinstance(snapshot, dict):
+                raise ValueError("not a recipient snapshot")
+        except Exception as e:
+            logger.warning("Ignoring unreadable recipient snapshot %s: %s", self.snapshot_path, e)
+            return False
+        if snapshot.get("format") != self.SNAPSHOT_FORMAT or snapshot.get("key") != key:
+            logger.info("Recipient snapshot %s is out of date, loading the store", self.snapshot_path)
+            return False
+
+        changes = {}
+        if snapshot["change_seq"] != self.change_seq:
+            result = self.store.changes_since(snapshot["change_seq"])
+            if result is None:
+                logger.info("Recipient snapshot %s is too old to catch up from, loading the store", self.snapshot_path)
+                return False
+            self.change_seq, changes = result
+        self._recipients, self.quarantined = snapshot["recipients"], snapshot["quarantined"]
+        self.index = TargetingIndex.from_snapshot(snapshot["index"])
+        self._merge(changes)
+        self.store.restore({**self._recipients, **self.quarantined})
+        return True
+
+    def save_snapshot(self) -> bool:
+        """
+        Write the recipients and targeting index to snapshot_path for the next start (on shutdown, after flush(),
+        with nothing else changing the registry)
+        """
+        key = self.store.snapshot_key() if self.snapshot_path else None
+        if key is None or self._pending:
+            return False
+        data = marshal.dumps({"format": self.SNAPSHOT_FORMAT, "key": key, "change_seq": self.change_seq,
+                              "recipients": self._recipients, "quarantined": self.quarantined,
+                              "index": self.index.snapshot()})
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.SNAPSHOT_HEADER + hashlib.sha256(data).digest() + data)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.error("Error writing recipient snapshot %s: %s", self.snapshot_path, e)
+            return False
+        return True
+
+    def __getitem__(self, conversation_id: str) -> Dict[str, Any]:
+        return self._recipients[conversation_id]
+
+    def __iter__(self):
+        return iter(self._recipients)
+
+    def __len__(self) -> int:
+        return len(self._recipients)
+
+    @property
+    def etag(self) -> str:
+        """Entity tag that changes whenever the registry does"""
+        return f'"{self._epoch}-{self.version}"'
+
+    def put(self, conversation_id: str, recipient_info: Dict[str, Any]):
+        """Add or replace a recipient"""
+        self.quarantined.pop(conversation_id, None)
+        self._recipients[conversation_id] = recipient_info
+        self.index.add(conversation_id, recipient_info)
+        self._references[conversation_id] = _build_conversation_reference(recipient_info)
+        self._changed(conversation_id, recipient_info)
+
+    def remove(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a recipient, returning its info if it was registered"""
+        recipient_info = self._recipients.pop(conversation_id, None)
+        if recipient_info is not None:
+            self.index.remove(conversation_id)
+            self._references.pop(conversation_id, None)
+            self._changed(conversation_id, None)
+        elif self.quarantined.pop(conversation_id, None) is not None:
+            self._changed(conversation_id, None)
+        elif self.change_seq:
+            # Another worker may have stored it since our last sync
+            self._pending[conversation_id] = None
+            self._schedule_save()
+        return recipient_info
+
+    def set_health(self, conversation_id: str, health: Dict[str, Any]):
+        """Replace a recipient's delivery health (not indexed, so the index is left alone)"""
+        recipient_info = self._recipients.get(conversation_id)
+        if recipient_info is not None:
+            recipient_info = {**recipient_info, "health": health}
+            self._recipients[conversation_id] = recipient_info
+            self._changed(conversation_id, recipient_info)
+
+    def quarantine(self, conversation_id: str) -> bool:
+        """Take a recipient out of targeting; it stays stored, and comes back if the bot is reinstalled"""
+        recipient_info = self._recipients.pop(conversation_id, None)
+        if recipient_info is None:
+            return False
+        self.index.remove(conversation_id)
+        self._references.pop(conversation_id, None)
+        health = {**recipient_info.get('health', {}), "quarantined_at": datetime.now(timezone.utc).isoformat()}
+        recipient_info = {**recipient_info, "health": health}
+        self.quarantined[conversation_id] = recipient_info
+        self._changed(conversation_id, recipient_info)
+        return True
+
+    def reference(self, conversation_id: str, recipient_info: Optional[Dict[str, Any]] = None) -> ConversationReference:
+        """
+        Ready-to-use ConversationReference for a recipient. recipient_info is used if the recipient
+        has been removed since it was targeted (the reference is then built but not cached).
+        """
+        conversation_ref = self._references.get(conversation_id)
+        if conversation_ref is None:
+            current_info = self._recipients.get(conversation_id)
+            conversation_ref = _build_conversation_reference(current_info or recipient_info)
+            if current_info is not None:
+                self._references[conversation_id] = conversation_ref
+        return conversation_ref
+
+    def _changed(self, conversation_id: str, recipient_info: Optional[Dict[str, Any]]):
+        self.version += 1
+        self._pending[conversation_id] = recipient_info
+        self._schedule_save()
+
+    def _schedule_save(self):
+        """Save once save_delay after the first unsaved change, so bursts of changes share one write"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. scripts) - save synchronously
+            changes, self._pending = self._pending, {}
+            self._apply(changes)
+            return
+
+        if self._save_timer is None:
+            self._save_timer = loop.call_later(self.save_delay, self._start_save)
+
+    def _start_save(self):
+        self._save_timer = None
+        if self._save_task and not self._save_task.done():
+            # The running save reschedules itself if there are newer changes
+            return
+        self._save_task = asyncio.create_task(self._save())
+
+    async def _save(self):
+        changes, self._pending = self._pending, {}
+        self._saving = changes
+        try:
+            saved = not changes or await asyncio.to_thread(self._apply, changes)
+        finally:
+            self._saving = {}
+        if not saved:
+            # Keep failed changes for the next save unless they've been superseded
+            for conversation_id, recipient_info in changes.items():
+                self._pending.setdefault(conversation_id, recipient_info)
+        if self._pending:
+            self._schedule_save()
+
+    def _apply(self, changes: Dict[str, Optional[Dict[str, Any]]]) -> bool:
         try:
-            with open(RECIPIENTS_FILE, 'w') as f:
-                json.dump(self.recipients, f, indent=2)
-            print(f"Saved {len(self.recipients)} recipients to {RECIPIENTS_FILE}")
+            self.store.apply(changes)
+            return True
         except Exception as e:
-            print(f"Error saving recipients: {e}")
+            logger.error("Error saving recipients: %s", e)
+            return False
+
+    async def sync(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Load changes other processes made to the shared store since the last sync (worker mode),
+        without writing them back. Local changes not yet saved win. Returns the changes applied.
+        """
+        result = await asyncio.to_thread(self.store.changes_since, self.change_seq)
+        if result is None:
+            # Fell behind the change log - compare against the whole store instead
+            self.change_seq = await asyncio.to_thread(self.store.last_change)
+            stored = await asyncio.to_thread(lambda: dict(self.store.scan()))
+            changes = {conversation_id: None for conversation_id in [*self._recipients, *self.quarantined]
+                       if conversation_id not in stored}
+            changes.update(stored)
+        else:
+            self.change_seq, changes = result
+        return self._merge(changes)
+
+    def _merge(self, changes: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Apply changes read from the store (local changes not yet saved win); returns the changes applied"""
+        applied = {}
+        for conversation_id, recipient_info in changes.items():
+            if conversation_id in self._pending or conversation_id in self._saving:
+                continue
+            if recipient_info is None or _is_quarantined(recipient_info):
+                # Removed, or quarantined by another worker
+                previous = self.quarantined.pop(conversation_id, None)
+                if recipient_info is not None:
+                    self.quarantined[conversation_id] = recipient_info
+                if self._recipients.pop(conversation_id, None) is not None:
+                    self.index.remove(conversation_id)
+                    self._references.pop(conversation_id, None)
+                elif previous == recipient_info:
+                    continue
+            else:
+                self.quarantined.pop(conversation_id, None)
+                if self._recipients.get(conversation_id) == recipient_info:
+                    # Usually our own write coming back
+                    continue
+                self._recipients[conversation_id] = recipient_info
+                self.index.add(conversation_id, recipient_info)
+                self._references.pop(conversation_id, None)
+            applied[conversation_id] = recipient_info
+        if applied:
+            self.version += 1
+        return applied
+
+    async def flush(self):
+        """Write any pending changes now (called on shutdown)"""
+        if self._save_task and not self._save_task.done():
+            await self._save_task
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        if self._pending:
+            changes, self._pending = self._pending, {}
+            await asyncio.to_thread(self._apply, changes)
+
+
+class NotificationHandlers:
+    """
+    Notification-only bot that stores recipient information and sends proactive messages. NotificationBot
+    combines these handlers with botbuilder's ActivityHandler once _import_bot_framework() has run.
+    """
+
+    def __init__(self, recipients: Optional[RecipientRegistry] = None):
+        super().__init__()
+        self.recipients = recipients if recipients is not None else RecipientRegistry()
+        self._processed_installations = set()  # Track processed installations to avoid duplicates
 
     async def on_turn(self, turn_context: TurnContext):
         """Handle all incoming activities"""
-        print(f"=== INCOMING ACTIVITY ===")
-        print(f"Activity type: {turn_context.activity.type}")
-        print(f"Activity: {turn_context.activity}")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Serializing the whole activity is costly, so only do it when it will be logged
+            logger.debug("Incoming activity", extra={
+                "activity_type": turn_context.activity.type,
+                "activity": turn_context.activity.serialize()
+            })
 
         # Call the parent handler
         await super().on_turn(turn_context)
@@ -68,14 +1371,12 @@ class NotificationBot(ActivityHandler):
     async def on_installation_update_add(self, turn_context: TurnContext):
         """Handle Teams installation update event - PRIMARY installation handler"""
         try:
-            print(f"=== INSTALLATION UPDATE ADD ===")
-            print(f"Activity: {turn_context.activity}")
-            
             conversation_id = turn_context.activity.conversation.id
+            logger.info("Installation update", extra={"conversation_id": conversation_id})
             
-            # Check if we've already processed this installation
-            if conversation_id in self._processed_installations:
-                print(f"Installation already processed for {conversation_id}, skipping...")
+            # Check if we've already processed this installation (a quarantined recipient is registered again)
+            if conversation_id in self._processed_installations and conversation_id in self.recipients:
+                logger.debug("Installation already processed for %s, skipping", conversation_id)
                 return
             
             # Mark as processed
@@ -85,13 +1386,13 @@ class NotificationBot(ActivityHandler):
             await self._store_recipient(turn_context)
             
         except Exception as e:
-            print(f"Error handling installation update: {e}")
+            logger.exception("Error handling installation update: %s", e)
 
     async def on_members_added_activity(self, members_added: List[ChannelAccount], turn_context: TurnContext):
         """Handle bot installation - SECONDARY handler (disabled to prevent duplicates)"""
         try:
-            print(f"=== MEMBERS ADDED EVENT ===")
-            print(f"Members added: {members_added}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Members added", extra={"members": [member.id for member in members_added]})
             
             # Check if the bot was added
             bot_member = next((member for member in members_added
@@ -101,15 +1402,15 @@ class NotificationBot(ActivityHandler):
                 conversation_id = turn_context.activity.conversation.id
                 
                 # Only process if not already handled by installation_update_add
-                if conversation_id not in self._processed_installations:
-                    print(f"Processing installation via members_added for {conversation_id}")
+                if conversation_id not in self._processed_installations or conversation_id not in self.recipients:
+                    logger.info("Processing installation via members_added", extra={"conversation_id": conversation_id})
                     self._processed_installations.add(conversation_id)
                     await self._store_recipient(turn_context)
                 else:
-                    print(f"Installation already processed via installation_update_add, skipping...")
+                    logger.debug("Installation already processed via installation_update_add, skipping")
 
         except Exception as e:
-            print(f"Error handling member added: {e}")
+            logger.exception("Error handling member added: %s", e)
 
     async def _store_recipient(self, turn_context: TurnContext):
         """Store recipient information for proactive messaging"""
@@ -164,22 +1465,22 @@ class NotificationBot(ActivityHandler):
                 },
                 "added_at": datetime.utcnow().isoformat()
             }
-            print(f"Recipient Info: {recipient_info}")
+            logger.debug("Recipient info", extra={"recipient": recipient_info})
 
             # Store recipient with conversation ID as key
-            self.recipients[conversation.id] = recipient_info
-            self._save_recipients()
+            self.recipients.put(conversation.id, recipient_info)
 
-            print(f"Bot installed in: {recipient_info['display_name']}")
-            print(f"Conversation ID: {conversation.id}")
-            print(f"Tags: {recipient_info['tags']}")
+            logger.info("Bot installed in: %s", recipient_info['display_name'], extra={
+                "conversation_id": conversation.id,
+                "tags": recipient_info['tags']
+            })
 
             # Send single welcome message
             welcome_message = MessageFactory.text("Notify bot added successfully!")
             await turn_context.send_activity(welcome_message)
 
         except Exception as e:
-            print(f"Error storing recipient: {e}")
+            logger.exception("Error storing recipient: %s", e)
 
     def _generate_display_name(self, conversation, team_info, channel_info):
         """Generate a human-readable display name for the conversation"""
@@ -216,82 +1517,2224 @@ class NotificationBot(ActivityHandler):
 
             if bot_member:
                 conversation_id = turn_context.activity.conversation.id
-                if conversation_id in self.recipients:
-                    display_name = self.recipients[conversation_id].get('display_name', conversation_id)
-                    del self.recipients[conversation_id]
-                    self._save_recipients()
+                recipient_info = self.recipients.remove(conversation_id)
+                if recipient_info is not None:
+                    display_name = recipient_info.get('display_name', conversation_id)
                     # Remove from processed set
                     self._processed_installations.discard(conversation_id)
-                    print(f"Bot removed from: {display_name}")
+                    logger.info("Bot removed from: %s", display_name, extra={"conversation_id": conversation_id})
 
         except Exception as e:
-            print(f"Error handling member removed: {e}")
+            logger.exception("Error handling member removed: %s", e)
+
+    def recipients_synced(self, changes: Dict[str, Optional[Dict[str, Any]]]):
+        """Forget installations another worker has since removed, so a reinstall here is processed"""
+        for conversation_id, recipient_info in changes.items():
+            if recipient_info is None:
+                self._processed_installations.discard(conversation_id)
 
     async def on_conversation_update_activity(self, turn_context: TurnContext):
         """Handle conversation update activities"""
-        print(f"=== CONVERSATION UPDATE ===")
-        print(f"Activity: {turn_context.activity}")
-        print(f"Members added: {turn_context.activity.members_added}")
-        print(f"Members removed: {turn_context.activity.members_removed}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Conversation update", extra={
+                "conversation_id": turn_context.activity.conversation.id,
+                "members_added": [member.id for member in turn_context.activity.members_added or []],
+                "members_removed": [member.id for member in turn_context.activity.members_removed or []]
+            })
 
         # Call the parent handler to trigger members_added/removed events
         await super().on_conversation_update_activity(turn_context)
 
     async def on_message_activity(self, turn_context: TurnContext):
         """Handle incoming messages (notification-only bot, so we don't process these)"""
-        print(f"=== MESSAGE ACTIVITY ===")
-        print(f"Received message: {turn_context.activity.text}")
-        print(f"From: {turn_context.activity.from_property}")
-        print(f"Conversation: {turn_context.activity.conversation.id}")
-        pass
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received message", extra={
+                "text": turn_context.activity.text,
+                "from": turn_context.activity.from_property.id if turn_context.activity.from_property else None,
+                "conversation_id": turn_context.activity.conversation.id
+            })
 
-class TeamsNotificationServer:
+
+_BOT_FRAMEWORK_NAMES = {
+    "BotFrameworkAdapter", "BotFrameworkAdapterSettings", "TurnContext", "ActivityHandler", "MessageFactory",
+    "Activity", "ActivityEventNames", "ActivityTypes", "ChannelAccount", "ConversationAccount",
+    "ConversationParameters", "ConversationReference", "DeliveryModes", "JwtTokenValidation",
+    "MicrosoftAppCredentials", "InvalidTokenError", "NotificationBot"
+}
+_bot_framework_lock = threading.Lock()
+_bot_framework_imported = False
+
+
+def _import_bot_framework():
     """
-    HTTP server that hosts the bot and provides API endpoints
+    Import botbuilder and define NotificationBot on first use. The import takes most of a cold start,
+    so the server runs it in a thread after its port is already answering /health.
     """
+    global BotFrameworkAdapter, BotFrameworkAdapterSettings, TurnContext, ActivityHandler, MessageFactory
+    global Activity, ActivityEventNames, ActivityTypes, ChannelAccount, ConversationAccount, ConversationParameters
+    global ConversationReference, DeliveryModes, JwtTokenValidation, MicrosoftAppCredentials, InvalidTokenError
+    global NotificationBot
+    global _bot_framework_imported
+    if _bot_framework_imported:
+        return
+    with _bot_framework_lock:
+        if _bot_framework_imported:
+            return
+        from botbuilder.core import (
+            BotFrameworkAdapter,
+            BotFrameworkAdapterSettings,
+            TurnContext,
+            ActivityHandler,
+            MessageFactory
+        )
+        from botbuilder.schema import (
+            Activity,
+            ActivityEventNames,
+            ActivityTypes,
+            ChannelAccount,
+            ConversationAccount,
+            ConversationParameters,
+            ConversationReference,
+            DeliveryModes
+        )
+        from botframework.connector.auth import JwtTokenValidation, MicrosoftAppCredentials
+        from jwt import InvalidTokenError
 
-    def __init__(self):
-        # Bot Framework Adapter
-        self.settings = BotFrameworkAdapterSettings(BOT_ID, APP_PASSWORD)
-        self.adapter = BotFrameworkAdapter(self.settings)
+        class NotificationBot(NotificationHandlers, ActivityHandler):
+            __doc__ = NotificationHandlers.__doc__
+            __qualname__ = "NotificationBot"
 
-        # Bot instance
-        self.bot = NotificationBot()
+        _bot_framework_imported = True
 
-        # Error handler
-        async def on_error(context: TurnContext, error: Exception):
-            print(f"Error: {error}")
-            await context.send_activity(MessageFactory.text(f"Sorry, an error occurred: {str(error)}"))
 
-        self.adapter.on_turn_error = on_error
+def __getattr__(name: str):
+    # Lets other modules use teamsbot.NotificationBot etc. without importing botbuilder themselves
+    if name in _BOT_FRAMEWORK_NAMES:
+        _import_bot_framework()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    async def messages_handler(self, request: Request) -> Response:
-        """Handle incoming messages from Teams"""
-        try:
-            # Get the request body
-            body = await request.text()
 
-            # Parse activity
-            activity = Activity().deserialize(json.loads(body))
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
 
-            # Create auth header
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status code of a failed Bot Connector call, if any"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) or getattr(response, 'status', None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait according to the Retry-After header of a failed call, if present"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a failed send is worth retrying (throttling, server errors, failures to connect)"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if isinstance(error, ClientResponseError):
+        return error.status in RETRYABLE_STATUS_CODES
+    # Only a failure to connect (refused, DNS, TLS) means the request never went out. After a timeout,
+    # a dropped connection or a broken response the message may already have been posted, so resending
+    # could deliver it twice.
+    return isinstance(error, ClientConnectorError)
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Jittered exponential backoff for a retry, honouring Retry-After when the server sent one"""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, SEND_BACKOFF_BASE)
+    return random.uniform(0, min(SEND_BACKOFF_MAX, SEND_BACKOFF_BASE * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate is lowered on throttling and raised again on success
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate / 20
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token if one is available, otherwise return the seconds to wait before trying again"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def is_idle(self) -> bool:
+        """Whether the bucket is full and not paused (safe to drop and recreate)"""
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until and self.rate >= self.max_rate
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """Halve the rate and, if the server asked for it, pause until Retry-After has passed"""
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+            self.tokens = min(self.tokens, 1.0)
+
+    def recover(self):
+        """Additively raise the rate back toward the configured limit"""
+        if self.rate < self.max_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_LIMIT_RECOVERY)
+
+
+class AdaptiveRateLimiter:
+    """
+    Global, per-tenant and per-conversation token buckets that adapt to Bot Connector throttling
+    """
+
+    # Idle per-conversation buckets are dropped once this many exist
+    MAX_CONVERSATION_BUCKETS = 10000
+
+    def __init__(self, global_rate: float = RATE_LIMIT_GLOBAL, tenant_rate: float = RATE_LIMIT_PER_TENANT,
+                 conversation_rate: float = RATE_LIMIT_PER_CONVERSATION,
+                 conversation_burst: float = RATE_LIMIT_CONVERSATION_BURST):
+        self.tenant_rate = tenant_rate
+        self.conversation_rate = conversation_rate
+        self.conversation_burst = conversation_burst
+        self.global_bucket = TokenBucket(global_rate)
+        self._tenants: Dict[str, TokenBucket] = {}
+        self._conversations: Dict[str, TokenBucket] = {}
+        self._prune_at = self.MAX_CONVERSATION_BUCKETS
+        self.throttled_count = 0
+
+    def _tenant(self, tenant_id: Optional[str]) -> TokenBucket:
+        bucket = self._tenants.get(tenant_id or '')
+        if bucket is None:
+            bucket = self._tenants[tenant_id or ''] = TokenBucket(self.tenant_rate)
+        return bucket
+
+    def _conversation(self, conversation_id: str) -> TokenBucket:
+        bucket = self._conversations.get(conversation_id)
+        if bucket is None:
+            if len(self._conversations) >= self._prune_at:
+                self._prune_conversations()
+            bucket = self._conversations[conversation_id] = TokenBucket(
+                self.conversation_rate, self.conversation_burst
+            )
+        return bucket
+
+    def _prune_conversations(self):
+        """Drop idle per-conversation buckets so the map doesn't grow with every broadcast"""
+        for conversation_id in [cid for cid, bucket in self._conversations.items() if bucket.is_idle()]:
+            del self._conversations[conversation_id]
+        self._prune_at = max(self.MAX_CONVERSATION_BUCKETS, len(self._conversations) * 2)
+
+    async def acquire(self, tenant_id: Optional[str], conversation_id: str):
+        """Wait for a send slot in the conversation, tenant and global buckets"""
+        await self._conversation(conversation_id).acquire()
+        await self._tenant(tenant_id).acquire()
+        await self.global_bucket.acquire()
+
+    def on_success(self, tenant_id: Optional[str], conversation_id: str):
+        """Record a successful send so throttled limits can recover"""
+        self.global_bucket.recover()
+        self._tenant(tenant_id).recover()
+        bucket = self._conversations.get(conversation_id)
+        if bucket:
+            bucket.recover()
+
+    def on_throttled(self, tenant_id: Optional[str], conversation_id: str, retry_after: Optional[float]):
+        """Record a 429 - every scope the send went through slows down, the conversation also waits out Retry-After"""
+        self.throttled_count += 1
+        self._conversation(conversation_id).throttle(retry_after)
+        self._tenant(tenant_id).throttle()
+        self.global_bucket.throttle()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current effective limits"""
+        return {
+            "global_rate": round(self.global_bucket.rate, 2),
+            "tenant_rates": {tenant_id or "unknown": round(bucket.rate, 2) for tenant_id, bucket in self._tenants.items()},
+            "throttled_total": self.throttled_count
+        }
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, Any]:
+    """Summarize a list of per-recipient latencies in milliseconds"""
+    if not latencies:
+        return {"count": 0}
+
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "min": round(ordered[0], 2),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1], 2)
+    }
+
+
+GONE_STATUS_CODES = {403, 404}  # The bot was removed from the conversation, or it no longer exists
+
+
+def _age(timestamp: Optional[str], now: float) -> float:
+    """Seconds since an ISO 8601 timestamp (infinite if there is none)"""
+    return now - _parse_time(timestamp) if timestamp else math.inf
+
+
+class RecipientHealth:
+    """
+    Per-recipient delivery health kept in the recipient records, a circuit breaker that skips conversations
+    the bot can no longer post to, and a pruning pass that quarantines them
+    """
+
+    def __init__(self, registry: RecipientRegistry, prune_interval: float = HEALTH_PRUNE_INTERVAL):
+        self.registry = registry
+        self.prune_interval = prune_interval
+        # Kept here rather than in the record, so successful sends don't rewrite recipients (and their ETag)
+        self._last_success: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, conversation_id: str, error: Optional[Exception]):
+        """
+        Update a recipient's health after a send (error=None on success). A success is only written
+        when it clears failures; otherwise its time is remembered for the next failure to record.
+        """
+        recipient_info = self.registry.get(conversation_id)
+        if recipient_info is None:
+            return
+        health = recipient_info.get('health') or {}
+        now = datetime.now(timezone.utc)
+        if error is None:
+            self._last_success[conversation_id] = now.isoformat()
+            if health.get('consecutive_failures'):
+                self.registry.set_health(conversation_id, {"last_success_at": now.isoformat(), "consecutive_failures": 0})
+            return
+
+        status_code = _status_code(error)
+        error_class = "gone" if status_code in GONE_STATUS_CODES else "transient"
+        # A different kind of failure starts a new run, so earlier transient errors can't trip the circuit
+        run = health if health.get('error_class') == error_class else {}
+        self.registry.set_health(conversation_id, {
+            "last_success_at": self._last_success.get(conversation_id, health.get('last_success_at')),
+            "last_failure_at": now.isoformat(),
+            "failing_since": run.get('failing_since') or now.isoformat(),
+            "consecutive_failures": run.get('consecutive_failures', 0) + 1,
+            "error_class": error_class,
+            "status_code": status_code,
+            "last_error": (str(error) or type(error).__name__)[:200]
+        })
+
+    @staticmethod
+    def state(recipient_info: Dict[str, Any], now: float) -> str:
+        """
+        'ok', 'open' (skipped by the circuit breaker), 'probe' (skipped, but due a trial send)
+        or 'quarantine' (failing for long enough to be pruned)
+        """
+        health = recipient_info.get('health')
+        if (not health or health.get('error_class') != "gone"
+                or health.get('consecutive_failures', 0) < HEALTH_CIRCUIT_FAILURES):
+            return "ok"
+        if _age(health.get('failing_since'), now) >= HEALTH_QUARANTINE_AFTER:
+            return "quarantine"
+        if _age(health.get('last_failure_at'), now) >= HEALTH_PROBE_INTERVAL:
+            return "probe"
+        return "open"
+
+    def admit(self, recipients: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """
+        Split targeted recipients into those to send to, the IDs skipped by the circuit breaker and
+        the IDs quarantined now
+        """
+        now = time.time()
+        skipped = []
+        pruned = []
+        for conversation_id, recipient_info in recipients.items():
+            if 'health' not in recipient_info:
+                continue
+            state = self.state(recipient_info, now)
+            if state == "open":
+                skipped.append(conversation_id)
+            elif state == "quarantine":
+                self.registry.quarantine(conversation_id)
+                pruned.append(conversation_id)
+        if not skipped and not pruned:
+            return recipients, skipped, pruned
+
+        excluded = set(skipped).union(pruned)
+        metrics.broadcast_recipients.inc("skipped", amount=len(skipped))
+        metrics.recipients_quarantined.inc("send", amount=len(pruned))
+        admitted = {conversation_id: recipient_info for conversation_id, recipient_info in recipients.items()
+                    if conversation_id not in excluded}
+        return admitted, skipped, pruned
+
+    def prune(self) -> int:
+        """Quarantine every recipient that has answered 403/404 for HEALTH_QUARANTINE_AFTER; returns how many"""
+        now = time.time()
+        due = [conversation_id for conversation_id, recipient_info in self.registry.items()
+               if 'health' in recipient_info and self.state(recipient_info, now) == "quarantine"]
+        for conversation_id in due:
+            self.registry.quarantine(conversation_id)
+        if due:
+            metrics.recipients_quarantined.inc("prune", amount=len(due))
+            logger.info("Quarantined %d unreachable recipients", len(due))
+        return len(due)
+
+    async def _run(self):
+        while True:
+            self.prune()
+            await asyncio.sleep(self.prune_interval)
+
+    async def start(self):
+        """Start the background pruning pass (the first one runs right away)"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class DeliveryEngine:
+    """
+    Concurrent proactive delivery with a global and a per-service_url concurrency limit
+    """
+
+    def __init__(self, max_concurrency: int = SEND_CONCURRENCY,
+                 max_per_service_url: int = SEND_CONCURRENCY_PER_SERVICE_URL,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, max_retries: int = SEND_MAX_RETRIES,
+                 health: Optional[RecipientHealth] = None):
+        self.max_concurrency = max_concurrency
+        self.max_per_service_url = max_per_service_url
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.max_retries = max_retries
+        self.health = health  # Told the final outcome of every send
+        # Shared by every broadcast so concurrent /send calls can't exceed the limits together
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self._service_url_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _service_url_limit(self, service_url: str) -> asyncio.Semaphore:
+        """Get (or create) the semaphore for a Bot Connector service_url"""
+        limit = self._service_url_limits.get(service_url)
+        if limit is None:
+            limit = asyncio.Semaphore(self.max_per_service_url)
+            self._service_url_limits[service_url] = limit
+        return limit
+
+    async def _send_with_retries(self, conversation_id: str, recipient_info: Dict[str, Any], send_one,
+                                 counters: Dict[str, int]) -> int:
+        """Rate-limited send that retries throttled and transient failures; returns the number of attempts"""
+        tenant_id = recipient_info.get('tenant_id')
+        attempt = 0
+        service_url = recipient_info.get('service_url') or ''
+        while True:
+            await self.rate_limiter.acquire(tenant_id, conversation_id)
+            sent_at = time.perf_counter()
+            try:
+                await send_one(conversation_id, recipient_info)
+                metrics.send_seconds.observe(time.perf_counter() - sent_at, service_url, "ok")
+                self.rate_limiter.on_success(tenant_id, conversation_id)
+                return attempt + 1
+            except Exception as e:
+                status_code = _status_code(e)
+                metrics.send_seconds.observe(time.perf_counter() - sent_at, service_url,
+                                             "throttled" if status_code == 429 else "error")
+                retry_after = _retry_after(e)
+                if status_code == 429:
+                    counters["throttled"] += 1
+                    self.rate_limiter.on_throttled(tenant_id, conversation_id, retry_after)
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                counters["retries"] += 1
+                await asyncio.sleep(_backoff_delay(attempt, retry_after))
+                attempt += 1
+
+    async def deliver(self, recipients: Dict[str, Any], send_one, concurrency: Optional[int] = None,
+                      on_result=None, collect: bool = True, pending_results: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run send_one(conversation_id, recipient_info) for every recipient with bounded concurrency.
+        At most max_concurrency sends (or `concurrency` for this broadcast, if lower) are in flight at once.
+        on_result(conversation_id, error, entry) is called (and awaited, if it returns an awaitable) after
+        each send, with error=None on success and entry the recipient's result. The send's slots are
+        already released by then, so a slow on_result can't hold up other broadcasts. pending_results
+        bounds the recipients started but not yet through on_result, so a slow on_result slows this
+        broadcast down instead of piling up waiting tasks.
+        With collect=False the per-recipient results are only passed to on_result, not kept for the
+        returned sent_to/errors lists, and latency percentiles come from a fixed-size sample.
+        """
+        sent_to = []
+        errors = []
+        latencies = []
+        counters = {"sent": 0, "failed": 0, "retries": 0, "throttled": 0}
+        broadcast_limit = asyncio.Semaphore(concurrency) if concurrency else None
+        results_limit = asyncio.Semaphore(pending_results) if pending_results else None
+        started = time.perf_counter()
+
+        async def send(conversation_id: str, recipient_info: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+            """Send to one recipient with retries; returns (error, entry)"""
+            entry = {
+                "conversation_id": conversation_id,
+                "display_name": recipient_info.get('display_name')
+            }
+            try:
+                async with self._service_url_limit(recipient_info.get('service_url') or ''):
+                    sent_at = time.perf_counter()
+                    attempts = await self._send_with_retries(conversation_id, recipient_info, send_one, counters)
+                    latency = (time.perf_counter() - sent_at) * 1000
+
+                error = None
+                if self.health:
+                    self.health.record(conversation_id, None)
+                counters["sent"] += 1
+                if collect or len(latencies) < LATENCY_SAMPLE_SIZE:
+                    latencies.append(latency)
+                else:
+                    # Reservoir sampling keeps a uniform sample of every latency seen so far
+                    slot = random.randrange(counters["sent"])
+                    if slot < LATENCY_SAMPLE_SIZE:
+                        latencies[slot] = latency
+                entry.update(tags=recipient_info.get('tags', []), latency_ms=round(latency, 2), attempts=attempts)
+                if collect:
+                    sent_to.append(entry)
+                logger.debug("Sent notification to: %s", recipient_info.get('display_name', conversation_id),
+                             extra={"conversation_id": conversation_id, "latency_ms": round(latency, 2),
+                                    "attempts": attempts})
+
+            except Exception as e:
+                error = str(e) or type(e).__name__  # Timeouts have no message
+                if self.health:
+                    self.health.record(conversation_id, e)
+                counters["failed"] += 1
+                entry["error"] = error
+                error_msg = f"Failed to send to {recipient_info.get('display_name', conversation_id)}: {error}"
+                if collect:
+                    errors.append(error_msg)
+                # Log the first few failures individually; a broadcast-wide outage is summarised below
+                if counters["failed"] <= SEND_ERROR_LOG_LIMIT:
+                    logger.warning(error_msg, extra={"conversation_id": conversation_id})
+
+            return error, entry
+
+        async def run(conversation_id: str, recipient_info: Dict[str, Any]):
+            try:
+                try:
+                    error, entry = await send(conversation_id, recipient_info)
+                finally:
+                    self._global_limit.release()
+                    if broadcast_limit:
+                        broadcast_limit.release()
+                if on_result:
+                    pending = on_result(conversation_id, error, entry)
+                    if inspect.isawaitable(pending):
+                        await pending
+            finally:
+                if results_limit:
+                    results_limit.release()
+
+        # Acquire a slot before creating each task so only in-flight sends (and results being handed on) exist as tasks
+        tasks = set()
+        for conversation_id, recipient_info in recipients.items():
+            if results_limit:
+                await results_limit.acquire()
+            if broadcast_limit:
+                await broadcast_limit.acquire()
+            await self._global_limit.acquire()
+            task = asyncio.create_task(run(conversation_id, recipient_info))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        result = {
+            "sent_count": counters["sent"],
+            "failed_count": counters["failed"],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "latency_ms": _latency_summary(latencies),
+            "retries": counters["retries"],
+            "throttled": counters["throttled"],
+            "rate_limits": self.rate_limiter.stats()
+        }
+        if collect:
+            result["sent_to"] = sent_to
+            result["errors"] = errors
+        metrics.broadcast_seconds.observe(result["elapsed_ms"] / 1000)
+        metrics.broadcast_recipients.inc("sent", amount=counters["sent"])
+        metrics.broadcast_recipients.inc("failed", amount=counters["failed"])
+        logger.info("Delivered %d of %d notifications", counters["sent"], len(recipients), extra={
+            "failed": counters["failed"],
+            "errors_not_logged": max(counters["failed"] - SEND_ERROR_LOG_LIMIT, 0),
+            "elapsed_ms": result["elapsed_ms"],
+            "latency_ms": result["latency_ms"],
+            "retries": counters["retries"],
+            "throttled": counters["throttled"]
+        })
+        return result
+
+
+class JobQueue:
+    """
+    Durable SQLite-backed queue of background broadcast jobs with per-recipient progress. In worker
+    mode every worker shares the database, so any of them can report on any job, and each job is run
+    (and resumed after a restart) by the owner that queued it.
+    """
+
+    # Statuses of jobs that still have work to do (and are resumed after a restart)
+    UNFINISHED = ("queued", "running")
+
+    def __init__(self, path: str = JOBS_DB_FILE, workers: int = JOB_WORKERS, owner: Optional[str] = None):
+        self.path = path
+        self.workers = workers
+        self.owner = owner  # Worker ID in worker mode
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _init_schema(self):
+        """Create the job tables if they don't exist"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    owner TEXT
+                )
+            """)
+            # Databases created before jobs had owners
+            if "owner" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_recipients (
+                    job_id TEXT NOT NULL,
+                    conversation_id TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    error TEXT,
+                    PRIMARY KEY (job_id, conversation_id)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_recipients_status ON job_recipients (job_id, status)")
+
+    def _insert_job(self, job_id: str, payload: Dict[str, Any], conversation_ids: List[str]):
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, total, created_at, updated_at, owner) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), len(conversation_ids), now, now, self.owner)
+            )
+            self._conn.executemany(
+                "INSERT INTO job_recipients (job_id, conversation_id) VALUES (?, ?)",
+                ((job_id, conversation_id) for conversation_id in conversation_ids)
+            )
+
+    def _set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, datetime.utcnow().isoformat(), job_id)
+            )
+
+    def _record_results(self, job_id: str, results: List[tuple]):
+        """Persist (conversation_id, status, error) results for a job"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE job_recipients SET status = ?, error = ? WHERE job_id = ? AND conversation_id = ?",
+                ((status, error, job_id, conversation_id) for conversation_id, status, error in results)
+            )
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (datetime.utcnow().isoformat(), job_id))
+
+    def _pending_recipients(self, job_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT conversation_id FROM job_recipients WHERE job_id = ? AND status = 'pending'", (job_id,)
+            ).fetchall()
+        return [row["conversation_id"] for row in rows]
+
+    def _unfinished_jobs(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND owner IS ? ORDER BY created_at",
+                (*self.UNFINISHED, self.owner)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def _get(self, job_id: str, error_limit: int = 100) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM job_recipients WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+            errors = self._conn.execute(
+                "SELECT conversation_id, error FROM job_recipients WHERE job_id = ? AND status = 'failed' LIMIT ?",
+                (job_id, error_limit)
+            ).fetchall()
+
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "total": job["total"],
+            "pending": counts.get("pending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "skipped": counts.get("skipped", 0),
+            "errors": [{"conversation_id": row["conversation_id"], "error": row["error"]} for row in errors],
+            "job_error": job["error"],
+            "payload": json.loads(job["payload"]),
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"]
+        }
+
+    async def enqueue(self, payload: Dict[str, Any], conversation_ids: List[str], job_id: Optional[str] = None) -> str:
+        """Persist a new job and hand it to the workers; returns the job ID"""
+        job_id = job_id or uuid.uuid4().hex
+        await asyncio.to_thread(self._insert_job, job_id, payload, conversation_ids)
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job with its progress counts"""
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def pending_recipients(self, job_id: str) -> List[str]:
+        """Conversation IDs of a job that haven't been delivered yet"""
+        return await asyncio.to_thread(self._pending_recipients, job_id)
+
+    async def record_results(self, job_id: str, results: List[tuple]):
+        """Checkpoint delivery results for a job"""
+        if results:
+            await asyncio.to_thread(self._record_results, job_id, results)
+
+    async def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        await asyncio.to_thread(self._set_status, job_id, status, error)
+
+    async def start(self, run_job):
+        """Start the workers and re-queue jobs left unfinished by a previous run"""
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self._unfinished_jobs):
+            logger.info("Resuming unfinished job %s", job_id)
+            self._queue.put_nowait(job_id)
+
+        async def worker():
+            while True:
+                job_id = await self._queue.get()
+                try:
+                    job = await self.get(job_id)
+                    if job is None:
+                        continue
+                    await self.set_status(job_id, "running")
+                    await run_job(job_id, job["payload"])
+                    await self.set_status(job_id, "completed")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception("Error running job %s: %s", job_id, e)
+                    await self.set_status(job_id, "failed", str(e))
+                finally:
+                    self._queue.task_done()
+
+        self._tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; jobs still running stay unfinished and resume on the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+
+def _parse_time(value: Any) -> float:
+    """A Unix timestamp or an ISO 8601 date/time (UTC unless it has an offset) as a Unix timestamp"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        else:
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            return moment.timestamp()
+    raise ValueError(f"Invalid time {value!r} - use an ISO 8601 date/time or a Unix timestamp")
+
+
+def _iso_time(timestamp: Optional[float]) -> Optional[str]:
+    return None if timestamp is None else datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+async def _wait_event(event: asyncio.Event, timeout: Optional[float]):
+    """
+    Wait until event is set, setting it after timeout seconds (None = no timeout). Unlike wait_for on Python 3.11,
+    a cancellation that arrives just as the event is set isn't swallowed, so a timer task always stops when cancelled.
+    """
+    timer = asyncio.get_running_loop().call_later(timeout, event.set) if timeout is not None else None
+    try:
+        await event.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+
+class Scheduler:
+    """
+    Durable SQLite-backed schedule of future and recurring broadcasts, fired by a single timer task
+    that sleeps until the earliest run in an in-memory heap. In worker mode the workers share the
+    database: any of them can list or cancel a schedule, and only its owner (the worker that created
+    it) fires it.
+    """
+
+    def __init__(self, path: str = JOBS_DB_FILE, owner: Optional[str] = None):
+        self.path = path
+        self.owner = owner  # Worker ID in worker mode
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}  # Schedule ID -> fire time of its live heap entry; others are stale
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _init_schema(self):
+        """Create the schedule table if it doesn't exist"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # next_run is the nominal time of the next run, fire_at the same plus its random jitter
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS schedules (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    next_run REAL,
+                    fire_at REAL,
+                    every REAL,
+                    remaining INTEGER,
+                    until REAL,
+                    jitter REAL NOT NULL,
+                    runs INTEGER NOT NULL DEFAULT 0,
+                    last_run_at TEXT,
+                    last_job_id TEXT,
+                    last_error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    owner TEXT
+                )
+            """)
+            # Databases created before schedules had owners
+            if "owner" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(schedules)")}:
+                self._conn.execute("ALTER TABLE schedules ADD COLUMN owner TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_schedules_status ON schedules (status)")
+
+    def _insert(self, schedule_id: str, payload: Dict[str, Any], next_run: float, fire_at: float,
+                every: Optional[float], count: Optional[int], until: Optional[float], jitter: float):
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO schedules (id, status, payload, next_run, fire_at, every, remaining, until, jitter, "
+                "created_at, updated_at, owner) VALUES (?, 'scheduled', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (schedule_id, json.dumps(payload), next_run, fire_at, every, count, until, jitter, now, now,
+                 self.owner)
+            )
+
+    def _record_run(self, schedule_id: str, status: str, next_run: Optional[float], fire_at: Optional[float],
+                    remaining: Optional[int], job_id: Optional[str], error: Optional[str]):
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE schedules SET status = ?, next_run = ?, fire_at = ?, remaining = ?, runs = runs + 1, "
+                "last_run_at = ?, last_job_id = ?, last_error = ?, updated_at = ? WHERE id = ? AND status = 'scheduled'",
+                (status, next_run, fire_at, remaining, now, job_id, error, now, schedule_id)
+            )
+
+    def _cancel(self, schedule_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE schedules SET status = 'cancelled', fire_at = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'scheduled'",
+                (datetime.utcnow().isoformat(), schedule_id)
+            )
+        return cursor.rowcount > 0
+
+    def _row(self, schedule_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute("SELECT rowid, * FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+
+    def _page(self, status: Optional[str], after: int, limit: int) -> List[sqlite3.Row]:
+        query = "SELECT rowid, * FROM schedules WHERE rowid > ?"
+        params: List[Any] = [after]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY rowid LIMIT ?", params + [limit]).fetchall()
+
+    def _pending(self) -> List[Tuple[float, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fire_at, id FROM schedules WHERE status = 'scheduled' AND owner IS ?", (self.owner,)
+            ).fetchall()
+        return [(row["fire_at"], row["id"]) for row in rows]
+
+    @staticmethod
+    def _json(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "schedule_id": row["id"],
+            "status": row["status"],
+            "next_run_at": _iso_time(row["fire_at"]),
+            "repeat": None if row["every"] is None else {
+                "every": row["every"],
+                "remaining": row["remaining"],
+                "until": _iso_time(row["until"])
+            },
+            "jitter": row["jitter"],
+            "runs": row["runs"],
+            "last_run_at": row["last_run_at"],
+            "last_job_id": row["last_job_id"],
+            "last_error": row["last_error"],
+            "payload": json.loads(row["payload"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def _push(self, fire_at: float, schedule_id: str):
+        heapq.heappush(self._heap, (fire_at, schedule_id))
+        self._due[schedule_id] = fire_at
+        metrics.schedules_pending.set(len(self._due))
+        # Wake the timer task if this run is now the earliest
+        if self._wakeup is not None and self._heap[0][1] == schedule_id:
+            self._wakeup.set()
+
+    async def add(self, payload: Dict[str, Any], send_at: float, every: Optional[float] = None,
+                  count: Optional[int] = None, until: Optional[float] = None, jitter: float = SCHEDULE_JITTER) -> str:
+        """
+        Persist a broadcast that runs at send_at and then every `every` seconds, `count` times in all
+        and/or until `until`; each run is delayed by a random 0..jitter seconds. Returns the schedule ID.
+        """
+        schedule_id = uuid.uuid4().hex
+        fire_at = send_at + random.uniform(0, jitter)
+        await asyncio.to_thread(self._insert, schedule_id, payload, send_at, fire_at, every, count, until, jitter)
+        if self._task is not None:
+            self._push(fire_at, schedule_id)
+        return schedule_id
+
+    async def get(self, schedule_id: str) -> Optional[Dict[str, Any]]:
+        row = await asyncio.to_thread(self._row, schedule_id)
+        return None if row is None else self._json(row)
+
+    async def page(self, status: Optional[str], after: int, limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """A page of schedules in creation order, and the cursor of the next page"""
+        rows = await asyncio.to_thread(self._page, status, after, limit + 1)
+        next_after = rows[limit - 1]["rowid"] if len(rows) > limit else None
+        return [self._json(row) for row in rows[:limit]], next_after
+
+    async def cancel(self, schedule_id: str) -> bool:
+        """Cancel a schedule's future runs; False if it isn't scheduled (unknown, finished or cancelled)"""
+        if not await asyncio.to_thread(self._cancel, schedule_id):
+            return False
+        # Its heap entry goes stale and is dropped when it reaches the top
+        self._due.pop(schedule_id, None)
+        metrics.schedules_pending.set(len(self._due))
+        return True
+
+    async def _fire(self, schedule_id: str, run_schedule):
+        row = await asyncio.to_thread(self._row, schedule_id)
+        if row is None or row["status"] != "scheduled":
+            # Cancelled, possibly through another worker
+            self._due.pop(schedule_id, None)
+            metrics.schedules_pending.set(len(self._due))
+            return
+
+        # The job ID is derived from the run, so a run repeated after a crash finds its job already queued
+        job_id, error = f"{schedule_id}-{row['runs'] + 1}", None
+        try:
+            error = await run_schedule(job_id, json.loads(row["payload"]))
+        except Exception as e:
+            logger.exception("Error running schedule %s: %s", schedule_id, e)
+            error = str(e)
+        metrics.scheduled_runs.inc("queued" if error is None else "failed")
+
+        # Runs missed while the bot was down are made up by the one that just fired
+        status, next_run, fire_at, remaining = "completed", None, None, row["remaining"]
+        if remaining is not None:
+            remaining -= 1
+        if row["every"] is not None and remaining != 0:
+            now = time.time()
+            next_run = row["next_run"] + row["every"]
+            if next_run <= now:
+                next_run += math.ceil((now - next_run) / row["every"]) * row["every"]
+            if row["until"] is None or next_run <= row["until"]:
+                status, fire_at = "scheduled", next_run + random.uniform(0, row["jitter"])
+            else:
+                next_run = None
+        await asyncio.to_thread(self._record_run, schedule_id, status, next_run, fire_at, remaining,
+                                None if error else job_id, error)
+        if fire_at is not None and schedule_id in self._due:
+            self._push(fire_at, schedule_id)
+        else:
+            self._due.pop(schedule_id, None)
+            metrics.schedules_pending.set(len(self._due))
+
+    async def _run(self, run_schedule):
+        while True:
+            self._wakeup.clear()
+            # Drop entries of cancelled schedules and of runs that were rescheduled
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            delay = SCHEDULE_MAX_SLEEP
+            if self._heap:
+                fire_at, schedule_id = self._heap[0]
+                delay = fire_at - time.time()
+                if delay <= 0:
+                    heapq.heappop(self._heap)
+                    try:
+                        await self._fire(schedule_id, run_schedule)
+                    except Exception as e:
+                        # Reading or recording the run failed (the run itself is caught in _fire). Trying again
+                        # is safe: until a run is recorded it keeps its job ID, so it isn't queued twice.
+                        logger.exception("Error firing schedule %s, retrying in %gs: %s",
+                                         schedule_id, SCHEDULE_RETRY_DELAY, e)
+                        if schedule_id in self._due:
+                            self._push(time.time() + SCHEDULE_RETRY_DELAY, schedule_id)
+                    continue
+            await _wait_event(self._wakeup, min(delay, SCHEDULE_MAX_SLEEP))
+
+    async def start(self, run_schedule):
+        """
+        Load pending schedules and start the timer task; run_schedule(job_id, payload) queues a run
+        and returns an error message if there was nothing to send
+        """
+        self._wakeup = asyncio.Event()
+        pending = await asyncio.to_thread(self._pending)
+        self._heap = pending
+        heapq.heapify(self._heap)
+        self._due = {schedule_id: fire_at for fire_at, schedule_id in pending}
+        metrics.schedules_pending.set(len(self._due))
+        if pending:
+            logger.info("Loaded %d pending schedules", len(pending))
+        self._task = asyncio.create_task(self._run(run_schedule))
+        self._task.add_done_callback(self._stopped)
+
+    @staticmethod
+    def _stopped(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Scheduler stopped unexpectedly; no scheduled broadcasts will run until a restart",
+                         exc_info=task.exception())
+
+    async def stop(self):
+        """Stop the timer task; runs due while the bot is down fire when it starts again"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+
+class ActivityQueue:
+    """
+    Bounded in-process queue of authenticated inbound activities, handled by background workers so
+    /api/messages can answer Teams before the bot's work (storing recipients, welcome messages) is done
+    """
+
+    def __init__(self, max_size: int = ACTIVITY_QUEUE_SIZE, workers: int = ACTIVITY_WORKERS):
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(max_size)
+        self._tasks: List[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    async def put(self, *item):
+        """Queue an item for the handler, waiting for room if the queue is full (backpressure on the caller)"""
+        if self._queue.full():
+            metrics.activity_queue_full.inc()
+        await self._queue.put((time.perf_counter(), item))
+        metrics.activity_queue_depth.set(self._queue.qsize())
+
+    async def start(self, handle):
+        """Start the workers; each queued item is passed to handle(*item)"""
+        async def worker():
+            while True:
+                queued_at, item = await self._queue.get()
+                metrics.activity_queue_depth.set(self._queue.qsize())
+                metrics.activity_queue_wait_seconds.observe(time.perf_counter() - queued_at)
+                try:
+                    await handle(*item)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception("Error handling queued activity: %s", e)
+                finally:
+                    self._queue.task_done()
+
+        self._tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = ACTIVITY_DRAIN_TIMEOUT):
+        """Give queued activities up to timeout seconds to be handled, then stop the workers"""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Stopping with %d queued activities unhandled", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class HashRing:
+    """
+    Consistent hashing of conversation IDs onto workers. Each worker owns many points on the ring, so
+    adding or losing a worker only moves the conversations next to its points.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = CLUSTER_VIRTUAL_NODES):
+        points = sorted((self._hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def node(self, key: str) -> str:
+        """The node owning key: the first point clockwise from its hash"""
+        return self._nodes[bisect_right(self._hashes, self._hash(key)) % len(self._hashes)]
+
+    def partition(self, keys) -> Dict[str, List[str]]:
+        """Group keys by owning node"""
+        partitions: Dict[str, List[str]] = {}
+        for key in keys:
+            partitions.setdefault(self.node(key), []).append(key)
+        return partitions
+
+
+class ClusterNode:
+    """
+    This worker's membership of a group of processes on one host sharing the SQLite recipient store. It
+    heartbeats into the shared database, keeps a HashRing of the live workers, follows the recipient changes
+    the others write, and forwards broadcast partitions to the workers that own them.
+    """
+
+    def __init__(self, worker_id: str, host: str, port: int, registry: RecipientRegistry,
+                 on_sync=None, path: str = RECIPIENTS_DB_FILE, interval: float = CLUSTER_SYNC_INTERVAL,
+                 timeout: float = CLUSTER_WORKER_TIMEOUT):
+        # SQLite's WAL needs the database on a local disk, worker IDs are only unique on one host and the
+        # internal endpoints are unauthenticated, so workers only ever talk over loopback
+        if host != "localhost" and not ipaddress.ip_address(host).is_loopback:
+            raise ValueError(f"Workers must reach each other on a loopback address, not {host}")
+        self.worker_id = worker_id
+        self.host = host
+        self.port = port
+        self.url = f"http://{host}:{port}"  # Where other workers reach this one's internal app
+        self.registry = registry
+        self.on_sync = on_sync  # Called with the recipient changes each sync applied
+        self.interval = interval
+        self.timeout = timeout
+        self.members: Dict[str, str] = {worker_id: self.url}  # Live worker ID -> internal URL
+        self.ring = HashRing([worker_id])
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cluster_workers (
+                    worker_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    heartbeat REAL NOT NULL
+                )
+            """)
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[ClientSession] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def _heartbeat(self) -> Dict[str, str]:
+        """Record that this worker is alive and return the live workers"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO cluster_workers (worker_id, url, heartbeat) VALUES (?, ?, ?)
+                ON CONFLICT (worker_id) DO UPDATE SET url = excluded.url, heartbeat = excluded.heartbeat
+                """,
+                (self.worker_id, self.url, now)
+            )
+            rows = self._conn.execute(
+                "SELECT worker_id, url FROM cluster_workers WHERE heartbeat >= ?", (now - self.timeout,)
+            ).fetchall()
+        return dict(rows)
+
+    def _leave(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cluster_workers WHERE worker_id = ?", (self.worker_id,))
+
+    async def start(self, internal_app: web.Application):
+        """Serve internal_app for the other workers, join the cluster and start following changes"""
+        self._session = ClientSession(timeout=ClientTimeout(total=None, sock_connect=5))
+        self._runner = web.AppRunner(internal_app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        await self._refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Leave the cluster so the others take over this worker's partitions right away"""
+        if self._task:
+            self._task.cancel()
+        await asyncio.to_thread(self._leave)
+        if self._session:
+            await self._session.close()
+        if self._runner:
+            await self._runner.cleanup()
+        self._conn.close()
+
+    async def _refresh(self):
+        members = await asyncio.to_thread(self._heartbeat)
+        if members != self.members:
+            logger.info("Cluster membership changed: %d workers", len(members), extra={"workers": sorted(members)})
+            self.members = members
+            self.ring = HashRing(list(members))
+        changes = await self.registry.sync()
+        if changes and self.on_sync:
+            self.on_sync(changes)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._refresh()
+            except Exception as e:
+                logger.error("Cluster sync failed: %s", e)
+
+    def partition(self, conversation_ids) -> Dict[str, List[str]]:
+        """Group conversation IDs by the live worker that owns them"""
+        return self.ring.partition(conversation_ids)
+
+    async def forward(self, worker_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Have another worker deliver a partition; returns its delivery result"""
+        async with self._session.post(f"{self.members[worker_id]}/internal/deliver", json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+ADAPTIVE_CARD_CONTENT_TYPE = "application/vnd.microsoft.card.adaptive"
+
+# Recipient fields that templates and cards can reference as {field}
+TEMPLATE_FIELDS = (
+    "conversation_id",
+    "conversation_type",
+    "conversation_name",
+    "display_name",
+    "team_name",
+    "channel_name",
+    "tenant_id"
+)
+
+
+class MessageTemplate:
+    """
+    A text template with {field} placeholders, parsed once and rendered per recipient
+    """
+
+    # Exactly {field} for a supported field - not {{...}} (Adaptive Card expressions like {{DATE(...)}}) or ${...}
+    _CARD_FIELD_PATTERN = re.compile(r'(?<![{$])\{(' + '|'.join(TEMPLATE_FIELDS) + r')\}(?!\})')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.segments: List[Tuple[str, Optional[str]]] = []  # (literal text, field rendered after it)
+        for literal, field, format_spec, conversion in string.Formatter().parse(source):
+            if field is not None and field not in TEMPLATE_FIELDS:
+                raise ValueError(
+                    f"Unsupported template field {{{field}}} - use one of: {', '.join(TEMPLATE_FIELDS)}"
+                )
+            if format_spec or conversion:
+                raise ValueError(f"Template field {{{field}}} can't have a format spec or conversion")
+            self.segments.append((literal, field))
+        self.fields = [field for _, field in self.segments if field]
+
+    @classmethod
+    def for_card(cls, source: str) -> 'MessageTemplate':
+        """
+        Template for a card string: only exact {field} tokens of supported fields are placeholders, every other
+        brace sequence (card expressions, literal JSON) is kept as is
+        """
+        template = cls.__new__(cls)
+        template.source = source
+        parts = cls._CARD_FIELD_PATTERN.split(source)
+        template.fields = parts[1::2]
+        template.segments = list(zip(parts[0::2], template.fields + [None]))
+        return template
+
+    def render(self, recipient_info: Dict[str, Any]) -> str:
+        return ''.join(
+            literal + (str(recipient_info.get(field) or '') if field else '')
+            for literal, field in self.segments
+        )
+
+
+class CompiledMessage:
+    """
+    Outgoing message (text, template and/or Adaptive Card) compiled once per broadcast. The activity
+    body is serialized to JSON once; only personalized fields are escaped and spliced in per recipient.
+    """
+
+    def __init__(self, text: Optional[str] = None, template: Optional[str] = None,
+                 card: Optional[Dict[str, Any]] = None):
+        if card is not None and not isinstance(card, dict):
+            raise ValueError("card must be an Adaptive Card JSON object")
+        if text is not None and template is not None:
+            raise ValueError("message and template can't be combined; put the message text in the template")
+        self.contents = [(text, template, card)]  # What it was compiled from, to compile it again elsewhere
+        self._compile(text, template, [card] if card is not None else [])
+
+    @classmethod
+    def from_contents(cls, contents: List[Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]]]) -> 'CompiledMessage':
+        """The message compiled from another one's contents (e.g. forwarded to another worker)"""
+        return cls(*contents[0]) if len(contents) == 1 else cls.merged(contents)
+
+    @classmethod
+    def merged(cls, messages: List[Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]]]) -> 'CompiledMessage':
+        """
+        One message combining several (text, template, card) messages: their texts joined by blank
+        lines and their cards as separate attachments
+        """
+        texts = []
+        cards = []
+        for text, template, card in messages:
+            if template is not None:
+                texts.append(template)
+            elif text is not None:
+                # Plain text joins a template, so its braces are escaped
+                texts.append(text.replace('{', '{{').replace('}', '}}'))
+            if card is not None:
+                cards.append(card)
+        message = cls.__new__(cls)
+        message.contents = [tuple(contents) for contents in messages]
+        message._compile(None, "\n\n".join(texts) if texts else None, cards)
+        return message
+
+    def _compile(self, text: Optional[str], template: Optional[str], cards: List[Dict[str, Any]]):
+        # A marker stands in for a personalized field while the body is serialized (JSON escapes \x00 as
+        # \u0000). Its random key keeps text that happens to look like a marker from being taken for one.
+        key = uuid.uuid4().hex
+        self._marker = f"\x00{key}:{{}}\x00"
+        body: Dict[str, Any] = {"type": "message", "inputHint": "acceptingInput"}
+        if template is not None:
+            body["text"] = self._mark(MessageTemplate(template))
+        elif text is not None:
+            body["text"] = text
+        if cards:
+            body["attachments"] = [
+                {"contentType": ADAPTIVE_CARD_CONTENT_TYPE, "content": self._mark_card(card)} for card in cards
+            ]
+
+        # Serialized without the enclosing braces so the per-recipient envelope can be prepended
+        serialized = json.dumps(body, separators=(',', ':'))
+        parts = re.split(r'\\u0000' + key + r':(\w+)\\u0000', serialized[1:-1])
+        self._chunks = parts[0::2]  # Static JSON text
+        self._fields = parts[1::2]  # Field rendered between consecutive chunks
+        # Hashed without the marker key, so the same message compiles to the same hash
+        self.content_hash = hashlib.sha256(
+            json.dumps([self._chunks, self._fields], separators=(',', ':')).encode('utf-8')
+        ).hexdigest()
+        self.personalized = bool(self._fields)
+
+    def _mark(self, template: MessageTemplate) -> str:
+        return ''.join(
+            literal + (self._marker.format(field) if field else '')
+            for literal, field in template.segments
+        )
+
+    def _mark_card(self, value: Any) -> Any:
+        """Copy of the card with {field} placeholders in string values replaced by markers"""
+        if isinstance(value, dict):
+            return {key: self._mark_card(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._mark_card(item) for item in value]
+        if isinstance(value, str) and '{' in value:
+            return self._mark(MessageTemplate.for_card(value))
+        return value
+
+    def render(self, recipient_info: Dict[str, Any]) -> str:
+        """JSON members of the message for one recipient (without braces)"""
+        if not self.personalized:
+            return self._chunks[0]
+        rendered = [self._chunks[0]]
+        for field, chunk in zip(self._fields, self._chunks[1:]):
+            rendered.append(json.dumps(str(recipient_info.get(field) or ''))[1:-1])
+            rendered.append(chunk)
+        return ''.join(rendered)
+
+    def body(self, conversation_ref: ConversationReference, recipient_info: Dict[str, Any]) -> bytes:
+        """Complete activity JSON addressed to the recipient's conversation"""
+        return f"{{{_activity_envelope(conversation_ref)},{self.render(recipient_info)}}}".encode('utf-8')
+
+
+def _account_json(account) -> Optional[Dict[str, Any]]:
+    if account is None:
+        return None
+    return {key: value for key, value in (("id", account.id), ("name", account.name)) if value is not None}
+
+
+def _activity_envelope(conversation_ref: ConversationReference) -> str:
+    """
+    JSON members addressing an outgoing activity, as TurnContext.send_activity serializes them.
+    Proactive messages are new posts, not replies, so there's no replyToId.
+    """
+    conversation = conversation_ref.conversation
+    envelope = {
+        "channelId": conversation_ref.channel_id,
+        "serviceUrl": conversation_ref.service_url,
+        "conversation": {
+            key: value for key, value in (
+                ("id", conversation.id),
+                ("conversationType", conversation.conversation_type),
+                ("isGroup", conversation.is_group),
+                ("name", conversation.name),
+                ("tenantID", conversation.tenant_id)
+            ) if value is not None
+        } if conversation else None,
+        "from": _account_json(conversation_ref.bot),
+        "recipient": _account_json(conversation_ref.user)
+    }
+    return json.dumps({key: value for key, value in envelope.items() if value is not None}, separators=(',', ':'))[1:-1]
+
+
+def _token_expiry(token: str) -> Optional[float]:
+    """Expiry (epoch seconds) of a JWT access token from its exp claim, without verifying it"""
+    try:
+        payload = token.split('.')[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class ConnectorError(Exception):
+    """
+    A Bot Connector call answered with an error status. Keeps the response (status and headers) for
+    the retry logic, like msrest's ErrorResponseException does.
+    """
+
+    def __init__(self, response, body: bytes):
+        self.response = response
+        try:
+            error = json.loads(body)["error"]
+            detail = f"{error.get('code')}: {error.get('message')}"
+        except (ValueError, KeyError, TypeError, AttributeError):
+            detail = body[:200].decode(errors='replace')
+        super().__init__(f"Bot Connector returned {response.status} {response.reason}: {detail}")
+
+
+class ConnectorPool:
+    """
+    Keep-alive HTTP sessions per Bot Connector service_url for proactive sends, authenticated with an app
+    token that's renewed in the background before it expires. Replaces going through
+    adapter.continue_conversation for every recipient, which fetched the token synchronously on the event
+    loop and sent through a thread pool whose per-host connection pool was smaller than the send concurrency.
+    """
+
+    def __init__(self, app_id: str, app_password: str,
+                 connections_per_service_url: int = SEND_CONCURRENCY_PER_SERVICE_URL):
+        _import_bot_framework()
+        # No app ID means unauthenticated (e.g. the Bot Framework Emulator), as in BotFrameworkAdapter
+        self.credentials = MicrosoftAppCredentials(app_id, app_password) if app_id else None
+        self.connections_per_service_url = connections_per_service_url
+        self._sessions: Dict[str, ClientSession] = {}
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.token_refreshes = 0
+        self.token_waits = 0  # Sends that had to wait for a token
+
+    async def start(self):
+        """Fetch the first token and keep renewing it ahead of expiry"""
+        if self.credentials:
+            try:
+                await self._fetch_token("background")
+            except Exception as e:
+                # Sends fetch it on demand until the background renewal succeeds
+                logger.warning("Could not fetch the app token: %s", e)
+            self._refresh_task = asyncio.create_task(self._renew_token())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            await session.close()
+
+    async def _fetch_token(self, trigger: str):
+        # MSAL's client is synchronous (and may call AAD), so keep it off the event loop
+        self._token = await asyncio.to_thread(self.credentials.get_access_token)
+        # Tokens without a readable expiry are assumed to last an hour, AAD's default
+        self._token_expires_at = _token_expiry(self._token) or time.time() + 3600
+        self.token_refreshes += 1
+        metrics.token_refreshes.inc(trigger)
+
+    async def _renew_token(self):
+        while True:
+            # MSAL serves its cached token until 5 minutes before expiry, so renew inside that window
+            delay = self._token_expires_at - CONNECTOR_TOKEN_REFRESH_MARGIN - time.time()
+            await asyncio.sleep(max(delay, CONNECTOR_TOKEN_RETRY_DELAY))
+            try:
+                async with self._token_lock:
+                    await self._fetch_token("background")
+            except Exception as e:
+                logger.warning("App token renewal failed: %s", e)
+
+    async def _authorization(self) -> Optional[str]:
+        if not self.credentials:
+            return None
+        if self._token is None or time.time() >= self._token_expires_at - 30:
+            # Background renewal is behind - fetch once for every send waiting on it
+            async with self._token_lock:
+                if self._token is None or time.time() >= self._token_expires_at - 30:
+                    self.token_waits += 1
+                    await self._fetch_token("inline")
+        return f"Bearer {self._token}"
+
+    def _session(self, service_url: str) -> ClientSession:
+        session = self._sessions.get(service_url)
+        if session is not None:
+            self.hits += 1
+            metrics.connector_sessions.inc("hit")
+            return session
+        self.misses += 1
+        metrics.connector_sessions.inc("miss")
+        session = ClientSession(
+            connector=TCPConnector(limit=self.connections_per_service_url,
+                                   keepalive_timeout=CONNECTOR_KEEPALIVE_TIMEOUT),
+            timeout=ClientTimeout(total=CONNECTOR_TIMEOUT)
+        )
+        self._sessions[service_url] = session
+        return session
+
+    async def post(self, conversation_ref: ConversationReference, body: bytes):
+        """POST a pre-serialized activity to the reference's conversation (Conversations.send_to_conversation)"""
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        authorization = await self._authorization()
+        if authorization:
+            headers["Authorization"] = authorization
+
+        service_url = conversation_ref.service_url
+        url = (f"{service_url.rstrip('/')}/v3/conversations/"
+               f"{quote(conversation_ref.conversation.id, safe='')}/activities")
+        async with self._session(service_url).post(url, data=body, headers=headers) as response:
+            response_body = await response.read()
+            if response.status not in (200, 201, 202):
+                raise ConnectorError(response, response_body)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "token_refreshes": self.token_refreshes,
+            "token_waits": self.token_waits
+        }
+
+
+IDEMPOTENCY_MISMATCH_BODY = json.dumps({"error": "Idempotency-Key was already used for a different request"}).encode()
+
+
+class IdempotencyCache:
+    """
+    Results of /send requests by Idempotency-Key: bounded, TTL-expiring and LRU-evicted, optionally
+    persisted to SQLite. A repeated key waits for (or replays) the first request's result. Keys of requests
+    still in flight are never evicted, so a retry can't start a second broadcast.
+    """
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_TTL,
+                 path: Optional[str] = IDEMPOTENCY_DB_FILE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._saving: Set[asyncio.Future] = set()  # Completed results still being written to the database
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._lock, self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS idempotency_keys (
+                        key TEXT PRIMARY KEY,
+                        fingerprint TEXT NOT NULL,
+                        status INTEGER NOT NULL,
+                        body BLOB NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+
+    def _load(self, key: str) -> Optional[Tuple[str, int, bytes]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, status, body FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return (row[0], row[1], bytes(row[2])) if row else None
+
+    def _store(self, key: str, fingerprint: str, status: int, body: bytes, expires_at: float):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, status, body, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, fingerprint, status, body, expires_at)
+                )
+        except Exception as e:
+            logger.error("Error saving idempotency key %s: %s", key, e)
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        ("new", entry) if the caller should process the request and then complete() or abandon() the entry,
+        ("existing", entry) if entry["result"] resolves to the (status, body) to replay,
+        ("mismatch", None) if the key was used for a different request,
+        or ("full", None) if every remembered key belongs to a request still in flight.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry["result"].done() and entry["expires_at"] <= time.time():
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return ("existing", entry) if entry["fingerprint"] == fingerprint else ("mismatch", None)
+
+        if not self._make_room():
+            return "full", None
+        # Registered before any await so concurrent duplicates attach to this entry
+        entry = self._entries[key] = {
+            "fingerprint": fingerprint,
+            "result": asyncio.get_running_loop().create_future(),
+            "expires_at": float("inf")
+        }
+
+        if self._conn is not None:
+            stored = await asyncio.to_thread(self._load, key)
+            if stored is not None:
+                stored_fingerprint, status, body = stored
+                if stored_fingerprint != fingerprint:
+                    self.abandon(key, entry, 422, IDEMPOTENCY_MISMATCH_BODY)
+                    return "mismatch", None
+                entry["result"].set_result((status, body))
+                entry["expires_at"] = time.time() + self.ttl
+                return "existing", entry
+        return "new", entry
+
+    def _make_room(self) -> bool:
+        """Evict the least recently used completed entries to make room for one more; False if there's none"""
+        excess = len(self._entries) - self.max_entries + 1
+        if excess <= 0:
+            return True
+        evictable = []
+        for key, entry in self._entries.items():
+            if entry["result"].done():
+                evictable.append(key)
+                if len(evictable) == excess:
+                    break
+        if len(evictable) < excess:
+            return False
+        for key in evictable:
+            del self._entries[key]
+        return True
+
+    def complete(self, key: str, entry: Dict[str, Any], status: int, body: bytes):
+        """Record the response to replay for the key"""
+        entry["expires_at"] = time.time() + self.ttl
+        if not entry["result"].done():
+            entry["result"].set_result((status, body))
+        if self._conn is not None:
+            saving = asyncio.get_running_loop().run_in_executor(
+                None, self._store, key, entry["fingerprint"], status, body, entry["expires_at"]
+            )
+            self._saving.add(saving)
+            saving.add_done_callback(self._saving.discard)
+
+    def abandon(self, key: str, entry: Dict[str, Any], status: int, body: bytes):
+        """Forget the key (the request failed) so a retry is processed again; current waiters get this response"""
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        if not entry["result"].done():
+            entry["result"].set_result((status, body))
+
+    async def close(self):
+        """Finish writing completed results and close the database"""
+        if self._saving:
+            await asyncio.gather(*self._saving, return_exceptions=True)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+
+class RecentSends:
+    """
+    Bounded record of when each conversation last got each message content, for dedup windows
+    """
+
+    def __init__(self, max_entries: int = DEDUP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._sent_at: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    def record(self, conversation_id: str, content_hash: str):
+        key = (conversation_id, content_hash)
+        self._sent_at[key] = time.monotonic()
+        self._sent_at.move_to_end(key)
+        if len(self._sent_at) > self.max_entries:
+            self._sent_at.popitem(last=False)
+
+    def sent_within(self, conversation_id: str, content_hash: str, window: float) -> bool:
+        sent_at = self._sent_at.get((conversation_id, content_hash))
+        return sent_at is not None and time.monotonic() - sent_at < window
+
+
+def _content_size(text: Optional[str], template: Optional[str], card: Optional[Dict[str, Any]]) -> int:
+    """Rough size of a message's content, for DIGEST_MAX_BYTES"""
+    size = len(template if template is not None else text or '')
+    return size + len(json.dumps(card)) if card is not None else size
+
+
+class _DigestPart:
+    """A message buffered for digests, shared by every conversation it's bound for"""
+
+    __slots__ = ("contents", "message", "size")
+
+    def __init__(self, contents: Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]],
+                 message: CompiledMessage):
+        self.contents = contents
+        self.message = message
+        self.size = _content_size(*contents)
+
+
+class _Digest:
+    """One conversation's buffered messages"""
+
+    __slots__ = ("parts", "size", "deadline")
+
+    def __init__(self, deadline: float):
+        self.parts: List[_DigestPart] = []
+        self.size = 0
+        self.deadline = deadline
+
+
+class DigestBuffer:
+    """
+    Per-conversation buffers of /send messages sent with a digest_window. A conversation's buffered
+    messages go out as one combined activity when the window of its first message ends, or as soon
+    as they reach max_messages or max_bytes. Digests that are due together are delivered together,
+    and stop() sends whatever is still buffered.
+    """
+
+    def __init__(self, deliver, max_messages: int = DIGEST_MAX_MESSAGES, max_bytes: int = DIGEST_MAX_BYTES):
+        self.deliver = deliver  # async deliver({conversation_id: (CompiledMessage, content hashes of its parts)})
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self._pending: Dict[str, _Digest] = {}
+        self._heap: List[Tuple[float, int, str, _Digest]] = []  # (deadline, sequence, conversation ID, digest)
+        self._sequence = 0
+        self._ready: List[Tuple[str, _Digest, str]] = []  # (conversation ID, digest, trigger) to send now
+        self._deliveries: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, conversation_ids: Iterable[str], message: CompiledMessage,
+            contents: Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]], window: float) -> int:
+        """
+        Buffer a message for each conversation, sending it within window seconds. Returns how many
+        conversations had a digest sent right away because it was full (by message count or size).
+        """
+        part = _DigestPart(contents, message)
+        deadline = time.monotonic() + window
+        added = filled = 0
+        for conversation_id in conversation_ids:
+            sent = False
+            digest = self._pending.get(conversation_id)
+            if digest is not None and digest.size + part.size > self.max_bytes:
+                # No room: what's buffered goes now, and this message starts the next digest
+                self._send_now(conversation_id, digest, "full")
+                digest = None
+                sent = True
+            if digest is None:
+                digest = self._pending[conversation_id] = _Digest(deadline)
+                self._push(conversation_id, digest)
+            elif deadline < digest.deadline:
+                digest.deadline = deadline
+                self._push(conversation_id, digest)
+            digest.parts.append(part)
+            digest.size += part.size
+            added += 1
+            if len(digest.parts) >= self.max_messages or digest.size >= self.max_bytes:
+                self._send_now(conversation_id, digest, "full")
+                sent = True
+            filled += sent
+        metrics.digest_messages.inc(amount=added)
+        metrics.digest_pending.set(len(self._pending))
+        self._wakeup.set()
+        return filled
+
+    def _push(self, conversation_id: str, digest: _Digest):
+        heapq.heappush(self._heap, (digest.deadline, self._sequence, conversation_id, digest))
+        self._sequence += 1
+
+    def _send_now(self, conversation_id: str, digest: _Digest, trigger: str):
+        del self._pending[conversation_id]
+        self._ready.append((conversation_id, digest, trigger))
+
+    def _flush(self):
+        """Start delivering the ready digests, one batch per conversation that appears in them more than once"""
+        ready, self._ready = self._ready, []
+        batches: List[Dict[str, Tuple[CompiledMessage, List[str]]]] = []
+        merged: Dict[Tuple[_DigestPart, ...], CompiledMessage] = {}  # Shared by conversations with the same parts
+        for conversation_id, digest, trigger in ready:
+            parts = tuple(digest.parts)
+            message = merged.get(parts)
+            if message is None:
+                message = merged[parts] = parts[0].message if len(parts) == 1 else CompiledMessage.merged(
+                    [part.contents for part in parts]
+                )
+            # A conversation's earlier digest goes in an earlier batch, so its messages keep their order
+            batch = next((batch for batch in batches if conversation_id not in batch), None)
+            if batch is None:
+                batch = {}
+                batches.append(batch)
+            batch[conversation_id] = (message, [part.message.content_hash for part in parts])
+            metrics.digest_flushes.inc(trigger)
+            metrics.digest_calls_saved.inc(amount=len(parts) - 1)
+        metrics.digest_pending.set(len(self._pending))
+        if batches:
+            task = asyncio.create_task(self._deliver(batches))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, batches: List[Dict[str, Tuple[CompiledMessage, List[str]]]]):
+        for batch in batches:
+            try:
+                await self.deliver(batch)
+            except Exception as e:
+                logger.exception("Error sending %d digests: %s", len(batch), e)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, conversation_id, digest = heapq.heappop(self._heap)
+                # Entries of digests already sent, or whose deadline moved, are skipped
+                if self._pending.get(conversation_id) is digest and digest.deadline == deadline:
+                    self._send_now(conversation_id, digest, "window")
+            if self._ready:
+                self._flush()
+            await _wait_event(self._wakeup, self._heap[0][0] - now if self._heap else None)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Send every buffered digest now and wait for the deliveries to finish"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for conversation_id, digest in list(self._pending.items()):
+            self._send_now(conversation_id, digest, "shutdown")
+        self._heap = []
+        self._flush()
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+
+STATUS_FILTERS = ("tag", "team", "channel", "tenant_id", "conversation_type")
+
+
+def _page_params(request: Request, default_limit: Optional[int] = PAGE_SIZE) -> Tuple[int, Optional[int]]:
+    """
+    Parse the cursor and limit query parameters of a paginated endpoint. Without either, the limit is
+    default_limit (None = no pagination).
+    """
+    cursor = request.query.get('cursor')
+    limit = request.query.get('limit')
+    if not cursor and not limit:
+        return -1, default_limit
+    try:
+        after = int(cursor) if cursor else -1
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    try:
+        limit = int(limit) if limit else PAGE_SIZE
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= PAGE_SIZE_MAX:
+        raise ValueError(f"limit must be an integer between 1 and {PAGE_SIZE_MAX}")
+    return after, limit
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names the current entity tag"""
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _cache_headers(etag: str) -> Dict[str, str]:
+    # Clients may keep the response but must revalidate it (cheaply, via If-None-Match) before reuse
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status=304, headers=_cache_headers(etag))
+
+
+WARM_UP_EXEMPT_PATHS = {"/health", "/ready", "/metrics"}  # Answered while the bot is still warming up
+
+STREAM_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+STREAM_ACCEPT_TYPES = {content_type: stream_format for stream_format, content_type in STREAM_CONTENT_TYPES.items()}
+
+
+class TeamsNotificationServer:
+    """
+    HTTP server that hosts the bot and provides API endpoints
+    """
+
+    def __init__(self, worker_index: Optional[int] = None, workers: int = 1):
+        self.worker_index = worker_index
+        self.workers = workers
+
+        # Bot Framework adapter, the bot and its recipients, proactive delivery and (in worker mode) cluster
+        # membership are set up by _warm_up() once the port is open; see GET /ready
+        self.settings: Optional[BotFrameworkAdapterSettings] = None
+        self.adapter: Optional[BotFrameworkAdapter] = None
+        self.connectors: Optional[ConnectorPool] = None
+        self.bot: Optional[NotificationBot] = None
+        self.health: Optional[RecipientHealth] = None
+        self.delivery: Optional[DeliveryEngine] = None
+        self.cluster: Optional[ClusterNode] = None
+        self.startup = StartupProfile()
+        self.ready = False
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self._starting = False  # Warm-up has begun starting background tasks, so shutdown waits for it
+
+        # Durable queue for background broadcasts; in worker mode the workers share it, each running its own jobs
+        self.jobs = JobQueue(owner=None if worker_index is None else f"worker-{worker_index}")
+
+        # Future and recurring broadcasts, kept next to the jobs their runs become
+        self.scheduler = Scheduler(self.jobs.path, owner=self.jobs.owner)
+        self._lag_monitor: Optional[asyncio.Task] = None
+        self._detached: Set[asyncio.Task] = set()  # Broadcasts that outlive a disconnected client
+
+        # Inbound activities acknowledged before they're handled (ACTIVITY_PROCESSING = "queued")
+        self.activities = ActivityQueue()
+
+        # Idempotency-Key results and recently sent content for duplicate suppression
+        self.idempotency = IdempotencyCache()
+        self.recent_sends = RecentSends()
+
+        # Messages held per conversation and combined into one (digest_window)
+        self.digests = DigestBuffer(self._deliver_digests)
+
+    def _load_recipients(self) -> RecipientRegistry:
+        """Open the recipient store and load the registry (in a thread, from the snapshot when it matches)"""
+        # Worker mode: recipients live in the shared SQLite store
+        store = create_recipient_store() if self.worker_index is None else create_recipient_store("sqlite")
+        return RecipientRegistry(store, snapshot_path=RECIPIENTS_SNAPSHOT_FILE)
+
+    async def _warm_up(self):
+        """Import the Bot Framework, load the recipients, then start the background tasks"""
+        try:
+            with self.startup.phase("bot_framework_import"):
+                await asyncio.to_thread(_import_bot_framework)
+            with self.startup.phase("recipients_load"):
+                recipients = await asyncio.to_thread(self._load_recipients)
+            self.startup.details.update(recipients=len(recipients), recipients_source=recipients.loaded_from)
+
+            with self.startup.phase("bot_setup"):
+                self.settings = BotFrameworkAdapterSettings(BOT_ID, APP_PASSWORD)
+                self.adapter = BotFrameworkAdapter(self.settings)
+
+                # Error handler for inbound activities (proactive sends go through ConnectorPool, not the adapter)
+                async def on_error(context: TurnContext, error: Exception):
+                    logger.error("Error: %s", error, exc_info=error)
+                    await context.send_activity(MessageFactory.text(f"Sorry, an error occurred: {str(error)}"))
+
+                self.adapter.on_turn_error = on_error
+
+                # Pooled Bot Connector sessions and app token for proactive sends
+                self.connectors = ConnectorPool(BOT_ID, APP_PASSWORD)
+
+                self.bot = NotificationBot(recipients)
+
+                # Delivery health of each recipient, and skipping/quarantining the unreachable ones
+                self.health = RecipientHealth(recipients)
+
+                if self.worker_index is None:
+                    # Concurrent proactive delivery
+                    self.delivery = DeliveryEngine(health=self.health)
+                else:
+                    # Each worker sends within its share of the global and per-tenant rates
+                    self.delivery = DeliveryEngine(rate_limiter=AdaptiveRateLimiter(
+                        global_rate=RATE_LIMIT_GLOBAL / self.workers, tenant_rate=RATE_LIMIT_PER_TENANT / self.workers
+                    ), health=self.health)
+                    self.cluster = ClusterNode(f"worker-{self.worker_index}", CLUSTER_INTERNAL_HOST,
+                                               CLUSTER_INTERNAL_PORT + self.worker_index, recipients,
+                                               on_sync=self.bot.recipients_synced)
+
+            self._starting = True
+            with self.startup.phase("background_tasks"):
+                await self.connectors.start()
+                await self.activities.start(self._handle_queued_activity)
+                await self.jobs.start(self._run_job)
+                await self.scheduler.start(self._run_schedule)
+                await self.digests.start()
+                await self.health.start()
+                self._lag_monitor = asyncio.create_task(self._monitor_event_loop_lag())
+                if self.cluster:
+                    await self.cluster.start(self.create_internal_app())
+        except Exception:
+            logger.exception("Startup failed")
+            raise
+
+        # What's been loaded lives until shutdown; keep it out of the collector's scans from now on
+        gc.freeze()
+        self.ready = True
+        self.startup.ready()
+        logger.info("Ready in %.0f ms", self.startup.ready_ms, extra=self.startup.summary())
+
+    async def wait_ready(self):
+        """Wait until warm-up has finished, raising the error it failed with"""
+        if self._warm_up_task is None:
+            raise RuntimeError("The app hasn't started")
+        await asyncio.shield(self._warm_up_task)
+
+    @web.middleware
+    async def warm_up_middleware(self, request: Request, handler) -> web.StreamResponse:
+        """Hold requests until warm-up has finished, except the probes that answer during it"""
+        if not self.ready and request.path not in WARM_UP_EXEMPT_PATHS:
+            try:
+                await self.wait_ready()
+            except Exception:
+                return json_response({"error": "The bot failed to start"}, status=503)
+        return await handler(request)
+
+    async def ready_handler(self, request: Request) -> Response:
+        """Readiness probe: 200 with the startup profile once warm-up has finished, 503 until then"""
+        if self.ready:
+            return json_response({"status": "ready", "startup": self.startup.summary()})
+        task = self._warm_up_task
+        if task is not None and task.done() and not task.cancelled() and task.exception() is not None:
+            return json_response({"status": "failed", "error": str(task.exception()),
+                                  "startup": self.startup.summary()}, status=503)
+        return json_response({"status": "warming_up", "startup": self.startup.summary()}, status=503)
+
+    async def messages_handler(self, request: Request) -> Response:
+        """Handle incoming messages from Teams"""
+        started = time.perf_counter()
+        activity_type = "unknown"
+        try:
+            # Parse the activity straight from the request bytes
+            activity = Activity().deserialize(json.loads(await request.read()))
+            activity_type = activity.type or "unknown"
+
+            # Create auth header
             auth_header = request.headers.get("Authorization", "")
 
+            # Invokes and expectReplies activities carry their reply in the response, so they're always handled inline
+            if (ACTIVITY_PROCESSING == "queued" and activity.type != ActivityTypes.invoke
+                    and activity.delivery_mode != DeliveryModes.expect_replies):
+                # Acknowledge once authenticated; a worker runs the bot's handlers
+                identity = await self._authenticate(activity, auth_header)
+                await self.activities.put(activity, identity)
+                metrics.inbound_seconds.observe(time.perf_counter() - started, activity_type, "queued")
+                return Response(status=202)
+
             # Process the activity
             await self.adapter.process_activity(activity, auth_header, self.bot.on_turn)
 
+            metrics.inbound_seconds.observe(time.perf_counter() - started, activity_type, "ok")
             return Response(status=200)
 
+        except (PermissionError, InvalidTokenError) as e:
+            metrics.inbound_seconds.observe(time.perf_counter() - started, activity_type, "unauthorized")
+            logger.warning("Rejected activity: %s", e)
+            return Response(status=401, text=str(e))
+
         except Exception as e:
-            print(f"Error processing message: {e}")
+            metrics.inbound_seconds.observe(time.perf_counter() - started, activity_type, "error")
+            logger.exception("Error processing message: %s", e)
             return Response(status=500, text=str(e))
 
-    async def send_notification_handler(self, request: Request) -> Response:
-        """Send proactive notification to all recipients or targeted recipients"""
+    async def _authenticate(self, activity: Activity, auth_header: str):
+        """Validate an inbound request's JWT against the adapter's settings, as process_activity does"""
+        identity = await JwtTokenValidation.authenticate_request(
+            activity,
+            auth_header,
+            self.settings.credential_provider,
+            await self.settings.channel_provider.get_channel_service(),
+            self.settings.auth_configuration
+        )
+        if not identity.is_authenticated:
+            raise PermissionError("Unauthorized Access. Request is not authorized")
+        return identity
+
+    async def _handle_queued_activity(self, activity: Activity, identity):
+        """Run the bot's handlers for an activity /api/messages already acknowledged"""
+        started = time.perf_counter()
+        activity_type = activity.type or "unknown"
+        try:
+            await self.adapter.process_activity_with_identity(activity, identity, self.bot.on_turn)
+            metrics.queued_activity_seconds.observe(time.perf_counter() - started, activity_type, "ok")
+        except Exception:
+            metrics.queued_activity_seconds.observe(time.perf_counter() - started, activity_type, "error")
+            raise
+
+    async def send_notification_handler(self, request: Request) -> web.StreamResponse:
+        """
+        Send proactive notification to all recipients or targeted recipients. Requests carrying an
+        Idempotency-Key are processed once; repeats get the first request's result.
+        """
+        return await self._idempotent(request, self._send_notification)
+
+    async def send_batch_handler(self, request: Request) -> web.StreamResponse:
+        """
+        Send several notifications, each with its own targeting, as one delivery. Honours
+        Idempotency-Key like /send.
+        """
+        return await self._idempotent(request, self._send_batch)
+
+    async def _idempotent(self, request: Request, process) -> web.StreamResponse:
+        """Run process(request, on_summary=...) once per Idempotency-Key; repeats get the first result"""
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            return await process(request)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            return json_response({"error": "Request body must be JSON"}, status=400)
+        fingerprint = hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+        state, entry = await self.idempotency.claim(idempotency_key, fingerprint)
+        if state == "mismatch":
+            return Response(status=422, body=IDEMPOTENCY_MISMATCH_BODY, content_type="application/json")
+        if state == "full":
+            return json_response({"error": "Too many requests with an Idempotency-Key in progress, retry later"},
+                                 status=503, headers={"Retry-After": "1"})
+        if state == "existing":
+            status, body = await asyncio.shield(entry["result"])
+            return Response(status=status, body=body, content_type="application/json",
+                            headers={"Idempotent-Replayed": "true"})
+
+        # Run detached from the handler so a client that times out (and retries) doesn't cancel the
+        # broadcast; the retry attaches to it instead
+        summary: Dict[str, Any] = {}
+        task = asyncio.create_task(process(request, on_summary=summary.update))
+        self._detached.add(task)
+
+        def finished(task: asyncio.Task):
+            self._detached.discard(task)
+            response = None if task.cancelled() or task.exception() else task.result()
+            if isinstance(response, Response):
+                status, body = response.status, response.body
+            elif response is not None and summary:
+                # Streamed: a repeat gets the final summary
+                status, body = 200, json.dumps(summary).encode('utf-8')
+            else:
+                status, body = 500, json.dumps({"error": "Notification request failed"}).encode('utf-8')
+
+            if status >= 500:
+                self.idempotency.abandon(idempotency_key, entry, status, body)
+            else:
+                self.idempotency.complete(idempotency_key, entry, status, body)
+
+        task.add_done_callback(finished)
+        return await asyncio.shield(task)
+
+    async def _send_notification(self, request: Request, on_summary=None) -> web.StreamResponse:
+        """Targets, validates and delivers (or queues) a /send request; on_summary gets a streamed broadcast's summary"""
         try:
             # Get request data
             data = await request.json()
-            message_text = data.get('message', 'Default notification message')
+            message_text = data.get('message')
+            template = data.get('template')  # Text personalized per recipient, e.g. "Heads up, {team_name}!"
+            card = data.get('card')  # Adaptive Card JSON; string values may use the same {field} placeholders
+            if message_text is None and template is None and card is None:
+                message_text = 'Default notification message'
+
+            # Parse templates and serialize the static parts of the message once for the whole broadcast
+            try:
+                message = CompiledMessage(message_text, template, card)
+            except ValueError as e:
+                return json_response({"error": str(e)}, status=400)
 
             # Targeting options
             target_conversation_ids = data.get('conversation_ids', [])  # List of specific conversation IDs
@@ -300,8 +3743,43 @@ class TeamsNotificationServer:
             target_channels = data.get('channels', [])  # List of channel names
             exclude_conversation_ids = data.get('exclude_conversation_ids', [])  # Exclude specific conversations
 
-            # Load current recipients
-            recipients = self.bot._load_recipients()
+            # Optional cap on in-flight sends for this broadcast (1 reproduces a sequential send)
+            concurrency = data.get('concurrency')
+            if concurrency is not None and (not isinstance(concurrency, int) or isinstance(concurrency, bool)
+                                            or concurrency < 1):
+                return json_response({"error": "concurrency must be a positive integer"}, status=400)
+
+            # Skip conversations that already got this exact message within the window (seconds)
+            dedup_window = data.get('dedup_window', DEDUP_WINDOW)
+            if not isinstance(dedup_window, (int, float)) or isinstance(dedup_window, bool) or dedup_window < 0:
+                return json_response({"error": "dedup_window must be a non-negative number of seconds"}, status=400)
+
+            # Hold the message up to this many seconds, combined with others bound for the same conversation
+            digest_window = data.get('digest_window', DIGEST_WINDOW)
+            if not isinstance(digest_window, (int, float)) or isinstance(digest_window, bool) or digest_window < 0:
+                return json_response({"error": "digest_window must be a non-negative number of seconds"}, status=400)
+            if data.get('digest_window') and (data.get('send_at') is not None or data.get('repeat') is not None):
+                return json_response({"error": "digest_window can't be combined with send_at or repeat"}, status=400)
+
+            # Scheduled mode: persist the broadcast; each run is targeted when it fires
+            if data.get('send_at') is not None or data.get('repeat') is not None:
+                return await self._schedule_notification(data, {
+                    "message": message_text,
+                    "template": template,
+                    "card": card,
+                    "concurrency": concurrency,
+                    "dedup_window": dedup_window,
+                    "targeting_criteria": {
+                        "conversation_ids": target_conversation_ids,
+                        "tags": target_tags,
+                        "teams": target_teams,
+                        "channels": target_channels,
+                        "exclude_conversation_ids": exclude_conversation_ids
+                    }
+                })
+
+            # Current recipients
+            recipients = self.bot.recipients
 
             if not recipients:
                 return json_response({"error": "No recipients found"}, status=400)
@@ -329,133 +3807,799 @@ class TeamsNotificationServer:
                     }
                 }, status=400)
 
-            sent_count = 0
-            errors = []
-            sent_to = []
+            metrics.broadcast_recipients.inc("targeted", amount=len(filtered_recipients))
 
-            # Send message to each filtered recipient
-            for conversation_id, recipient_info in filtered_recipients.items():
-                try:
-                    # Reconstruct conversation reference
-                    conv_ref_data = recipient_info.get('conversation_reference', {})
-
-                    # Create conversation reference
-                    conversation_ref = ConversationReference(
-                        activity_id=conv_ref_data.get('activity_id'),
-                        bot=ChannelAccount(
-                            id=conv_ref_data.get('bot', {}).get('id'),
-                            name=conv_ref_data.get('bot', {}).get('name')
-                        ) if conv_ref_data.get('bot') else None,
-                        channel_id=conv_ref_data.get('channel_id'),
-                        conversation=ConversationAccount(
-                            conversation_type=conv_ref_data.get('conversation', {}).get('conversation_type'),
-                            id=conv_ref_data.get('conversation', {}).get('id'),
-                            is_group=conv_ref_data.get('conversation', {}).get('is_group'),
-                            name=conv_ref_data.get('conversation', {}).get('name'),
-                            tenant_id=conv_ref_data.get('conversation', {}).get('tenant_id')
-                        ) if conv_ref_data.get('conversation') else None,
-                        service_url=conv_ref_data.get('service_url'),
-                        user=ChannelAccount(
-                            id=conv_ref_data.get('user', {}).get('id'),
-                            name=conv_ref_data.get('user', {}).get('name')
-                        ) if conv_ref_data.get('user') else None
-                    )
+            filtered_recipients, deduplicated = self._deduplicate(filtered_recipients, message, dedup_window)
 
-                    # Send proactive message
-                    await self.adapter.continue_conversation(
-                        conversation_ref,
-                        lambda turn_context: self._send_proactive_message(turn_context, message_text),
-                        BOT_ID
-                    )
+            # Leave out conversations the bot can no longer post to, quarantining those failing long enough
+            filtered_recipients, skipped, pruned = self.health.admit(filtered_recipients)
 
-                    sent_count += 1
-                    sent_to.append({
-                        "conversation_id": conversation_id,
-                        "display_name": recipient_info.get('display_name'),
-                        "tags": recipient_info.get('tags', [])
-                    })
-                    print(f"Sent notification to: {recipient_info.get('display_name', conversation_id)}")
+            targeting_criteria = {
+                "conversation_ids": target_conversation_ids,
+                "tags": target_tags,
+                "teams": target_teams,
+                "channels": target_channels,
+                "exclude_conversation_ids": exclude_conversation_ids
+            }
 
-                except Exception as e:
-                    error_msg = f"Failed to send to {recipient_info.get('display_name', conversation_id)}: {str(e)}"
-                    errors.append(error_msg)
-                    print(error_msg)
+            # Streaming mode: per-recipient results and progress are written as delivery happens
+            stream_format = data.get('stream') or STREAM_ACCEPT_TYPES.get(request.headers.get('Accept', ''))
+            if stream_format and stream_format not in STREAM_CONTENT_TYPES:
+                return json_response({"error": "stream must be 'ndjson' or 'sse'"}, status=400)
+            if stream_format and data.get('background'):
+                return json_response({"error": "stream can't be combined with background"}, status=400)
+            if stream_format or data.get('background'):
+                if data.get('digest_window'):
+                    return json_response({"error": "digest_window can't be combined with stream or background"},
+                                         status=400)
+                digest_window = 0  # The default window only applies to plain /send requests
+
+            # Digest mode: buffer the message for each conversation; it's sent combined with the others
+            if digest_window:
+                sent_early = self.digests.add(filtered_recipients, message, (message_text, template, card),
+                                              digest_window)
+                return json_response({
+                    "status": "buffered",
+                    "digest_window": digest_window,
+                    "digested": len(filtered_recipients),
+                    "sent_early": sent_early,
+                    "total_recipients": len(recipients),
+                    "filtered_recipients": len(filtered_recipients),
+                    "deduplicated": deduplicated,
+                    "skipped": len(skipped),
+                    "pruned": len(pruned),
+                    "targeting_criteria": targeting_criteria
+                }, status=202)
+
+            # Background mode: persist the job and return its ID right away
+            if data.get('background'):
+                job_id = await self.jobs.enqueue(
+                    {
+                        "message": message_text,
+                        "template": template,
+                        "card": card,
+                        "concurrency": concurrency,
+                        "targeting_criteria": targeting_criteria
+                    },
+                    list(filtered_recipients.keys())
+                )
+                return json_response({
+                    "job_id": job_id,
+                    "status": "queued",
+                    "total_recipients": len(recipients),
+                    "filtered_recipients": len(filtered_recipients),
+                    "deduplicated": deduplicated,
+                    "skipped": len(skipped),
+                    "pruned": len(pruned),
+                    "targeting_criteria": targeting_criteria
+                }, status=202)
+
+            if stream_format:
+                return await self._stream_delivery(request, stream_format, filtered_recipients, message, concurrency,
+                                                   dedup_window, {
+                    "total_recipients": len(recipients),
+                    "filtered_recipients": len(filtered_recipients),
+                    "deduplicated": deduplicated,
+                    "skipped": len(skipped),
+                    "pruned": len(pruned),
+                    "targeting_criteria": targeting_criteria
+                }, on_summary)
+
+            # Send message to the filtered recipients concurrently
+            delivery = await self._deliver(filtered_recipients, message, concurrency, dedup_window=dedup_window)
+            deduplicated += delivery["deduplicated"]
 
             result = {
-                "sent_count": sent_count,
+                "sent_count": delivery["sent_count"],
                 "total_recipients": len(recipients),
                 "filtered_recipients": len(filtered_recipients),
-                "sent_to": sent_to,
-                "errors": errors,
-                "targeting_criteria": {
-                    "conversation_ids": target_conversation_ids,
-                    "tags": target_tags,
-                    "teams": target_teams,
-                    "channels": target_channels,
-                    "exclude_conversation_ids": exclude_conversation_ids
-                }
+                "deduplicated": deduplicated,
+                "skipped": len(skipped),
+                "pruned": len(pruned),
+                "sent_to": delivery["sent_to"],
+                "errors": delivery["errors"],
+                "elapsed_ms": delivery["elapsed_ms"],
+                "latency_ms": delivery["latency_ms"],
+                "retries": delivery["retries"],
+                "throttled": delivery["throttled"],
+                "rate_limits": delivery["rate_limits"],
+                "connectors": self.connectors.stats(),
+                "targeting_criteria": targeting_criteria
             }
+            if "partitions" in delivery:
+                result["partitions"] = delivery["partitions"]
 
             return json_response(result)
 
         except Exception as e:
-            print(f"Error sending notifications: {e}")
+            logger.exception("Error sending notifications: %s", e)
             return json_response({"error": str(e)}, status=500)
 
-    def _filter_recipients(self, recipients, target_conversation_ids, target_tags, target_teams, target_channels, exclude_conversation_ids):
-        """Filter recipients based on targeting criteria"""
-        filtered = {}
+    async def _schedule_notification(self, data: Dict[str, Any], payload: Dict[str, Any]) -> Response:
+        """Validate a /send request's send_at, repeat and jitter and persist it as a schedule"""
+        try:
+            send_at = _parse_time(data['send_at']) if data.get('send_at') is not None else time.time()
+            every = count = until = None
+            repeat = data.get('repeat')
+            if repeat is not None:
+                if not isinstance(repeat, dict):
+                    raise ValueError("repeat must be an object")
+                every = repeat.get('every')
+                if not isinstance(every, (int, float)) or isinstance(every, bool) or every < SCHEDULE_MIN_INTERVAL:
+                    raise ValueError(f"repeat.every must be a number of seconds, at least {SCHEDULE_MIN_INTERVAL:g}")
+                count = repeat.get('count')
+                if count is not None and (not isinstance(count, int) or isinstance(count, bool) or count < 1):
+                    raise ValueError("repeat.count must be a positive integer")
+                if repeat.get('until') is not None:
+                    until = _parse_time(repeat['until'])
+                    if until < send_at:
+                        raise ValueError("repeat.until is before send_at")
+            jitter = data.get('jitter', SCHEDULE_JITTER)
+            if not isinstance(jitter, (int, float)) or isinstance(jitter, bool) or jitter < 0:
+                raise ValueError("jitter must be a non-negative number of seconds")
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+        if data.get('stream'):
+            return json_response({"error": "stream can't be combined with send_at or repeat"}, status=400)
 
-        for conversation_id, recipient_info in recipients.items():
-            # Skip if explicitly excluded
-            if conversation_id in exclude_conversation_ids:
-                continue
+        schedule_id = await self.scheduler.add(payload, send_at, every, count, until, jitter)
+        return json_response(await self.scheduler.get(schedule_id), status=202)
 
-            # If no targeting criteria specified, include all (except excluded)
-            if not any([target_conversation_ids, target_tags, target_teams, target_channels]):
-                filtered[conversation_id] = recipient_info
-                continue
+    async def _run_schedule(self, job_id: str, payload: Dict[str, Any]) -> Optional[str]:
+        """Target a scheduled broadcast's run against the current recipients and queue it as a background job"""
+        if await self.jobs.get(job_id) is not None:
+            return None  # Queued just before a restart
 
-            # Check specific conversation IDs
-            if target_conversation_ids and conversation_id in target_conversation_ids:
-                filtered[conversation_id] = recipient_info
-                continue
+        criteria = payload["targeting_criteria"]
+        filtered_recipients = self._filter_recipients(
+            self.bot.recipients,
+            criteria["conversation_ids"],
+            criteria["tags"],
+            criteria["teams"],
+            criteria["channels"],
+            criteria["exclude_conversation_ids"]
+        )
+        if payload.get("dedup_window"):
+            message = CompiledMessage(payload.get("message"), payload.get("template"), payload.get("card"))
+            filtered_recipients, _ = self._deduplicate(filtered_recipients, message, payload["dedup_window"])
+        if not filtered_recipients:
+            return "No recipients match the targeting criteria"
 
-            # Check tags
-            if target_tags:
-                recipient_tags = recipient_info.get('tags', [])
-                if any(tag in recipient_tags for tag in target_tags):
-                    filtered[conversation_id] = recipient_info
-                    continue
+        metrics.broadcast_recipients.inc("targeted", amount=len(filtered_recipients))
+        await self.jobs.enqueue(
+            {key: payload.get(key) for key in ("message", "template", "card", "concurrency", "targeting_criteria")},
+            list(filtered_recipients.keys()),
+            job_id=job_id
+        )
+        return None
 
-            # Check team names
-            if target_teams:
-                team_name = recipient_info.get('team_name', '').lower()
-                if any(team.lower() in team_name for team in target_teams):
-                    filtered[conversation_id] = recipient_info
-                    continue
+    async def _send_batch(self, request: Request, on_summary=None) -> Response:
+        """
+        Resolve every item's targets against the registry, merge the items bound for the same
+        conversation into one activity and deliver them all in a single concurrent pass
+        """
+        try:
+            data = await request.json()
+            items = data.get('items')
+            if not isinstance(items, list) or not items:
+                return json_response({"error": "items must be a non-empty list"}, status=400)
+            if len(items) > BATCH_MAX_ITEMS:
+                return json_response({"error": f"A batch can have at most {BATCH_MAX_ITEMS} items"}, status=400)
+
+            concurrency = data.get('concurrency')
+            if concurrency is not None and (not isinstance(concurrency, int) or isinstance(concurrency, bool)
+                                            or concurrency < 1):
+                return json_response({"error": "concurrency must be a positive integer"}, status=400)
+            for option in ('dedup_window', 'background', 'stream'):
+                if data.get(option):
+                    return json_response({"error": f"{option} isn't supported by /send/batch"}, status=400)
+
+            recipients = self.bot.recipients
+            if not recipients:
+                return json_response({"error": "No recipients found"}, status=400)
+
+            contents = []  # (text, template, card) of each item
+            messages = []
+            item_results = []
+            targets: Dict[str, List[int]] = {}  # Conversation ID -> indexes of the items bound for it
+            for index, item in enumerate(items):
+                if not isinstance(item, dict):
+                    return json_response({"error": f"items[{index}] must be an object"}, status=400)
+                message_text, template, card = item.get('message'), item.get('template'), item.get('card')
+                if message_text is None and template is None and card is None:
+                    message_text = 'Default notification message'
+                try:
+                    messages.append(CompiledMessage(message_text, template, card))
+                except ValueError as e:
+                    return json_response({"error": f"items[{index}]: {e}"}, status=400)
+                contents.append((message_text, template, card))
+
+                matched = recipients.index.match(
+                    item.get('conversation_ids', []),
+                    item.get('tags', []),
+                    item.get('teams', []),
+                    item.get('channels', []),
+                    item.get('exclude_conversation_ids', [])
+                )
+                for conversation_id in matched:
+                    targets.setdefault(conversation_id, []).append(index)
+                item_results.append({
+                    "index": index,
+                    "id": item.get('id'),
+                    "filtered_recipients": len(matched),
+                    "merged": 0,
+                    "sent_count": 0,
+                    "failed_count": 0,
+                    "skipped": 0,
+                    "sent_to": [],
+                    "errors": [] if matched else ["No recipients match the targeting criteria"]
+                })
 
-            # Check channel names
-            if target_channels:
-                channel_name = recipient_info.get('channel_name', '').lower()
-                if any(channel.lower() in channel_name for channel in target_channels):
-                    filtered[conversation_id] = recipient_info
+            if not targets:
+                return json_response({
+                    "error": "No recipients match the targeting criteria",
+                    "total_recipients": len(recipients),
+                    "items": item_results
+                }, status=400)
+
+            # One compiled message per distinct combination of items; most conversations get a single item
+            plan: Dict[Tuple[int, ...], CompiledMessage] = {}
+            conversation_items: Dict[str, Tuple[int, ...]] = {}
+            for conversation_id, indexes in targets.items():
+                key = tuple(indexes)
+                if key not in plan:
+                    plan[key] = messages[key[0]] if len(key) == 1 else CompiledMessage.merged(
+                        [contents[index] for index in key]
+                    )
+                conversation_items[conversation_id] = key
+                if len(key) > 1:
+                    for index in key:
+                        item_results[index]["merged"] += 1
+            batch_recipients = {conversation_id: recipients[conversation_id] for conversation_id in targets}
+            metrics.broadcast_recipients.inc("targeted", amount=len(batch_recipients))
+            deliverable, skipped, pruned = self.health.admit(batch_recipients)
+            for conversation_id in skipped + pruned:
+                for index in conversation_items[conversation_id]:
+                    item_results[index]["skipped"] += 1
+
+            def on_result(conversation_id, error, entry):
+                for index in conversation_items[conversation_id]:
+                    item_result = item_results[index]
+                    if error is None:
+                        item_result["sent_count"] += 1
+                        item_result["sent_to"].append(entry)
+                    else:
+                        item_result["failed_count"] += 1
+                        display_name = batch_recipients[conversation_id].get('display_name', conversation_id)
+                        item_result["errors"].append(f"Failed to send to {display_name}: {error}")
+
+            delivery = await self._deliver(
+                deliverable,
+                {conversation_id: plan[conversation_items[conversation_id]] for conversation_id in deliverable},
+                concurrency,
+                on_result=on_result,
+                collect=False
+            )
+
+            result = {
+                "items": item_results,
+                "total_recipients": len(recipients),
+                "conversations": len(batch_recipients),
+                "merged_conversations": sum(1 for key in conversation_items.values() if len(key) > 1),
+                "skipped": len(skipped),
+                "pruned": len(pruned),
+                "sent_count": delivery["sent_count"],
+                "failed_count": delivery["failed_count"],
+                "elapsed_ms": delivery["elapsed_ms"],
+                "latency_ms": delivery["latency_ms"],
+                "retries": delivery["retries"],
+                "throttled": delivery["throttled"],
+                "rate_limits": delivery["rate_limits"],
+                "connectors": self.connectors.stats()
+            }
+            if "partitions" in delivery:
+                result["partitions"] = delivery["partitions"]
+            return json_response(result)
+
+        except Exception as e:
+            logger.exception("Error sending notification batch: %s", e)
+            return json_response({"error": str(e)}, status=500)
+
+    async def _stream_delivery(self, request: Request, stream_format: str, recipients: Dict[str, Any],
+                               message: CompiledMessage, concurrency: Optional[int], dedup_window: float,
+                               summary: Dict[str, Any], on_summary=None) -> web.StreamResponse:
+        """
+        Deliver to recipients while streaming a start event, each recipient's result, periodic progress
+        counters and a final summary as NDJSON or Server-Sent Events. Results are written out as they
+        arrive instead of being collected, so memory use doesn't grow with the audience. If the client
+        disconnects, or stops reading for STREAM_WRITE_TIMEOUT, the stream is dropped and delivery still
+        runs to completion.
+        """
+        response = web.StreamResponse(headers={
+            "Content-Type": STREAM_CONTENT_TYPES[stream_format],
+            "Cache-Control": "no-cache"
+        })
+        await response.prepare(request)
+
+        # Bounded, so delivery waits for a slow client instead of buffering every result
+        events: asyncio.Queue = asyncio.Queue(STREAM_BUFFER_SIZE)
+        progress = {"sent": 0, "failed": 0, "pending": len(recipients)}
+        started = time.perf_counter()
+
+        def encode(event: str, data: Dict[str, Any]) -> bytes:
+            if stream_format == "sse":
+                return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+            return (json.dumps({"event": event, **data}) + "\n").encode()
+
+        client = {"connected": True}
+
+        async def write_events() -> bool:
+            while True:
+                # Write everything that's queued in one go; None marks the end of the stream
+                chunk = [await events.get()]
+                while not events.empty():
+                    chunk.append(events.get_nowait())
+                if client["connected"]:
+                    try:
+                        await asyncio.wait_for(response.write(b"".join(event for event in chunk if event is not None)),
+                                               STREAM_WRITE_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        client["connected"] = False
+                        logger.warning("Streaming client stopped reading, dropping the stream; delivery continues")
+                        if request.transport is not None:
+                            request.transport.close()
+                    except (ConnectionError, RuntimeError):
+                        client["connected"] = False
+                        logger.info("Streaming client disconnected, delivery continues")
+                if chunk[-1] is None:
+                    return client["connected"]
+
+        async def report_progress():
+            while True:
+                await asyncio.sleep(STREAM_PROGRESS_INTERVAL)
+                await events.put(encode("progress", {
+                    **progress,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+                }))
+
+        async def on_result(conversation_id: str, error: Optional[str], entry: Dict[str, Any]):
+            progress["failed" if error else "sent"] += 1
+            progress["pending"] -= 1
+            # Nobody is reading any more, so results are dropped instead of queued
+            if client["connected"]:
+                await events.put(encode("result", {"status": "failed" if error else "sent", **entry}))
+
+        async def broadcast():
+            reporter = asyncio.create_task(report_progress())
+            try:
+                delivery = await self._deliver(
+                    recipients,
+                    message,
+                    concurrency,
+                    on_result=on_result,
+                    collect=False,
+                    dedup_window=dedup_window,
+                    # Results waiting for room in the queue count against the same bound as the queue itself
+                    pending_results=STREAM_BUFFER_SIZE
+                )
+                delivery["deduplicated"] += summary["deduplicated"]
+                summary.update(delivery)
+                if on_summary:
+                    on_summary(summary)
+                await events.put(encode("summary", summary))
+            except Exception as e:
+                logger.exception("Error streaming notifications: %s", e)
+                await events.put(encode("error", {"error": str(e), **progress}))
+            finally:
+                reporter.cancel()
+                await events.put(None)
+
+        writer = asyncio.create_task(write_events())
+        await events.put(encode("start", summary))
+        broadcast_task = asyncio.create_task(broadcast())
+        self._detached.update((writer, broadcast_task))
+        for task in (writer, broadcast_task):
+            task.add_done_callback(self._detached.discard)
+
+        # aiohttp cancels the handler when the client disconnects; the shielded broadcast keeps going
+        await asyncio.shield(broadcast_task)
+        if await writer:
+            await response.write_eof()
+        return response
+
+    async def _deliver(self, recipients: Dict[str, Any], message, concurrency: Optional[int] = None,
+                       on_result=None, collect: bool = True, dedup_window: float = 0,
+                       content_hashes: Optional[Dict[str, List[str]]] = None,
+                       pending_results: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Deliver message (one CompiledMessage, or a conversation ID -> CompiledMessage dict) to recipients,
+        split across the cluster in worker mode. Takes the DeliveryEngine.deliver options. In worker mode
+        dedup_window is checked again by the worker that owns each conversation, and the result counts
+        those it left out under `deduplicated`. content_hashes (conversation ID -> hashes) replaces what
+        each send records for dedup windows.
+        """
+        if self.cluster:
+            return await self._deliver_partitioned(recipients, message, concurrency, on_result, collect,
+                                                   dedup_window, content_hashes, pending_results)
+        delivery = await self._deliver_local(recipients, message, concurrency, on_result, collect,
+                                             content_hashes, pending_results)
+        delivery["deduplicated"] = 0  # Already checked by the caller against this worker's recent sends
+        return delivery
+
+    def _deduplicate(self, recipients: Dict[str, Any], message, dedup_window: float) -> Tuple[Dict[str, Any], int]:
+        """Leave out conversations this worker already sent the same message within dedup_window"""
+        if not dedup_window:
+            return recipients, 0
+        kept = {
+            conversation_id: recipient_info for conversation_id, recipient_info in recipients.items()
+            if not self.recent_sends.sent_within(
+                conversation_id,
+                (message[conversation_id] if isinstance(message, dict) else message).content_hash,
+                dedup_window
+            )
+        }
+        return kept, len(recipients) - len(kept)
+
+    async def _deliver_local(self, recipients: Dict[str, Any], message, concurrency: Optional[int], on_result,
+                             collect: bool, content_hashes: Optional[Dict[str, List[str]]],
+                             pending_results: Optional[int]) -> Dict[str, Any]:
+        """Deliver message (as for _deliver) to recipients from this worker"""
+        def send_one(conversation_id: str, recipient_info: Dict[str, Any]):
+            return self._deliver_to_recipient(
+                conversation_id,
+                recipient_info,
+                message[conversation_id] if isinstance(message, dict) else message,
+                content_hashes[conversation_id] if content_hashes else None
+            )
+
+        return await self.delivery.deliver(recipients, send_one, concurrency=concurrency, on_result=on_result,
+                                           collect=collect, pending_results=pending_results)
+
+    async def _deliver_partitioned(self, recipients: Dict[str, Any], message, concurrency: Optional[int],
+                                   on_result, collect: bool, dedup_window: float,
+                                   content_hashes: Optional[Dict[str, List[str]]],
+                                   pending_results: Optional[int]) -> Dict[str, Any]:
+        """
+        Split a delivery across the cluster by conversation ID: this worker delivers its own partition
+        and forwards the others to their owners, CLUSTER_FORWARD_CHUNK recipients at a time, so a
+        conversation is always sent to (and rate limited for) by one worker. Every recipient's result
+        reaches on_result here, wherever it was sent from. A `concurrency` cap is shared out between
+        the partitions.
+        """
+        started = time.perf_counter()
+        partitions = self.cluster.partition(recipients)
+        if concurrency:
+            concurrency = -(-concurrency // len(partitions))
+        sent_to = []
+        errors = []
+        latencies = []
+        counters = {"sent": 0, "failed": 0, "deduplicated": 0, "retries": 0, "throttled": 0}
+
+        async def merge_result(conversation_id: str, error: Optional[str], entry: Dict[str, Any]):
+            if error is None:
+                counters["sent"] += 1
+                if collect or len(latencies) < LATENCY_SAMPLE_SIZE:
+                    latencies.append(entry["latency_ms"])
+                else:
+                    slot = random.randrange(counters["sent"])
+                    if slot < LATENCY_SAMPLE_SIZE:
+                        latencies[slot] = entry["latency_ms"]
+                if collect:
+                    sent_to.append(entry)
+            else:
+                counters["failed"] += 1
+                if collect:
+                    display_name = recipients[conversation_id].get('display_name', conversation_id)
+                    errors.append(f"Failed to send to {display_name}: {error}")
+            if on_result:
+                pending = on_result(conversation_id, error, entry)
+                if inspect.isawaitable(pending):
+                    await pending
+
+        async def deliver_here(partition: Dict[str, Any]):
+            partition, deduplicated = self._deduplicate(partition, message, dedup_window)
+            result = await self._deliver_local(partition, message, concurrency, merge_result, False,
+                                               content_hashes, pending_results)
+            counters["deduplicated"] += deduplicated
+            counters["retries"] += result["retries"]
+            counters["throttled"] += result["throttled"]
+
+        def forward_payload(partition: Dict[str, Any]) -> Dict[str, Any]:
+            payload = {"recipients": partition, "concurrency": concurrency, "dedup_window": dedup_window}
+            if isinstance(message, dict):
+                # Each distinct message is compiled again once by the owner, however many conversations share it
+                indexes: Dict[int, int] = {}
+                messages = []
+                message_index = {}
+                for conversation_id in partition:
+                    conversation_message = message[conversation_id]
+                    if id(conversation_message) not in indexes:
+                        indexes[id(conversation_message)] = len(messages)
+                        messages.append(conversation_message.contents)
+                    message_index[conversation_id] = indexes[id(conversation_message)]
+                payload.update(messages=messages, message_index=message_index)
+            else:
+                payload["messages"] = [message.contents]
+            if content_hashes:
+                payload["content_hashes"] = {conversation_id: content_hashes[conversation_id]
+                                             for conversation_id in partition}
+            return payload
+
+        async def run_partition(worker_id: str, conversation_ids: List[str]):
+            if worker_id == self.cluster.worker_id:
+                await deliver_here({conversation_id: recipients[conversation_id] for conversation_id in conversation_ids})
+                return
+            for start in range(0, len(conversation_ids), CLUSTER_FORWARD_CHUNK):
+                chunk = {conversation_id: recipients[conversation_id]
+                         for conversation_id in conversation_ids[start:start + CLUSTER_FORWARD_CHUNK]}
+                try:
+                    result = await self.cluster.forward(worker_id, forward_payload(chunk))
+                except ClientConnectorError as e:
+                    # Nothing reached the owner (stopped or restarting), so it's safe to send the rest from here
+                    rest = {conversation_id: recipients[conversation_id] for conversation_id in conversation_ids[start:]}
+                    logger.warning("Worker %s unreachable, delivering its %d recipients locally: %s",
+                                   worker_id, len(rest), e)
+                    await deliver_here(rest)
+                    return
+                except Exception as e:
+                    # The owner may have sent part of the chunk - report it failed rather than resend
+                    logger.error("Worker %s failed to deliver %d recipients: %s", worker_id, len(chunk), e)
+                    for conversation_id, recipient_info in chunk.items():
+                        await merge_result(conversation_id, f"worker {worker_id} failed: {e}", {
+                            "conversation_id": conversation_id,
+                            "display_name": recipient_info.get('display_name'),
+                            "error": f"worker {worker_id} failed: {e}"
+                        })
                     continue
+                counters["deduplicated"] += result["deduplicated"]
+                counters["retries"] += result["retries"]
+                counters["throttled"] += result["throttled"]
+                for conversation_id, error, entry in result["results"]:
+                    await merge_result(conversation_id, error, entry)
+
+        await asyncio.gather(*(
+            run_partition(worker_id, conversation_ids) for worker_id, conversation_ids in partitions.items()
+        ))
+        result = {
+            "sent_count": counters["sent"],
+            "failed_count": counters["failed"],
+            "deduplicated": counters["deduplicated"],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "latency_ms": _latency_summary(latencies),
+            "retries": counters["retries"],
+            "throttled": counters["throttled"],
+            "rate_limits": self.delivery.rate_limiter.stats(),
+            "partitions": {worker_id: len(conversation_ids) for worker_id, conversation_ids in partitions.items()}
+        }
+        if collect:
+            result["sent_to"] = sent_to
+            result["errors"] = errors
+        return result
+
+    async def internal_deliver_handler(self, request: Request) -> Response:
+        """Deliver a chunk of a partition forwarded by another worker (worker mode, internal app only)"""
+        data = await request.json()
+        recipients = data['recipients']
+        messages = [CompiledMessage.from_contents(contents) for contents in data['messages']]
+        if 'message_index' in data:
+            message = {conversation_id: messages[index] for conversation_id, index in data['message_index'].items()}
+        else:
+            message = messages[0]
+
+        # This worker owns these conversations, so its record of recent sends is the complete one
+        recipients, deduplicated = self._deduplicate(recipients, message, data.get('dedup_window'))
+
+        results = []
+        delivery = await self._deliver_local(
+            recipients,
+            message,
+            data.get('concurrency'),
+            lambda conversation_id, error, entry: results.append((conversation_id, error, entry)),
+            False,
+            data.get('content_hashes'),
+            None
+        )
+        return json_response({
+            "results": results,
+            "deduplicated": deduplicated,
+            "retries": delivery["retries"],
+            "throttled": delivery["throttled"]
+        })
+
+    async def internal_status_handler(self, request: Request) -> Response:
+        """This worker's view of the cluster and the shared recipients (worker mode, internal app only)"""
+        return json_response({
+            "worker_id": self.cluster.worker_id,
+            "workers": sorted(self.cluster.members),
+            "recipients_count": len(self.bot.recipients),
+            "change_seq": self.bot.recipients.change_seq
+        })
+
+    def create_internal_app(self) -> web.Application:
+        """Endpoints other workers call; served on this worker's internal address, not the public port"""
+        app = web.Application(client_max_size=0)
+        app.router.add_post('/internal/deliver', self.internal_deliver_handler)
+        app.router.add_get('/internal/status', self.internal_status_handler)
+        return app
+
+    async def _run_job(self, job_id: str, payload: Dict[str, Any]):
+        """Deliver the undelivered recipients of a background job, checkpointing progress per chunk"""
+        message = CompiledMessage(payload.get("message"), payload.get("template"), payload.get("card"))
+        pending = await self.jobs.pending_recipients(job_id)
+        recipients = self.bot.recipients
+        logger.info("Running job %s: %d recipients pending", job_id, len(pending))
+
+        for start in range(0, len(pending), JOB_CHUNK_SIZE):
+            chunk = pending[start:start + JOB_CHUNK_SIZE]
+            results = []
+
+            # Recipients removed since the job was queued are skipped
+            chunk_recipients = {}
+            for conversation_id in chunk:
+                if conversation_id in recipients:
+                    chunk_recipients[conversation_id] = recipients[conversation_id]
+                else:
+                    results.append((conversation_id, "skipped", "Recipient no longer registered"))
+            chunk_recipients, skipped, pruned = self.health.admit(chunk_recipients)
+            results.extend((conversation_id, "skipped", "Recipient unreachable (403/404)") for conversation_id in skipped)
+            results.extend((conversation_id, "skipped", "Recipient quarantined") for conversation_id in pruned)
+
+            def on_result(conversation_id, error, entry):
+                results.append((conversation_id, "failed" if error else "sent", error))
+
+            try:
+                await self._deliver(chunk_recipients, message, payload.get("concurrency"),
+                                    on_result=on_result, collect=False)
+            finally:
+                # Checkpoint whatever finished, even if the worker is being cancelled
+                await asyncio.shield(self.jobs.record_results(job_id, results))
+
+    async def job_status_handler(self, request: Request) -> Response:
+        """Get progress of a background broadcast job"""
+        job = await self.jobs.get(request.match_info['job_id'])
+        if job is None:
+            return json_response({"error": "Job not found"}, status=404)
+        return json_response(job)
+
+    async def schedules_handler(self, request: Request) -> Response:
+        """List scheduled broadcasts in creation order, optionally filtered by status"""
+        try:
+            after, limit = _page_params(request)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+        schedules, next_after = await self.scheduler.page(request.query.get('status'), after, limit)
+        return json_response({
+            "schedules": schedules,
+            "next_cursor": None if next_after is None else str(next_after)
+        })
+
+    async def schedule_status_handler(self, request: Request) -> Response:
+        """Get a scheduled broadcast with its next run and the job of its last run"""
+        schedule = await self.scheduler.get(request.match_info['schedule_id'])
+        if schedule is None:
+            return json_response({"error": "Schedule not found"}, status=404)
+        return json_response(schedule)
+
+    async def cancel_schedule_handler(self, request: Request) -> Response:
+        """Cancel a scheduled broadcast's future runs (jobs already queued keep running)"""
+        schedule_id = request.match_info['schedule_id']
+        cancelled = await self.scheduler.cancel(schedule_id)
+        schedule = await self.scheduler.get(schedule_id)
+        if schedule is None:
+            return json_response({"error": "Schedule not found"}, status=404)
+        if not cancelled:
+            return json_response({"error": f"Schedule is already {schedule['status']}"}, status=409)
+        return json_response(schedule)
 
-        return filtered
+    async def metrics_handler(self, request: Request) -> Response:
+        """Counters and latency histograms in the Prometheus text format (startup times while warming up)"""
+        if self.ready:
+            metrics.recipients.set(len(self.bot.recipients))
+            metrics.quarantined_recipients.set(len(self.bot.recipients.quarantined))
+        return Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                        headers={"Cache-Control": "no-cache"})
 
-    async def _send_proactive_message(self, turn_context: TurnContext, message_text: str):
-        """Send the actual proactive message"""
-        message = MessageFactory.text(f"{message_text}")
-        await turn_context.send_activity(message)
+    async def _monitor_event_loop_lag(self, interval: float = EVENT_LOOP_LAG_INTERVAL):
+        """Measure how much later than scheduled the event loop wakes a sleeping task"""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + interval
+            await asyncio.sleep(interval)
+            metrics.event_loop_lag.observe(max(loop.time() - scheduled, 0.0))
+
+    async def start_background_tasks(self, app: web.Application):
+        """
+        Warm up in the background: the job workers, the scheduler, the event loop lag probe and (in worker mode)
+        cluster membership start once the recipients are loaded, while /health and /ready already answer
+        """
+        self._warm_up_task = asyncio.create_task(self._warm_up())
+
+    async def stop_background_tasks(self, app: web.Application):
+        """Stop the job workers and persist pending recipient changes when the app shuts down"""
+        if self._warm_up_task is not None:
+            if not self._starting:
+                # Still importing or loading, so there's nothing to stop or save yet
+                self._warm_up_task.cancel()
+            await asyncio.gather(self._warm_up_task, return_exceptions=True)
+        await self.idempotency.close()
+        if not self.ready:
+            return
+        if self._lag_monitor:
+            self._lag_monitor.cancel()
+        if self.cluster:
+            await self.cluster.stop()
+        await self.activities.stop()
+        await self.scheduler.stop()
+        await self.digests.stop()
+        await self.health.stop()
+        await self.jobs.stop()
+        await self.connectors.stop()
+        await self.bot.recipients.flush()
+        await asyncio.to_thread(self.bot.recipients.save_snapshot)
+
+    def _filter_recipients(self, recipients, target_conversation_ids, target_tags, target_teams, target_channels, exclude_conversation_ids):
+        """Filter recipients based on targeting criteria (any criterion matches) using the registry's index"""
+        matched = recipients.index.match(
+            target_conversation_ids,
+            target_tags,
+            target_teams,
+            target_channels,
+            exclude_conversation_ids
+        )
+        return {conversation_id: recipients[conversation_id] for conversation_id in matched}
+
+    async def _deliver_digests(self, digests: Dict[str, Tuple[CompiledMessage, List[str]]]):
+        """Send flushed digests, leaving out conversations removed or found unreachable since they were buffered"""
+        recipients = self.bot.recipients
+        buffered = {conversation_id: recipients[conversation_id] for conversation_id in digests
+                    if conversation_id in recipients}
+        deliverable, skipped, pruned = self.health.admit(buffered)
+
+        # Each buffered message counts as sent for dedup windows
+        delivery = await self._deliver(
+            deliverable,
+            {conversation_id: digests[conversation_id][0] for conversation_id in deliverable},
+            collect=False,
+            content_hashes={conversation_id: digests[conversation_id][1] for conversation_id in deliverable}
+        )
+        logger.info("Sent %d of %d digests", delivery["sent_count"], len(digests), extra={
+            "failed_count": delivery["failed_count"],
+            "dropped": len(digests) - len(deliverable),
+            "elapsed_ms": delivery["elapsed_ms"]
+        })
+
+    async def _deliver_to_recipient(self, conversation_id: str, recipient_info: Dict[str, Any], message: CompiledMessage,
+                                    content_hashes: Optional[List[str]] = None):
+        """Send a proactive message to a single stored recipient, recording it (or content_hashes) as sent"""
+        conversation_ref = self.bot.recipients.reference(conversation_id, recipient_info)
+        await self.connectors.post(conversation_ref, message.body(conversation_ref, recipient_info))
+        for content_hash in content_hashes or [message.content_hash]:
+            self.recent_sends.record(conversation_id, content_hash)
 
     async def status_handler(self, request: Request) -> Response:
-        """Get bot status and recipient count with detailed information"""
-        recipients = self.bot._load_recipients()
+        """
+        Get bot status and its recipients (a page of them given limit or cursor), optionally filtered by tag,
+        team, channel, tenant_id and conversation_type (all must match)
+        """
+        recipients = self.bot.recipients
+        if _etag_matches(request, recipients.etag):
+            return _not_modified(recipients.etag)
+
+        try:
+            after, limit = _page_params(request, default_limit=None)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+        filters = {key: request.query[key] for key in STATUS_FILTERS if key in request.query}
+        selected = recipients.index.select(**filters)
+        page, next_after = recipients.index.page(selected, after, limit)
+        page_recipients = [(conv_id, recipients[conv_id]) for conv_id in page]
 
         status = {
             "bot_id": BOT_ID,
             "recipients_count": len(recipients),
+            "quarantined_count": len(recipients.quarantined),
+            "matched_count": len(recipients) if selected is None else len(selected),
             "recipients": [
                 {
                     "conversation_id": conv_id,
@@ -464,70 +4608,133 @@ class TeamsNotificationServer:
                     "team_name": info.get('team_name'),
                     "channel_name": info.get('channel_name'),
                     "tags": info.get('tags', []),
-                    "added_at": info.get('added_at')
+                    "added_at": info.get('added_at'),
+                    "health": info.get('health')
                 }
-                for conv_id, info in recipients.items()
-            ]
+                for conv_id, info in page_recipients
+            ],
+            "next_cursor": None if next_after is None else str(next_after)
         }
 
-        return json_response(status)
+        return json_response(status, headers=_cache_headers(recipients.etag))
 
     async def list_targets_handler(self, request: Request) -> Response:
-        """List all available targeting options"""
-        recipients = self.bot._load_recipients()
-
-        # Collect all unique targeting options
-        conversation_ids = list(recipients.keys())
-        all_tags = set()
-        teams = set()
-        channels = set()
-
-        for info in recipients.values():
-            all_tags.update(info.get('tags', []))
-            if info.get('team_name'):
-                teams.add(info['team_name'])
-            if info.get('channel_name'):
-                channels.add(info['channel_name'])
+        """List all available targeting options and the recipients (a page of them given limit or cursor)"""
+        recipients = self.bot.recipients
+        if _etag_matches(request, recipients.etag):
+            return _not_modified(recipients.etag)
+
+        try:
+            after, limit = _page_params(request, default_limit=None)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+        # Facet counts are maintained by the index as recipients change
+        facets = recipients.index.facets()
+        page, next_after = recipients.index.page(None, after, limit)
+        page_recipients = [(conv_id, recipients[conv_id]) for conv_id in page]
 
         targeting_options = {
-            "conversation_ids": conversation_ids,
-            "available_tags": sorted(list(all_tags)),
-            "available_teams": sorted(list(teams)),
-            "available_channels": sorted(list(channels)),
+            "conversation_ids": page,
+            "available_tags": list(facets["tags"]),
+            "available_teams": list(facets["teams"]),
+            "available_channels": list(facets["channels"]),
+            "facets": facets,
             "recipients_summary": [
                 {
                     "conversation_id": conv_id,
                     "display_name": info.get('display_name'),
                     "tags": info.get('tags', [])
                 }
-                for conv_id, info in recipients.items()
-            ]
+                for conv_id, info in page_recipients
+            ],
+            "next_cursor": None if next_after is None else str(next_after)
         }
 
-        return json_response(targeting_options)
-
+        return json_response(targeting_options, headers=_cache_headers(recipients.etag))
 
-def create_app():
-    """Create the aiohttp web application"""
-    server = TeamsNotificationServer()
+def create_app(worker_index: Optional[int] = None, workers: int = 1):
+    """Create the aiohttp web application (worker_index is this process's slot in worker mode)"""
+    server = TeamsNotificationServer(worker_index, workers)
 
-    app = web.Application()
+    app = web.Application(middlewares=[server.warm_up_middleware])
 
     # Teams webhook endpoint
     app.router.add_post('/api/messages', server.messages_handler)
 
     # API endpoints
     app.router.add_post('/send', server.send_notification_handler)
+    app.router.add_post('/send/batch', server.send_batch_handler)
     app.router.add_get('/status', server.status_handler)
     app.router.add_get('/targets', server.list_targets_handler)
+    app.router.add_get('/jobs/{job_id}', server.job_status_handler)
+    app.router.add_get('/schedules', server.schedules_handler)
+    app.router.add_get('/schedules/{schedule_id}', server.schedule_status_handler)
+    app.router.add_delete('/schedules/{schedule_id}', server.cancel_schedule_handler)
+    app.router.add_get('/metrics', server.metrics_handler)
 
+    # Background job workers
+    app.on_startup.append(server.start_background_tasks)
+    app.on_cleanup.append(server.stop_background_tasks)
 
-    # Health check
+
+    # Health check, and readiness once the recipients are loaded
     app.router.add_get('/health', lambda request: json_response({"status": "healthy"}))
+    app.router.add_get('/ready', server.ready_handler)
 
     return app
 
+
+async def run_worker(worker_index: int, workers: int, host: str = '0.0.0.0', port: int = 3978):
+    """Serve one of `workers` processes; they all listen on the same port (SO_REUSEPORT)"""
+    runner = web.AppRunner(create_app(worker_index, workers))
+    await runner.setup()
+    await web.TCPSite(runner, host, port, reuse_port=True).start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    try:
+        await stopping.wait()
+    finally:
+        await runner.cleanup()
+
+
+def run_workers(workers: int, command: List[str]) -> int:
+    """
+    Start `workers` processes running command + ["--worker-index", i] and wait for them to exit,
+    passing on SIGINT/SIGTERM. Returns the first non-zero exit code.
+    """
+    # Create the shared stores (and migrate recipients.json) once, before the workers open them
+    create_recipient_store("sqlite").close()
+    JobQueue().close()
+    Scheduler().close()
+    processes = [subprocess.Popen(command + ["--worker-index", str(i)]) for i in range(workers)]
+
+    def stop(signum, frame):
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    exit_codes = [process.wait() for process in processes]
+    return next((code for code in exit_codes if code), 0)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teams notification bot")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes sharing port 3978 and the SQLite recipient store (RECIPIENTS_DB_FILE)")
+    parser.add_argument('--worker-index', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_index is not None:
+        configure_logging()
+        asyncio.run(run_worker(args.worker_index, args.workers))
+        sys.exit(0)
+
     # Validate configuration
     if APP_PASSWORD == "YOUR_APP_PASSWORD_HERE":
         print("Please set your APP_PASSWORD in the code!")
@@ -540,10 +4747,22 @@ if __name__ == "__main__":
     print("\nEndpoints:")
     print("  POST /api/messages - Teams webhook")
     print("  POST /send - Send notification (with targeting)")
+    print("  POST /send/batch - Send several notifications in one delivery")
     print("  GET /status - Bot status with recipients")
     print("  GET /targets - List targeting options")
+    print("  GET /jobs/{job_id} - Background job progress")
+    print("  GET /schedules - Scheduled and recurring broadcasts")
+    print("  GET|DELETE /schedules/{schedule_id} - Get or cancel a scheduled broadcast")
+    print("  GET /metrics - Prometheus metrics")
 
     print("  GET /health - Health check")
+    print("  GET /ready - Readiness (503 until recipients are loaded)")
+
+    if args.workers > 1:
+        print(f"\nWorkers: {args.workers}, sharing {RECIPIENTS_DB_FILE}")
+        sys.exit(run_workers(args.workers, [sys.executable, os.path.abspath(__file__), "--workers", str(args.workers)]))
+
+    configure_logging()
 
     # Create and run the app
     app = create_app()
@@ -0,0 +1,42 @@
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from fake_connector import FakeConnector, stub_bot_auth
+from synthetic import make_recipients
+
+import teamsbot
+
+
+@pytest.fixture
+def serve_bot(tmp_path, monkeypatch):
+    """
+    Factory for a running create_app() with synthetic recipients on a fake Bot Connector, in its own directory.
+    Yields (server, client, connector, recipients); sends aren't rate limited.
+    """
+    monkeypatch.chdir(tmp_path)
+    stub_bot_auth()
+
+    @asynccontextmanager
+    async def serve(recipient_count=0, connector=None, **recipient_options):
+        connector = connector or FakeConnector()
+        async with TestServer(connector.create_app()) as connector_server:
+            recipients = make_recipients(recipient_count, service_url=str(connector_server.make_url("/")),
+                                         **recipient_options)
+            with open(teamsbot.RECIPIENTS_FILE, "w") as f:
+                json.dump(recipients, f)
+
+            app = teamsbot.create_app()
+            server = next(route.handler.__self__ for route in app.router.routes()
+                          if route.resource.canonical == "/send")
+            async with TestClient(TestServer(app)) as client:
+                await server.wait_ready()
+                server.delivery = teamsbot.DeliveryEngine(
+                    rate_limiter=teamsbot.AdaptiveRateLimiter(global_rate=1e6, tenant_rate=1e6, conversation_rate=1e6,
+                                                              conversation_burst=1e6),
+                    health=server.health
+                )
+                yield server, client, connector, recipients
+
+    return serve
@@ -0,0 +1,87 @@
+import asyncio
+
+from synthetic import make_install_activity
+
+import teamsbot
+from teamsbot import ActivityQueue
+
+
+def test_workers_handle_items_concurrently_and_survive_errors():
+    handled = []
+    running = {"now": 0, "peak": 0}
+
+    async def handle(number):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.005)
+        running["now"] -= 1
+        if number % 3 == 0:
+            raise ValueError("bad activity")
+        handled.append(number)
+
+    async def run():
+        queue = ActivityQueue(max_size=100, workers=3)
+        await queue.start(handle)
+        for number in range(12):
+            await queue.put(number)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert sorted(handled) == [number for number in range(12) if number % 3]
+    assert running["peak"] == 3
+
+
+def test_a_full_queue_makes_put_wait():
+    async def run():
+        release = asyncio.Event()
+
+        async def handle(number):
+            await release.wait()
+
+        queue = ActivityQueue(max_size=2, workers=1)
+        await queue.start(handle)
+        for number in range(3):
+            await queue.put(number)
+        await asyncio.sleep(0)
+        # One item is being handled and two are queued, so the next put has to wait
+        blocked = asyncio.create_task(queue.put(3))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        assert len(queue) == 2
+        release.set()
+        await blocked
+        await queue.stop()
+        assert len(queue) == 0
+
+    asyncio.run(run())
+
+
+def test_stop_gives_up_on_activities_that_take_too_long():
+    async def run():
+        async def handle(number):
+            await asyncio.sleep(10)
+
+        queue = ActivityQueue(max_size=10, workers=1)
+        await queue.start(handle)
+        for number in range(3):
+            await queue.put(number)
+        await queue.stop(timeout=0.01)
+        return len(queue)
+
+    assert asyncio.run(run()) == 2
+
+
+def test_queued_installs_are_acknowledged_then_stored(serve_bot, monkeypatch):
+    monkeypatch.setattr(teamsbot, "ACTIVITY_PROCESSING", "queued")
+
+    async def run():
+        async with serve_bot(1) as (server, client, connector, recipients):
+            service_url = next(iter(recipients.values()))["service_url"]
+            for i in range(5):
+                activity = make_install_activity(i, service_url=service_url)
+                async with client.post("/api/messages", json=activity) as response:
+                    assert response.status == 202
+            await server.activities._queue.join()
+            assert all(f"19:installed{i}@thread.tacv2" in server.bot.recipients for i in range(5))
+
+    asyncio.run(run())
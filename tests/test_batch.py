@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from fake_connector import FakeConnector
+
+
+class RecordingConnector(FakeConnector):
+    """Fake connector that keeps every activity it accepted, by conversation"""
+
+    def __init__(self):
+        super().__init__()
+        self.activities = {}
+
+    async def activities_handler(self, request):
+        response = await super().activities_handler(request)
+        self.activities.setdefault(request.match_info['conversation_id'], []).append(self.last_activity)
+        return response
+
+
+def conversation(i):
+    return f"19:synthetic{i}@thread.tacv2"
+
+
+def test_items_for_the_same_conversation_share_one_activity(serve_bot):
+    async def run():
+        connector = RecordingConnector()
+        async with serve_bot(8, connector=connector) as (server, client, connector, recipients):
+            items = [
+                {"id": "deploy", "message": "Deploy finished", "tags": ["team:team-0"]},
+                {"id": "oncall", "template": "{display_name} on call",
+                 "card": {"type": "AdaptiveCard", "body": []}, "tags": ["channel:general"]},
+                {"id": "nobody", "message": "Lost", "tags": ["no-such-tag"]},
+            ]
+            async with client.post("/send/batch", json={"items": items}) as response:
+                assert response.status == 200
+                result = await response.json()
+
+            assert (result["conversations"], result["merged_conversations"], result["sent_count"]) == (5, 1, 5)
+            deploy, oncall, nobody = result["items"]
+            assert [item["id"] for item in result["items"]] == ["deploy", "oncall", "nobody"]
+            assert (deploy["filtered_recipients"], deploy["sent_count"], deploy["merged"]) == (4, 4, 1)
+            assert (oncall["filtered_recipients"], oncall["sent_count"], oncall["merged"]) == (2, 2, 1)
+            assert nobody["sent_count"] == 0 and nobody["errors"]
+
+            assert sorted(connector.activities) == sorted(conversation(i) for i in (0, 1, 2, 3, 4))
+            assert all(len(activities) == 1 for activities in connector.activities.values())
+            merged = connector.activities[conversation(0)][0]
+            assert merged["text"] == "Deploy finished\n\nTeam 0 > General on call"
+            assert len(merged["attachments"]) == 1
+            assert connector.activities[conversation(4)][0]["text"] == "Team 1 > General on call"
+            assert connector.activities[conversation(1)][0]["text"] == "Deploy finished"
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("body, error", [
+    ({"items": []}, "items must be a non-empty list"),
+    ({"items": [{"message": "a"}, "b"]}, "items[1] must be an object"),
+    ({"items": [{"message": "a", "template": "b"}]}, "items[0]"),
+    ({"items": [{"message": "a"}], "concurrency": True}, "concurrency"),
+    ({"items": [{"message": "a"}], "dedup_window": 60}, "dedup_window"),
+    ({"items": [{"message": "a"}], "background": True}, "background"),
+    ({"items": [{"message": "a"}], "stream": "ndjson"}, "stream"),
+])
+def test_invalid_batches_are_rejected_as_a_whole(serve_bot, body, error):
+    async def run():
+        async with serve_bot(3) as (server, client, connector, recipients):
+            async with client.post("/send/batch", json=body) as response:
+                assert response.status == 400
+                assert error in (await response.json())["error"]
+            assert connector.received == 0
+
+    asyncio.run(run())
+
+
+def test_a_batch_matching_nobody_fails(serve_bot):
+    async def run():
+        async with serve_bot(3) as (server, client, connector, recipients):
+            async with client.post("/send/batch", json={"items": [{"message": "a", "tags": ["none"]}]}) as response:
+                assert response.status == 400
+                assert (await response.json())["items"][0]["filtered_recipients"] == 0
+
+    asyncio.run(run())
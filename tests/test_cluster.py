@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from synthetic import make_recipients
+
+import teamsbot
+from teamsbot import ClusterNode, HashRing, RecipientRegistry, SqliteRecipientStore
+
+CONVERSATION_IDS = [f"conversation-{i}" for i in range(3000)]
+
+
+def test_partitions_cover_every_key_once():
+    partitions = HashRing(["a", "b", "c"]).partition(CONVERSATION_IDS)
+    assert sorted(partitions) == ["a", "b", "c"]
+    assert sorted(key for keys in partitions.values() for key in keys) == sorted(CONVERSATION_IDS)
+    # Virtual nodes keep the shares roughly even
+    assert all(len(keys) > len(CONVERSATION_IDS) / 6 for keys in partitions.values())
+
+
+def test_losing_a_worker_only_moves_its_own_keys():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b"])
+    assert HashRing(["c", "b", "a"]).partition(CONVERSATION_IDS) == before.partition(CONVERSATION_IDS)
+    moved = [key for key in CONVERSATION_IDS if before.node(key) != after.node(key)]
+    assert moved and all(before.node(key) == "c" for key in moved)
+
+
+@pytest.mark.parametrize("host", ["0.0.0.0", "10.0.0.5"])
+def test_workers_only_listen_on_loopback(tmp_path, host):
+    with pytest.raises(ValueError):
+        ClusterNode("worker", host, 4000, registry=None, path=str(tmp_path / "recipients.db"))
+
+
+def test_changes_since_returns_the_latest_info_per_conversation(tmp_path, monkeypatch):
+    store = SqliteRecipientStore(str(tmp_path / "recipients.db"))
+    recipients = make_recipients(3)
+    first, second, third = recipients
+    store.apply(recipients)
+    seq = store.last_change()
+    store.put(first, {**recipients[first], "display_name": "Renamed"})
+    store.delete(second)
+    latest, changes = store.changes_since(seq)
+    assert latest == store.last_change()
+    assert changes == {first: {**recipients[first], "display_name": "Renamed"}, second: None}
+    assert store.changes_since(latest) == (latest, {})
+
+    # Once the log is trimmed past seq there's nothing to catch up from
+    monkeypatch.setattr(teamsbot, "RECIPIENT_CHANGES_KEPT", 1)
+    store.apply({third: None})
+    assert store.changes_since(seq) is None
+    store.close()
+
+
+def test_sync_follows_another_workers_changes(tmp_path):
+    path = str(tmp_path / "recipients.db")
+    recipients = make_recipients(4)
+    first, second, third, fourth = recipients
+
+    async def run():
+        writer = RecipientRegistry(SqliteRecipientStore(path), save_delay=0)
+        for conversation_id, recipient_info in recipients.items():
+            writer.put(conversation_id, recipient_info)
+        await writer.flush()
+        reader = RecipientRegistry(SqliteRecipientStore(path), save_delay=0)
+        version = reader.version
+
+        writer.remove(first)
+        writer.quarantine(second)
+        writer.put(third, {**recipients[third], "display_name": "Renamed"})
+        await writer.flush()
+        # A change this worker hasn't saved yet wins over what the other worker wrote
+        reader.put(third, {**recipients[third], "display_name": "Local"})
+        applied = await reader.sync()
+
+        assert sorted(applied) == [first, second]
+        assert sorted(reader) == [third, fourth]
+        assert reader[third]["display_name"] == "Local"
+        assert second in reader.quarantined
+        assert reader.version > version
+        assert await reader.sync() == {}
+
+    asyncio.run(run())
+
+
+def test_sync_catches_up_from_the_store_when_the_log_was_trimmed(tmp_path, monkeypatch):
+    path = str(tmp_path / "recipients.db")
+    recipients = make_recipients(5)
+
+    async def run():
+        writer = RecipientRegistry(SqliteRecipientStore(path), save_delay=0)
+        for conversation_id, recipient_info in recipients.items():
+            writer.put(conversation_id, recipient_info)
+        await writer.flush()
+        reader = RecipientRegistry(SqliteRecipientStore(path), save_delay=0)
+
+        monkeypatch.setattr(teamsbot, "RECIPIENT_CHANGES_KEPT", 1)
+        for conversation_id in list(recipients)[:3]:
+            writer.remove(conversation_id)
+        await writer.flush()
+        applied = await reader.sync()
+        assert sorted(conversation_id for conversation_id, info in applied.items() if info is None) == \
+            sorted(list(recipients)[:3])
+        assert sorted(reader) == sorted(list(recipients)[3:])
+        assert reader.change_seq == writer.store.last_change()
+
+    asyncio.run(run())
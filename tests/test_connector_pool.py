@@ -0,0 +1,91 @@
+import asyncio
+import json
+import socket
+
+import pytest
+from aiohttp import ClientConnectorError, ClientPayloadError, ServerDisconnectedError
+from aiohttp.test_utils import TestServer
+from fake_connector import FakeConnector
+from synthetic import make_recipients
+
+from teamsbot import ConnectorError, ConnectorPool, _build_conversation_reference, _is_retryable
+
+
+class Response:
+    def __init__(self, status, reason="", headers=None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+
+def references(service_url, count=3):
+    return [_build_conversation_reference(recipient_info)
+            for recipient_info in make_recipients(count, service_url=service_url).values()]
+
+
+def test_connector_error_message_has_the_status_and_error_code():
+    body = json.dumps({"error": {"code": "BotNotInConversationRoster", "message": "Not a member"}}).encode()
+    error = ConnectorError(Response(403, "Forbidden"), body)
+    assert str(error) == "Bot Connector returned 403 Forbidden: BotNotInConversationRoster: Not a member"
+    assert str(ConnectorError(Response(502, "Bad Gateway"), b"<html>oops</html>")).endswith(": <html>oops</html>")
+
+
+@pytest.mark.parametrize("status, retryable", [(429, True), (500, True), (503, True), (400, False), (403, False)])
+def test_throttling_and_server_errors_are_retried(status, retryable):
+    assert _is_retryable(ConnectorError(Response(status), b"{}")) is retryable
+
+
+@pytest.mark.parametrize("error", [asyncio.TimeoutError(), ServerDisconnectedError(), ClientPayloadError("cut off")])
+def test_failures_after_the_request_went_out_are_not_retried(error):
+    assert not _is_retryable(error)
+
+
+def test_sends_reuse_one_session_per_service_url():
+    async def run():
+        connector = FakeConnector()
+        async with TestServer(connector.create_app()) as server:
+            pool = ConnectorPool("", "")
+            await pool.start()
+            try:
+                for conversation_ref in references(str(server.make_url("/"))):
+                    await pool.post(conversation_ref, b'{"type": "message", "text": "hello"}')
+                stats = pool.stats()
+            finally:
+                await pool.stop()
+        assert connector.accepted == 3
+        assert connector.last_activity == {"type": "message", "text": "hello"}
+        assert (stats["sessions"], stats["misses"], stats["hits"]) == (1, 1, 2)
+
+    asyncio.run(run())
+
+
+def test_error_responses_raise_connector_errors():
+    async def run():
+        async with TestServer(FakeConnector(gone_rate=1.0).create_app()) as server:
+            pool = ConnectorPool("", "")
+            try:
+                with pytest.raises(ConnectorError) as raised:
+                    await pool.post(references(str(server.make_url("/")), 1)[0], b"{}")
+            finally:
+                await pool.stop()
+        assert raised.value.response.status == 403
+        assert not _is_retryable(raised.value)
+
+    asyncio.run(run())
+
+
+def test_failing_to_connect_is_retried():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def run():
+        pool = ConnectorPool("", "")
+        try:
+            with pytest.raises(ClientConnectorError) as raised:
+                await pool.post(references(f"http://127.0.0.1:{port}/", 1)[0], b"{}")
+        finally:
+            await pool.stop()
+        return raised.value
+
+    assert _is_retryable(asyncio.run(run()))
@@ -0,0 +1,67 @@
+import asyncio
+
+from teamsbot import AdaptiveRateLimiter, DeliveryEngine
+
+UNLIMITED = AdaptiveRateLimiter(global_rate=1e6, tenant_rate=1e6, conversation_rate=1e6, conversation_burst=1e6)
+
+
+def make_recipients(count, service_urls=("https://smba.example/amer/",)):
+    return {
+        f"conversation-{i}": {"display_name": f"Chat {i}", "service_url": service_urls[i % len(service_urls)]}
+        for i in range(count)
+    }
+
+
+def deliver(recipients, engine_options=None, send_options=None, fail=()):
+    """Deliver with a send that sleeps briefly; returns (result, peak sends in flight overall and per service_url)"""
+    in_flight = {"total": 0}
+    peaks = {"total": 0}
+
+    async def send_one(conversation_id, recipient_info):
+        service_url = recipient_info["service_url"]
+        for key in ("total", service_url):
+            in_flight[key] = in_flight.get(key, 0) + 1
+            peaks[key] = max(peaks.get(key, 0), in_flight[key])
+        try:
+            await asyncio.sleep(0.002)
+            if conversation_id in fail:
+                raise ValueError("rejected")
+        finally:
+            for key in ("total", service_url):
+                in_flight[key] -= 1
+
+    async def run():
+        engine = DeliveryEngine(rate_limiter=UNLIMITED, **(engine_options or {}))
+        return await engine.deliver(recipients, send_one, **(send_options or {}))
+
+    return asyncio.run(run()), peaks
+
+
+def test_every_recipient_is_sent_with_bounded_concurrency():
+    result, peaks = deliver(make_recipients(60), {"max_concurrency": 5})
+    assert result["sent_count"] == 60
+    assert result["failed_count"] == 0
+    assert sorted(entry["conversation_id"] for entry in result["sent_to"]) == sorted(make_recipients(60))
+    assert peaks["total"] == 5
+
+
+def test_broadcast_concurrency_caps_below_the_global_limit():
+    result, peaks = deliver(make_recipients(20), {"max_concurrency": 10}, {"concurrency": 2})
+    assert result["sent_count"] == 20
+    assert peaks["total"] == 2
+
+
+def test_each_service_url_has_its_own_limit():
+    service_urls = ("https://smba.example/amer/", "https://smba.example/emea/")
+    result, peaks = deliver(make_recipients(40, service_urls), {"max_concurrency": 10, "max_per_service_url": 3})
+    assert result["sent_count"] == 40
+    assert all(peaks[service_url] == 3 for service_url in service_urls)
+    assert peaks["total"] == 6
+
+
+def test_failures_are_reported_without_stopping_the_broadcast():
+    result, _ = deliver(make_recipients(10), fail={"conversation-3"})
+    assert result["sent_count"] == 9
+    assert result["failed_count"] == 1
+    assert result["errors"] == ["Failed to send to Chat 3: rejected"]
+    assert result["latency_ms"]["count"] == 9
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from teamsbot import CompiledMessage, DigestBuffer
+
+
+def buffer_and_stop(max_messages, max_bytes, texts, conversation_ids=("a", "b")):
+    """Buffer each text for the conversations, then stop; returns (sent_early per add, delivered batches)"""
+    delivered = []
+
+    async def deliver(batch):
+        delivered.append({conversation_id: message for conversation_id, (message, _) in batch.items()})
+
+    async def run():
+        digests = DigestBuffer(deliver, max_messages=max_messages, max_bytes=max_bytes)
+        await digests.start()
+        sent_early = [
+            digests.add(conversation_ids, CompiledMessage(text), (text, None, None), 60.0) for text in texts
+        ]
+        await digests.stop()
+        return sent_early
+
+    return asyncio.run(run()), delivered
+
+
+def test_full_by_count_is_sent_early():
+    sent_early, delivered = buffer_and_stop(2, 1000, ["one", "two", "three"])
+    assert sent_early == [0, 2, 0]
+    assert len(delivered) == 2
+
+
+def test_overflow_by_size_is_sent_early():
+    # The second message doesn't fit next to the first, so the first goes alone and the second starts a digest
+    sent_early, delivered = buffer_and_stop(10, 10, ["x" * 6, "y" * 6])
+    assert sent_early == [0, 2]
+    assert [sorted(batch) for batch in delivered] == [["a", "b"], ["a", "b"]]
+
+
+def test_oversized_message_counts_each_conversation_once():
+    # Overflows the buffered digest and then fills its own
+    sent_early, delivered = buffer_and_stop(10, 10, ["x" * 6, "y" * 20])
+    assert sent_early == [0, 2]
+    assert sum(len(batch) for batch in delivered) == 4
+
+
+def test_digest_is_sent_when_its_window_ends():
+    delivered = []
+
+    async def deliver(batch):
+        delivered.append({conversation_id: hashes for conversation_id, (_, hashes) in batch.items()})
+
+    async def run():
+        digests = DigestBuffer(deliver, max_messages=10, max_bytes=1000)
+        await digests.start()
+        first, second = CompiledMessage("one"), CompiledMessage("two")
+        digests.add(["a", "b"], first, ("one", None, None), 0.03)
+        digests.add(["a"], second, ("two", None, None), 60.0)
+        await asyncio.sleep(0.1)
+        assert len(digests) == 0
+        await digests.stop()
+        return first.content_hash, second.content_hash
+
+    first, second = asyncio.run(run())
+    # The later message rides along in the digest of the first one's window
+    assert delivered == [{"a": [first, second], "b": [first]}]
+
+
+def test_buffered_sends_arrive_as_one_activity_per_conversation(serve_bot):
+    async def run():
+        async with serve_bot(3) as (server, client, connector, recipients):
+            for text in ("Build 1 passed", "Build 2 passed"):
+                async with client.post("/send", json={"message": text, "digest_window": 60}) as response:
+                    assert response.status == 202
+                    result = await response.json()
+                assert (result["status"], result["digested"], result["sent_early"]) == ("buffered", 3, 0)
+            assert connector.received == 0
+
+            await server.digests.stop()
+            assert connector.received == 3
+            assert connector.last_activity["text"] == "Build 1 passed\n\nBuild 2 passed"
+
+            # Digests count as sends of each buffered message for dedup_window
+            async with client.post("/send", json={"message": "Build 2 passed", "dedup_window": 60}) as response:
+                assert (await response.json())["deduplicated"] == 3
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("options", [
+    {"digest_window": -1},
+    {"digest_window": True},
+    {"digest_window": 60, "stream": "ndjson"},
+    {"digest_window": 60, "background": True},
+    {"digest_window": 60, "send_at": "2099-01-01T00:00:00Z"},
+])
+def test_invalid_digest_requests_are_rejected(serve_bot, options):
+    async def run():
+        async with serve_bot(2) as (server, client, connector, recipients):
+            async with client.post("/send", json={"message": "hello", **options}) as response:
+                assert response.status == 400
+                assert "digest_window" in (await response.json())["error"]
+
+    asyncio.run(run())
+
+
+def test_stop_right_after_buffering_sends_the_digests():
+    delivered = []
+
+    async def deliver(batch):
+        delivered.append(sorted(batch))
+
+    async def run():
+        digests = DigestBuffer(deliver, max_messages=10, max_bytes=1000)
+        await digests.start()
+        digests.add(["a"], CompiledMessage("one"), ("one", None, None), 60.0)
+        await asyncio.sleep(0.01)
+        # Wakes the timer task, which is waiting for the first digest's window, just as it's cancelled
+        digests.add(["b"], CompiledMessage("two"), ("two", None, None), 60.0)
+        await asyncio.sleep(0)
+        await asyncio.wait_for(digests.stop(), 1)
+
+    asyncio.run(run())
+    assert delivered == [["a", "b"]]
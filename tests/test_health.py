@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from fake_connector import FakeConnector
+from synthetic import make_recipients
+
+import teamsbot
+from teamsbot import ConnectorError, JsonRecipientStore, RecipientHealth, RecipientRegistry
+
+
+class Response:
+    def __init__(self, status):
+        self.status = status
+        self.reason = ""
+        self.headers = {}
+
+
+def failure(status):
+    return ConnectorError(Response(status), b'{"error": {"code": "Failed", "message": "failed"}}')
+
+
+def health_for(tmp_path, count=3):
+    registry = RecipientRegistry(JsonRecipientStore(str(tmp_path / "recipients.json")))
+    for conversation_id, recipient_info in make_recipients(count).items():
+        registry.put(conversation_id, recipient_info)
+    return RecipientHealth(registry), list(registry)
+
+
+def test_repeated_403s_open_the_circuit(tmp_path):
+    health, (gone, flaky, fine) = health_for(tmp_path)
+    for _ in range(teamsbot.HEALTH_CIRCUIT_FAILURES):
+        health.record(gone, failure(403))
+        health.record(flaky, failure(503))
+    health.record(fine, None)
+
+    admitted, skipped, pruned = health.admit(dict(health.registry.items()))
+    assert skipped == [gone]
+    assert sorted(admitted) == sorted([flaky, fine])
+    assert pruned == []
+    record = health.registry[gone]["health"]
+    assert (record["error_class"], record["status_code"]) == ("gone", 403)
+    assert record["consecutive_failures"] == teamsbot.HEALTH_CIRCUIT_FAILURES
+
+
+def test_a_different_kind_of_failure_starts_a_new_run(tmp_path):
+    health, (conversation_id, *_) = health_for(tmp_path)
+    for _ in range(5):
+        health.record(conversation_id, failure(500))
+    health.record(conversation_id, failure(404))
+    record = health.registry[conversation_id]["health"]
+    assert (record["error_class"], record["consecutive_failures"]) == ("gone", 1)
+    assert RecipientHealth.state(health.registry[conversation_id], time.time()) == "ok"
+
+
+def test_successes_only_write_when_they_clear_failures(tmp_path):
+    health, (conversation_id, *_) = health_for(tmp_path)
+    version = health.registry.version
+    health.record(conversation_id, None)
+    assert health.registry.version == version
+    assert "health" not in health.registry[conversation_id]
+
+    health.record(conversation_id, failure(403))
+    record = health.registry[conversation_id]["health"]
+    assert record["last_success_at"] is not None
+    health.record(conversation_id, None)
+    assert health.registry[conversation_id]["health"]["consecutive_failures"] == 0
+    assert health.registry.version == version + 2
+
+
+def test_open_circuits_are_probed_then_quarantined(tmp_path):
+    health, (conversation_id, *_) = health_for(tmp_path)
+    for _ in range(teamsbot.HEALTH_CIRCUIT_FAILURES):
+        health.record(conversation_id, failure(403))
+    recipient_info = health.registry[conversation_id]
+    now = time.time()
+    assert RecipientHealth.state(recipient_info, now) == "open"
+    assert RecipientHealth.state(recipient_info, now + teamsbot.HEALTH_PROBE_INTERVAL) == "probe"
+    assert RecipientHealth.state(recipient_info, now + teamsbot.HEALTH_QUARANTINE_AFTER) == "quarantine"
+
+
+def test_pruning_quarantines_until_reinstalled(tmp_path, monkeypatch):
+    health, (conversation_id, *others) = health_for(tmp_path)
+    for _ in range(teamsbot.HEALTH_CIRCUIT_FAILURES):
+        health.record(conversation_id, failure(403))
+    monkeypatch.setattr(teamsbot, "HEALTH_QUARANTINE_AFTER", 0)
+
+    assert health.prune() == 1
+    assert conversation_id not in health.registry
+    assert conversation_id in health.registry.quarantined
+    assert health.registry.quarantined[conversation_id]["health"]["quarantined_at"]
+    assert sorted(health.registry.index.match([], [], [], [], [])) == sorted(others)
+    assert health.prune() == 0
+
+    # Reinstalling the bot brings the recipient back
+    health.registry.put(conversation_id, make_recipients(1)[conversation_id])
+    assert conversation_id in health.registry
+    assert conversation_id not in health.registry.quarantined
+
+
+def test_broadcasts_skip_conversations_that_keep_answering_403(serve_bot):
+    async def run():
+        async with serve_bot(4, connector=FakeConnector(gone_rate=1.0)) as (server, client, connector, recipients):
+            for _ in range(teamsbot.HEALTH_CIRCUIT_FAILURES):
+                async with client.post("/send", json={"message": "hello"}) as response:
+                    assert len((await response.json())["errors"]) == 4
+            async with client.post("/send", json={"message": "hello"}) as response:
+                result = await response.json()
+            assert result["skipped"] == 4
+            assert connector.received == 4 * teamsbot.HEALTH_CIRCUIT_FAILURES
+
+    asyncio.run(run())
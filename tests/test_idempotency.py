@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from teamsbot import IdempotencyCache, RecentSends
+
+
+def test_a_repeated_key_waits_for_the_first_result():
+    async def run():
+        cache = IdempotencyCache(path=None)
+        state, entry = await cache.claim("key", "fingerprint")
+        assert state == "new"
+        repeat_state, repeat_entry = await cache.claim("key", "fingerprint")
+        assert repeat_state == "existing"
+        assert not repeat_entry["result"].done()
+        cache.complete("key", entry, 200, b"{}")
+        assert await repeat_entry["result"] == (200, b"{}")
+        assert await cache.claim("key", "other fingerprint") == ("mismatch", None)
+
+    asyncio.run(run())
+
+
+def test_an_abandoned_key_is_processed_again():
+    async def run():
+        cache = IdempotencyCache(path=None)
+        state, entry = await cache.claim("key", "fingerprint")
+        waiting = (await cache.claim("key", "fingerprint"))[1]
+        cache.abandon("key", entry, 500, b"failed")
+        assert await waiting["result"] == (500, b"failed")
+        assert (await cache.claim("key", "fingerprint"))[0] == "new"
+
+    asyncio.run(run())
+
+
+def test_expired_results_are_forgotten():
+    async def run():
+        cache = IdempotencyCache(ttl=0, path=None)
+        state, entry = await cache.claim("key", "fingerprint")
+        cache.complete("key", entry, 200, b"{}")
+        assert (await cache.claim("key", "fingerprint"))[0] == "new"
+
+    asyncio.run(run())
+
+
+def test_only_completed_entries_are_evicted():
+    async def run():
+        cache = IdempotencyCache(max_entries=2, path=None)
+        first = (await cache.claim("first", "fingerprint"))[1]
+        await cache.claim("second", "fingerprint")
+        assert await cache.claim("third", "fingerprint") == ("full", None)
+
+        cache.complete("first", first, 200, b"{}")
+        assert (await cache.claim("third", "fingerprint"))[0] == "new"
+        # "second" is still in flight, so it was kept and "first" was evicted
+        assert (await cache.claim("second", "fingerprint"))[0] == "existing"
+        assert (await cache.claim("first", "fingerprint")) == ("full", None)
+
+    asyncio.run(run())
+
+
+def test_results_survive_a_restart(tmp_path):
+    path = str(tmp_path / "idempotency.db")
+
+    async def first_run():
+        cache = IdempotencyCache(path=path)
+        entry = (await cache.claim("key", "fingerprint"))[1]
+        cache.complete("key", entry, 200, b'{"sent_count": 3}')
+        await cache.close()
+
+    async def restart(fingerprint):
+        cache = IdempotencyCache(path=path)
+        try:
+            state, entry = await cache.claim("key", fingerprint)
+            return state, entry and await entry["result"]
+        finally:
+            await cache.close()
+
+    asyncio.run(first_run())
+    assert asyncio.run(restart("fingerprint")) == ("existing", (200, b'{"sent_count": 3}'))
+    assert asyncio.run(restart("other fingerprint")) == ("mismatch", None)
+
+
+def test_recent_sends_expire_and_stay_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    recent = RecentSends(max_entries=2)
+    recent.record("a", "hash")
+    recent.record("b", "hash")
+    assert recent.sent_within("a", "hash", 60)
+    assert not recent.sent_within("a", "other hash", 60)
+    now[0] += 60
+    assert not recent.sent_within("a", "hash", 60)
+
+    recent.record("c", "hash")
+    assert not recent.sent_within("a", "hash", 3600)
+    assert recent.sent_within("b", "hash", 3600)
+
+
+def test_a_retried_send_is_replayed_not_resent(serve_bot):
+    async def run():
+        async with serve_bot(5) as (server, client, connector, recipients):
+            headers = {"Idempotency-Key": "retry-1"}
+            async with client.post("/send", json={"message": "hello"}, headers=headers) as response:
+                first = await response.read()
+            async with client.post("/send", json={"message": "hello"}, headers=headers) as response:
+                assert response.status == 200
+                assert await response.read() == first
+            async with client.post("/send", json={"message": "changed"}, headers=headers) as response:
+                assert response.status == 422
+            assert connector.received == 5
+
+    asyncio.run(run())
+
+
+def test_dedup_window_skips_conversations_that_just_got_the_message(serve_bot):
+    async def run():
+        async with serve_bot(4) as (server, client, connector, recipients):
+            request = {"message": "hello", "dedup_window": 60}
+            async with client.post("/send", json=request) as response:
+                assert (await response.json())["sent_count"] == 4
+            async with client.post("/send", json=request) as response:
+                result = await response.json()
+            assert result["sent_count"] == 0
+            assert result["deduplicated"] == 4
+            async with client.post("/send", json={**request, "message": "something else"}) as response:
+                assert (await response.json())["sent_count"] == 4
+
+    asyncio.run(run())
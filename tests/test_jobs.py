@@ -0,0 +1,95 @@
+import asyncio
+
+from teamsbot import JobQueue
+
+
+def test_job_runs_and_records_progress(tmp_path):
+    async def run():
+        jobs = JobQueue(str(tmp_path / "jobs.db"))
+
+        async def run_job(job_id, payload):
+            assert payload == {"message": "hi"}
+            pending = await jobs.pending_recipients(job_id)
+            await jobs.record_results(job_id, [(pending[0], "sent", None), (pending[1], "failed", "rejected")])
+            await jobs.record_results(job_id, [(pending[2], "skipped", "Recipient no longer registered")])
+
+        await jobs.start(run_job)
+        job_id = await jobs.enqueue({"message": "hi"}, ["a", "b", "c"])
+        await jobs._queue.join()
+        job = await jobs.get(job_id)
+        await jobs.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job["status"] == "completed"
+    assert (job["total"], job["pending"], job["sent"], job["failed"], job["skipped"]) == (3, 0, 1, 1, 1)
+    assert job["errors"] == [{"conversation_id": "b", "error": "rejected"}]
+
+
+def test_failed_run_is_reported(tmp_path):
+    async def run():
+        jobs = JobQueue(str(tmp_path / "jobs.db"))
+
+        async def run_job(job_id, payload):
+            raise RuntimeError("connector down")
+
+        await jobs.start(run_job)
+        job_id = await jobs.enqueue({}, ["a"])
+        await jobs._queue.join()
+        job = await jobs.get(job_id)
+        await jobs.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert (job["status"], job["job_error"], job["pending"]) == ("failed", "connector down", 1)
+
+
+def test_unfinished_job_resumes_with_undelivered_recipients(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def interrupted():
+        jobs = JobQueue(path)
+        job_id = await jobs.enqueue({}, ["a", "b", "c"])
+        await jobs.set_status(job_id, "running")
+        await jobs.record_results(job_id, [("a", "sent", None)])
+        jobs.close()
+        return job_id
+
+    async def restarted():
+        jobs = JobQueue(path)
+        resumed = {}
+
+        async def run_job(job_id, payload):
+            resumed[job_id] = await jobs.pending_recipients(job_id)
+
+        await jobs.start(run_job)
+        await jobs._queue.join()
+        await jobs.stop()
+        return resumed
+
+    job_id = asyncio.run(interrupted())
+    assert asyncio.run(restarted()) == {job_id: ["b", "c"]}
+
+
+def test_shared_database_resumes_only_the_owners_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def run():
+        first = JobQueue(path, owner="worker-0")
+        second = JobQueue(path, owner="worker-1")
+        job_id = await first.enqueue({}, ["a"])
+        resumed = []
+
+        async def run_job(job_id, payload):
+            resumed.append(job_id)
+
+        await second.start(run_job)
+        await second._queue.join()
+        visible = await second.get(job_id)
+        await second.stop()
+        first.close()
+        return resumed, visible
+
+    resumed, visible = asyncio.run(run())
+    assert resumed == []
+    assert visible["status"] == "queued"
@@ -0,0 +1,43 @@
+import asyncio
+import json
+
+from fake_connector import FakeConnector
+from load_test import regressions, row
+
+
+def test_row_reports_throughput_and_percentiles():
+    result = row("status", 100, 50, 1, 2.0, [float(ms) for ms in range(1, 101)])
+    assert result["scenario"] == "status"
+    assert result["ops_per_s"] == 25.0
+    assert result["errors"] == 1
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+
+def test_only_throughput_drops_beyond_the_tolerance_are_regressions(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"rows": [
+        {"scenario": "send_fanout", "size": 10, "ops_per_s": 100.0},
+        {"scenario": "send_fanout", "size": 1000, "ops_per_s": 1000.0},
+        {"scenario": "status", "size": 10000, "ops_per_s": None},
+    ]}))
+    rows = [
+        {"scenario": "send_fanout", "size": 10, "ops_per_s": 85.0},
+        {"scenario": "send_fanout", "size": 1000, "ops_per_s": 700.0},
+        {"scenario": "status", "size": 10000, "ops_per_s": 1.0},
+        {"scenario": "targets", "size": 10000, "ops_per_s": 1.0},
+    ]
+    found = regressions(rows, baseline, 0.2)
+    assert found == ["send_fanout (size 1000): 700.0 ops/s, baseline 1000.0"]
+
+
+def test_conversations_the_connector_answers_403_fail_every_time(serve_bot):
+    async def run():
+        connector = FakeConnector(gone_rate=0.3)
+        async with serve_bot(100, connector=connector) as (server, client, connector, recipients):
+            async with client.post("/send", json={"message": "hello"}) as response:
+                result = await response.json()
+            assert len(result["errors"]) == connector.gone > 0
+            assert result["sent_count"] == connector.accepted == 100 - connector.gone
+            assert connector.stats()["received"] == 100
+
+    asyncio.run(run())
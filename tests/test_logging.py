@@ -0,0 +1,42 @@
+import json
+import logging
+import queue
+
+from teamsbot import JsonLogFormatter, _LogQueueHandler
+
+
+def record(msg, *args, exc_info=None, **extra):
+    record = logging.LogRecord("teamsbot", logging.WARNING, __file__, 1, msg, args, exc_info)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_lines_carry_the_message_and_extra_fields():
+    entry = json.loads(JsonLogFormatter().format(record("Sent %d of %d", 9, 10, failed=1, latency_ms={"p50": 2.5})))
+    assert entry["message"] == "Sent 9 of 10"
+    assert (entry["level"], entry["logger"]) == ("WARNING", "teamsbot")
+    assert entry["failed"] == 1
+    assert entry["latency_ms"] == {"p50": 2.5}
+    assert "args" not in entry and "msg" not in entry
+
+
+def test_queued_records_are_resolved_before_crossing_threads():
+    try:
+        raise ValueError("broken")
+    except ValueError as e:
+        original = record("Failed for %s", "Chat", exc_info=(type(e), e, e.__traceback__), conversation_id="a")
+
+    handler = _LogQueueHandler(queue.SimpleQueue())
+    prepared = handler.prepare(original)
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ("Failed for Chat", None, None)
+    assert original.args == ("Chat",)  # The caller's record is left alone
+
+    entry = json.loads(JsonLogFormatter().format(prepared))
+    assert entry["message"] == "Failed for Chat"
+    assert entry["conversation_id"] == "a"
+    assert "ValueError: broken" in entry["exception"]
+
+
+def test_values_that_are_not_json_are_logged_as_text():
+    entry = json.loads(JsonLogFormatter().format(record("Workers", workers={"worker-0"})))
+    assert entry["workers"] == "{'worker-0'}"
@@ -0,0 +1,59 @@
+import asyncio
+
+from teamsbot import MetricCounter, MetricGauge, MetricHistogram
+
+
+def test_counter_keeps_a_series_per_label_value():
+    counter = MetricCounter("sends_total", "Sends", ("outcome",))
+    counter.inc("ok")
+    counter.inc("ok", amount=2)
+    counter.inc("failed")
+    assert counter.render() == [
+        "# HELP sends_total Sends",
+        "# TYPE sends_total counter",
+        'sends_total{outcome="ok"} 3',
+        'sends_total{outcome="failed"} 1',
+    ]
+
+
+def test_gauge_without_labels_has_a_bare_sample():
+    gauge = MetricGauge("queue_depth", "Depth")
+    gauge.set(4)
+    gauge.set(2)
+    assert gauge.render()[2:] == ["queue_depth 2"]
+
+
+def test_label_values_are_escaped():
+    counter = MetricCounter("errors_total", "Errors", ("reason",))
+    counter.inc('bad "quote"\\\n')
+    assert counter.render()[2] == 'errors_total{reason="bad \\"quote\\"\\\\\\n"} 1'
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = MetricHistogram("latency_seconds", "Latency", ("route",), buckets=(0.5, 0.1))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.observe(value, "send")
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{route="send",le="0.1"} 2',
+        'latency_seconds_bucket{route="send",le="0.5"} 3',
+        'latency_seconds_bucket{route="send",le="+Inf"} 4',
+        'latency_seconds_sum{route="send"} 2.45',
+        'latency_seconds_count{route="send"} 4',
+    ]
+
+
+def test_metrics_endpoint_reports_recipients_and_sends(serve_bot):
+    async def run():
+        async with serve_bot(12) as (server, client, connector, recipients):
+            async with client.post("/send", json={"message": "hello"}) as response:
+                assert response.status == 200
+            async with client.get("/metrics") as response:
+                assert response.status == 200
+                assert response.content_type == "text/plain"
+                text = await response.text()
+            lines = text.splitlines()
+            assert "teamsbot_recipients 12" in lines
+            assert "# TYPE teamsbot_send_seconds histogram" in lines
+            assert any(line.startswith('teamsbot_broadcast_recipients_total{stage="sent"}') for line in lines)
+
+    asyncio.run(run())
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+import teamsbot
+from teamsbot import AdaptiveRateLimiter, DeliveryEngine, TokenBucket, _backoff_delay, _retry_after
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after="0"):
+        super().__init__("Too many requests")
+        self.response = SimpleNamespace(status=429, headers={"Retry-After": retry_after})
+
+
+def test_bucket_allows_its_burst_then_paces():
+    bucket = TokenBucket(10.0, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_throttle_halves_the_rate_down_to_a_floor_and_recover_restores_it():
+    bucket = TokenBucket(20.0)
+    bucket.throttle()
+    assert bucket.rate == 10.0
+    for _ in range(10):
+        bucket.throttle()
+    assert bucket.rate == bucket.min_rate == 1.0
+    for _ in range(200):
+        bucket.recover()
+    assert bucket.rate == 20.0
+
+
+def test_retry_after_pauses_the_bucket():
+    bucket = TokenBucket(100.0)
+    bucket.throttle(retry_after=5)
+    assert bucket.reserve() == pytest.approx(5, abs=0.1)
+    assert not bucket.is_idle()
+
+
+def test_throttling_slows_every_scope_of_the_send():
+    limiter = AdaptiveRateLimiter(global_rate=40, tenant_rate=20, conversation_rate=1, conversation_burst=7)
+    limiter.on_throttled("tenant-a", "conversation-1", 2.0)
+    stats = limiter.stats()
+    assert stats["global_rate"] == 20
+    assert stats["tenant_rates"] == {"tenant-a": 10}
+    assert stats["throttled_total"] == 1
+    assert limiter._conversation("conversation-1").reserve() == pytest.approx(2.0, abs=0.1)
+    limiter.on_success("tenant-a", "conversation-1")
+    assert limiter.stats()["global_rate"] > 20
+
+
+def test_retry_after_header_as_seconds_or_date():
+    assert _retry_after(Throttled("3")) == 3.0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= _retry_after(Throttled(later)) <= 30
+    assert _retry_after(Throttled("soon")) is None
+    assert _retry_after(ValueError()) is None
+
+
+def test_backoff_grows_and_is_capped():
+    assert all(0 <= _backoff_delay(0) <= teamsbot.SEND_BACKOFF_BASE for _ in range(100))
+    assert all(0 <= _backoff_delay(30) <= teamsbot.SEND_BACKOFF_MAX for _ in range(100))
+    assert 4 <= _backoff_delay(0, retry_after=4) <= 4 + teamsbot.SEND_BACKOFF_BASE
+
+
+def test_throttled_send_is_retried():
+    calls = []
+
+    async def send_one(conversation_id, recipient_info):
+        calls.append(conversation_id)
+        if len(calls) < 3:
+            raise Throttled()
+
+    async def run():
+        engine = DeliveryEngine(rate_limiter=AdaptiveRateLimiter(global_rate=1000, tenant_rate=1000))
+        return await engine.deliver({"conversation-1": {"display_name": "Chat"}}, send_one)
+
+    result = asyncio.run(run())
+    assert result["sent_count"] == 1
+    assert (result["retries"], result["throttled"]) == (2, 2)
+    assert result["sent_to"][0]["attempts"] == 3
+
+
+def test_retries_give_up_after_the_limit():
+    async def send_one(conversation_id, recipient_info):
+        raise Throttled()
+
+    async def run():
+        engine = DeliveryEngine(rate_limiter=AdaptiveRateLimiter(global_rate=1000, tenant_rate=1000), max_retries=2)
+        return await engine.deliver({"conversation-1": {"display_name": "Chat"}}, send_one)
+
+    result = asyncio.run(run())
+    assert (result["failed_count"], result["retries"], result["throttled"]) == (1, 2, 3)
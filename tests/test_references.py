@@ -0,0 +1,45 @@
+from synthetic import make_recipients
+
+from teamsbot import JsonRecipientStore, RecipientRegistry
+
+RECIPIENTS = make_recipients(4, personal_every=2)
+
+
+def registry(tmp_path):
+    registry = RecipientRegistry(JsonRecipientStore(str(tmp_path / "recipients.json")))
+    for conversation_id, recipient_info in RECIPIENTS.items():
+        registry.put(conversation_id, recipient_info)
+    return registry
+
+
+def test_reference_is_built_from_the_stored_reference(tmp_path):
+    conversation_id, recipient_info = next(iter(RECIPIENTS.items()))
+    conversation_ref = registry(tmp_path).reference(conversation_id)
+    stored = recipient_info["conversation_reference"]
+    assert conversation_ref.service_url == stored["service_url"]
+    assert conversation_ref.conversation.id == conversation_id
+    assert conversation_ref.conversation.tenant_id == stored["conversation"]["tenant_id"]
+    assert conversation_ref.bot.id == stored["bot"]["id"]
+    assert conversation_ref.user.name == stored["user"]["name"]
+
+
+def test_reference_is_cached_until_the_recipient_changes(tmp_path):
+    recipients = registry(tmp_path)
+    conversation_id, recipient_info = next(iter(RECIPIENTS.items()))
+    conversation_ref = recipients.reference(conversation_id)
+    assert recipients.reference(conversation_id) is conversation_ref
+
+    moved = {**recipient_info, "conversation_reference": {
+        **recipient_info["conversation_reference"], "service_url": "https://smba.example/emea/"
+    }}
+    recipients.put(conversation_id, moved)
+    assert recipients.reference(conversation_id).service_url == "https://smba.example/emea/"
+
+
+def test_removed_recipient_still_gets_an_uncached_reference(tmp_path):
+    recipients = registry(tmp_path)
+    conversation_id, recipient_info = next(iter(RECIPIENTS.items()))
+    recipients.remove(conversation_id)
+    conversation_ref = recipients.reference(conversation_id, recipient_info)
+    assert conversation_ref.conversation.id == conversation_id
+    assert recipients.reference(conversation_id, recipient_info) is not conversation_ref
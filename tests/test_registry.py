@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+from synthetic import make_recipients
+from teamsbot import JsonRecipientStore, RecipientRegistry
+
+
+class CountingStore(JsonRecipientStore):
+    """JSON store that counts its writes and can fail the first few"""
+
+    def __init__(self, path, failures=0):
+        super().__init__(path)
+        self.writes = 0
+        self.failures = failures
+
+    def apply(self, changes):
+        self.writes += 1
+        if self.writes <= self.failures:
+            raise OSError("disk full")
+        super().apply(changes)
+
+
+def stored(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_burst_of_changes_is_saved_in_one_write(tmp_path):
+    path = str(tmp_path / "recipients.json")
+    recipients = make_recipients(10)
+
+    async def run():
+        store = CountingStore(path)
+        registry = RecipientRegistry(store, save_delay=0.05)
+        for conversation_id, recipient_info in recipients.items():
+            registry.put(conversation_id, recipient_info)
+        registry.remove(next(iter(recipients)))
+        writes_before = store.writes
+        await asyncio.sleep(0.2)
+        return writes_before, store.writes
+
+    assert asyncio.run(run()) == (0, 1)
+    assert sorted(stored(path)) == sorted(list(recipients)[1:])
+
+
+def test_failed_save_is_retried(tmp_path):
+    path = str(tmp_path / "recipients.json")
+    recipients = make_recipients(3)
+
+    async def run():
+        store = CountingStore(path, failures=1)
+        registry = RecipientRegistry(store, save_delay=0.05)
+        for conversation_id, recipient_info in recipients.items():
+            registry.put(conversation_id, recipient_info)
+        await asyncio.sleep(0.3)
+        return store.writes
+
+    assert asyncio.run(run()) == 2
+    assert stored(path) == recipients
+
+
+def test_flush_writes_pending_changes(tmp_path):
+    path = str(tmp_path / "recipients.json")
+    recipients = make_recipients(2)
+
+    async def run():
+        registry = RecipientRegistry(JsonRecipientStore(path), save_delay=60)
+        for conversation_id, recipient_info in recipients.items():
+            registry.put(conversation_id, recipient_info)
+        await registry.flush()
+
+    asyncio.run(run())
+    assert stored(path) == recipients
+
+
+def test_changes_outside_an_event_loop_are_saved_right_away(tmp_path):
+    path = str(tmp_path / "recipients.json")
+    recipients = make_recipients(1)
+    registry = RecipientRegistry(JsonRecipientStore(path))
+    conversation_id, recipient_info = next(iter(recipients.items()))
+    registry.put(conversation_id, recipient_info)
+    assert stored(path) == recipients
+
+
+def test_registry_loads_the_store_and_changes_its_etag(tmp_path):
+    path = str(tmp_path / "recipients.json")
+    recipients = make_recipients(5)
+    with open(path, 'w') as f:
+        json.dump(recipients, f)
+
+    registry = RecipientRegistry(JsonRecipientStore(path))
+    assert dict(registry) == recipients
+    etag = registry.etag
+    registry.remove(next(iter(recipients)))
+    assert registry.etag != etag
+    assert len(registry) == 4
@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import pytest
+
+from teamsbot import Scheduler
+
+
+def run_scheduler(path, schedules, wait, owner=None, fail=False):
+    """Start a Scheduler, add (send_at offset, every, count, until offset) schedules and let it run for wait seconds"""
+    runs = []
+
+    async def run_schedule(job_id, payload):
+        runs.append((job_id, payload))
+        return "nothing to send" if fail else None
+
+    async def run():
+        scheduler = Scheduler(path, owner=owner)
+        await scheduler.start(run_schedule)
+        now = time.time()
+        schedule_ids = []
+        for send_at, every, count, until in schedules:
+            schedule_ids.append(await scheduler.add({"message": f"schedule {len(schedule_ids)}"}, now + send_at,
+                                                    every, count, None if until is None else now + until, jitter=0))
+        await asyncio.sleep(wait)
+        stored = [await scheduler.get(schedule_id) for schedule_id in schedule_ids]
+        await scheduler.stop()
+        return stored
+
+    return asyncio.run(run()), runs
+
+
+def test_a_one_off_schedule_fires_once(tmp_path):
+    (schedule,), runs = run_scheduler(str(tmp_path / "jobs.db"), [(0.02, None, None, None)], 0.1)
+    assert runs == [(f"{schedule['schedule_id']}-1", {"message": "schedule 0"})]
+    assert schedule["status"] == "completed"
+    assert schedule["runs"] == 1
+    assert schedule["last_job_id"] == f"{schedule['schedule_id']}-1"
+    assert schedule["next_run_at"] is None
+
+
+def test_recurrence_stops_after_count_or_until(tmp_path):
+    (by_count, by_until, forever), runs = run_scheduler(
+        str(tmp_path / "jobs.db"),
+        [(0, 0.05, 3, None), (0, 0.05, None, 0.12), (0, 0.05, None, None)],
+        0.3
+    )
+    fired = [job_id.rsplit("-", 1)[0] for job_id, _ in runs]
+    assert fired.count(by_count["schedule_id"]) == 3
+    assert (by_count["status"], by_count["repeat"]["remaining"]) == ("completed", 0)
+    assert fired.count(by_until["schedule_id"]) == 3
+    assert by_until["status"] == "completed"
+    assert fired.count(forever["schedule_id"]) >= 4
+    assert forever["status"] == "scheduled"
+
+
+def test_failed_runs_are_recorded_without_a_job(tmp_path):
+    (schedule,), runs = run_scheduler(str(tmp_path / "jobs.db"), [(0, None, None, None)], 0.05, fail=True)
+    assert len(runs) == 1
+    assert schedule["last_error"] == "nothing to send"
+    assert schedule["last_job_id"] is None
+
+
+def test_cancelled_schedules_never_fire(tmp_path):
+    runs = []
+
+    async def run_schedule(job_id, payload):
+        runs.append(job_id)
+
+    async def run():
+        scheduler = Scheduler(str(tmp_path / "jobs.db"))
+        await scheduler.start(run_schedule)
+        schedule_id = await scheduler.add({}, time.time() + 0.03, jitter=0)
+        assert await scheduler.cancel(schedule_id)
+        assert not await scheduler.cancel(schedule_id)
+        await asyncio.sleep(0.08)
+        schedule = await scheduler.get(schedule_id)
+        await scheduler.stop()
+        return schedule
+
+    assert asyncio.run(run())["status"] == "cancelled"
+    assert runs == []
+
+
+def test_runs_missed_while_down_are_made_up_once_by_their_owner(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    runs = []
+
+    async def run_schedule(job_id, payload):
+        runs.append(job_id)
+
+    async def add(owner):
+        # Added while the timer isn't running, as if the bot had been down since
+        scheduler = Scheduler(path, owner=owner)
+        schedule_id = await scheduler.add({}, time.time() - 600, every=60, jitter=0)
+        scheduler.close()
+        return schedule_id
+
+    async def restart():
+        scheduler = Scheduler(path, owner="worker-1")
+        await scheduler.start(run_schedule)
+        await asyncio.sleep(0.05)
+        schedules = [await scheduler.get(schedule_id) for schedule_id in schedule_ids]
+        await scheduler.stop()
+        return schedules
+
+    schedule_ids = [asyncio.run(add("worker-1")), asyncio.run(add("worker-2"))]
+    mine, theirs = asyncio.run(restart())
+    assert runs == [f"{schedule_ids[0]}-1"]
+    assert mine["status"] == "scheduled" and mine["runs"] == 1
+    assert theirs["runs"] == 0
+
+
+@pytest.mark.parametrize("options, error", [
+    ({"repeat": {"every": 10}}, "repeat.every"),
+    ({"repeat": {"every": True}}, "repeat.every"),
+    ({"repeat": {"every": 60, "count": 0}}, "repeat.count"),
+    ({"repeat": {"every": 60, "count": True}}, "repeat.count"),
+    ({"repeat": {"every": 60, "until": "2000-01-01T00:00:00Z"}}, "repeat.until"),
+    ({"repeat": 60}, "repeat must be an object"),
+    ({"send_at": "2099-01-01T00:00:00Z", "jitter": -1}, "jitter"),
+    ({"send_at": "2099-01-01T00:00:00Z", "jitter": False}, "jitter"),
+    ({"send_at": "2099-01-01T00:00:00Z", "stream": "ndjson"}, "stream"),
+])
+def test_invalid_schedules_are_rejected(serve_bot, options, error):
+    async def run():
+        async with serve_bot(2) as (server, client, connector, recipients):
+            async with client.post("/send", json={"message": "later", **options}) as response:
+                assert response.status == 400
+                assert error in (await response.json())["error"]
+
+    asyncio.run(run())
+
+
+def test_scheduled_sends_are_listed_and_cancelled(serve_bot):
+    async def run():
+        async with serve_bot(2) as (server, client, connector, recipients):
+            request = {"message": "later", "send_at": "2099-01-01T00:00:00Z", "repeat": {"every": 3600, "count": 2}}
+            async with client.post("/send", json=request) as response:
+                assert response.status == 202
+                schedule = await response.json()
+            assert schedule["next_run_at"] == "2099-01-01T00:00:00+00:00"
+            assert schedule["repeat"]["remaining"] == 2
+
+            async with client.get("/schedules", params={"status": "scheduled"}) as response:
+                listed = (await response.json())["schedules"]
+            assert [item["schedule_id"] for item in listed] == [schedule["schedule_id"]]
+            async with client.delete(f"/schedules/{schedule['schedule_id']}") as response:
+                assert (await response.json())["status"] == "cancelled"
+            async with client.delete(f"/schedules/{schedule['schedule_id']}") as response:
+                assert response.status == 409
+            assert connector.received == 0
+
+    asyncio.run(run())
+
+
+def test_stop_right_after_adding_a_schedule_stops_the_timer(tmp_path):
+    async def run_schedule(job_id, payload):
+        pass
+
+    async def run():
+        scheduler = Scheduler(str(tmp_path / "jobs.db"))
+        await scheduler.start(run_schedule)
+        await asyncio.sleep(0.01)
+        # Wakes the timer task just as it's cancelled
+        await scheduler.add({}, time.time() + 60, jitter=0)
+        await asyncio.wait_for(scheduler.stop(), 1)
+
+    asyncio.run(run())
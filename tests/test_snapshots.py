@@ -0,0 +1,100 @@
+import asyncio
+
+from synthetic import make_recipients
+
+from teamsbot import JsonRecipientStore, RecipientRegistry, SqliteRecipientStore
+
+QUERIES = [([], ["personal"], [], [], []), ([], [], ["Team 1"], ["alerts"], []), ([], [], [], [], [])]
+
+
+def matches(registry):
+    return [sorted(registry.index.match(*query)) for query in QUERIES]
+
+
+def saved_registry(store, snapshot_path, count=40):
+    registry = RecipientRegistry(store, snapshot_path=snapshot_path)
+    for conversation_id, recipient_info in make_recipients(count, personal_every=4).items():
+        registry.put(conversation_id, recipient_info)
+    registry.quarantine(next(iter(registry)))
+    assert registry.save_snapshot()
+    return registry
+
+
+def test_snapshot_restores_recipients_and_index(tmp_path):
+    snapshot_path = str(tmp_path / "recipients.snapshot")
+    saved = saved_registry(SqliteRecipientStore(str(tmp_path / "recipients.db")), snapshot_path)
+
+    restored = RecipientRegistry(SqliteRecipientStore(str(tmp_path / "recipients.db")), snapshot_path=snapshot_path)
+    assert restored.loaded_from == "snapshot"
+    assert dict(restored.items()) == dict(saved.items())
+    assert restored.quarantined == saved.quarantined
+    assert matches(restored) == matches(saved)
+
+
+def test_snapshot_catches_up_with_later_store_changes(tmp_path):
+    path = str(tmp_path / "recipients.db")
+    snapshot_path = str(tmp_path / "recipients.snapshot")
+    saved = saved_registry(SqliteRecipientStore(path), snapshot_path)
+    removed, renamed = list(saved)[:2]
+
+    store = SqliteRecipientStore(path)
+    store.delete(removed)
+    store.put(renamed, {**saved[renamed], "display_name": "Renamed"})
+    restored = RecipientRegistry(store, snapshot_path=snapshot_path)
+    assert restored.loaded_from == "snapshot"
+    assert removed not in restored
+    assert restored[renamed]["display_name"] == "Renamed"
+    assert matches(restored) == matches(RecipientRegistry(SqliteRecipientStore(path)))
+
+
+def test_json_snapshot_is_only_used_while_the_file_is_unchanged(tmp_path):
+    path = str(tmp_path / "recipients.json")
+    snapshot_path = str(tmp_path / "recipients.snapshot")
+    saved_registry(JsonRecipientStore(path), snapshot_path)
+    assert RecipientRegistry(JsonRecipientStore(path), snapshot_path=snapshot_path).loaded_from == "snapshot"
+
+    # Without an event loop the change is written to recipients.json right away
+    registry = RecipientRegistry(JsonRecipientStore(path))
+    registry.remove(next(iter(registry)))
+    restored = RecipientRegistry(JsonRecipientStore(path), snapshot_path=snapshot_path)
+    assert restored.loaded_from == "store"
+    assert len(restored) == len(registry)
+
+
+def test_damaged_snapshots_are_ignored(tmp_path):
+    path = str(tmp_path / "recipients.db")
+    snapshot_path = tmp_path / "recipients.snapshot"
+    saved = saved_registry(SqliteRecipientStore(path), str(snapshot_path))
+    data = bytearray(snapshot_path.read_bytes())
+    data[-1] ^= 0xFF
+    snapshot_path.write_bytes(bytes(data))
+
+    restored = RecipientRegistry(SqliteRecipientStore(path), snapshot_path=str(snapshot_path))
+    assert restored.loaded_from == "store"
+    assert dict(restored.items()) == dict(saved.items())
+
+
+def test_no_snapshot_is_taken_with_unsaved_changes(tmp_path):
+    async def run():
+        registry = RecipientRegistry(SqliteRecipientStore(str(tmp_path / "recipients.db")),
+                                     snapshot_path=str(tmp_path / "recipients.snapshot"))
+        registry.put(*next(iter(make_recipients(1).items())))
+        assert not registry.save_snapshot()
+        await registry.flush()
+        assert registry.save_snapshot()
+
+    asyncio.run(run())
+
+
+def test_ready_reports_the_startup_phases(serve_bot):
+    async def run():
+        async with serve_bot(5) as (server, client, connector, recipients):
+            async with client.get("/ready") as response:
+                assert response.status == 200
+                ready = await response.json()
+            assert ready["status"] == "ready"
+            assert ready["startup"]["recipients"] == 5
+            assert ready["startup"]["recipients_source"] == "store"
+            assert {"import", "recipients_load"} <= set(ready["startup"]["phases_ms"])
+
+    asyncio.run(run())
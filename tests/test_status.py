@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+
+def get_all_pages(client, path, limit):
+    """Follow next_cursor from the first page; returns every page's JSON"""
+    async def run():
+        pages = []
+        cursor = None
+        while True:
+            params = {"limit": str(limit)}
+            if cursor:
+                params["cursor"] = cursor
+            async with client.get(path, params=params) as response:
+                pages.append(await response.json())
+            cursor = pages[-1]["next_cursor"]
+            if cursor is None:
+                return pages
+    return run()
+
+
+@pytest.mark.parametrize("path", ["/status", "/targets"])
+def test_unchanged_recipients_answer_304(serve_bot, path):
+    async def run():
+        async with serve_bot(20) as (server, client, connector, recipients):
+            async with client.get(path) as response:
+                etag = response.headers["ETag"]
+                assert response.status == 200
+            async with client.get(path, headers={"If-None-Match": etag}) as response:
+                assert response.status == 304
+                assert response.headers["ETag"] == etag
+            server.bot.recipients.remove(next(iter(recipients)))
+            async with client.get(path, headers={"If-None-Match": etag}) as response:
+                assert response.status == 200
+                assert response.headers["ETag"] != etag
+
+    asyncio.run(run())
+
+
+def test_status_lists_everything_without_paging(serve_bot):
+    async def run():
+        async with serve_bot(150) as (server, client, connector, recipients):
+            async with client.get("/status") as response:
+                status = await response.json()
+            assert [recipient["conversation_id"] for recipient in status["recipients"]] == list(recipients)
+            assert status["next_cursor"] is None
+
+    asyncio.run(run())
+
+
+def test_status_pages_cover_every_filtered_recipient_once(serve_bot):
+    async def run():
+        async with serve_bot(60, personal_every=3) as (server, client, connector, recipients):
+            pages = await get_all_pages(client, "/status?tag=personal", 7)
+            listed = [recipient["conversation_id"] for page in pages for recipient in page["recipients"]]
+            assert listed == [conversation_id for conversation_id, recipient_info in recipients.items()
+                              if "personal" in recipient_info["tags"]]
+            assert all(page["matched_count"] == len(listed) for page in pages)
+
+            pages = await get_all_pages(client, "/targets", 25)
+            assert [conversation_id for page in pages for conversation_id in page["conversation_ids"]] == list(recipients)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "cursor=abc", "limit=100000"])
+def test_invalid_page_parameters_are_rejected(serve_bot, query):
+    async def run():
+        async with serve_bot(3) as (server, client, connector, recipients):
+            async with client.get(f"/status?{query}") as response:
+                assert response.status == 400
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from synthetic import make_recipients
+
+from teamsbot import JsonRecipientStore, SqliteRecipientStore, create_recipient_store
+
+RECIPIENTS = make_recipients(12, personal_every=4)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        store = JsonRecipientStore(str(tmp_path / "recipients.json"))
+    else:
+        store = SqliteRecipientStore(str(tmp_path / "recipients.db"))
+    store.apply(RECIPIENTS)
+    yield store
+    store.close()
+
+
+def test_get_put_delete(store):
+    conversation_id = next(iter(RECIPIENTS))
+    assert store.get(conversation_id) == RECIPIENTS[conversation_id]
+    store.put(conversation_id, {**RECIPIENTS[conversation_id], "tags": ["renamed"]})
+    assert store.get(conversation_id)["tags"] == ["renamed"]
+    assert store.delete(conversation_id)
+    assert not store.delete(conversation_id)
+    assert store.get(conversation_id) is None
+    assert store.count() == len(RECIPIENTS) - 1
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"tenant_id": "tenant-1"},
+    {"team_name": "Team 1"},
+    {"channel_name": "Alerts"},
+    {"tag": "personal"},
+    {"tenant_id": "tenant-0", "tag": "channel"},
+])
+def test_scan_and_count_filter_like_a_linear_scan(store, filters):
+    expected = {
+        conversation_id for conversation_id, recipient_info in RECIPIENTS.items()
+        if all(value in recipient_info.get("tags", []) if key == "tag" else recipient_info.get(key) == value
+               for key, value in filters.items())
+    }
+    assert {conversation_id for conversation_id, _ in store.scan(**filters)} == expected
+    assert store.count(**filters) == len(expected)
+
+
+def test_apply_removes_and_retags(store):
+    first, second = list(RECIPIENTS)[:2]
+    store.apply({first: None, second: {**RECIPIENTS[second], "tags": ["moved"]}})
+    assert store.get(first) is None
+    assert {conversation_id for conversation_id, _ in store.scan(tag="moved")} == {second}
+    assert second not in {conversation_id for conversation_id, _ in store.scan(tag="channel")}
+
+
+def test_json_is_migrated_into_sqlite_only_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("recipients.json", "w") as f:
+        json.dump(RECIPIENTS, f)
+
+    store = create_recipient_store("sqlite")
+    assert store.count() == len(RECIPIENTS)
+    store.apply({conversation_id: None for conversation_id in RECIPIENTS})
+    store.close()
+
+    # Recipients removed since don't come back from the old file
+    store = create_recipient_store("sqlite")
+    assert store.count() == 0
+    store.close()
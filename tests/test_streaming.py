@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from teamsbot import AdaptiveRateLimiter, DeliveryEngine
+
+
+def test_ndjson_stream_has_a_result_per_recipient_and_a_summary(serve_bot):
+    async def run():
+        async with serve_bot(30) as (server, client, connector, recipients):
+            async with client.post("/send", json={"message": "hello", "stream": "ndjson"}) as response:
+                assert response.status == 200
+                assert response.content_type == "application/x-ndjson"
+                events = [json.loads(line) for line in (await response.text()).splitlines()]
+            assert events[0]["event"] == "start"
+            assert events[0]["filtered_recipients"] == 30
+            results = [event for event in events if event["event"] == "result"]
+            assert sorted(event["conversation_id"] for event in results) == sorted(recipients)
+            assert all(event["status"] == "sent" for event in results)
+            summary = events[-1]
+            assert summary["event"] == "summary"
+            assert summary["sent_count"] == 30
+            assert "sent_to" not in summary and "errors" not in summary
+
+    asyncio.run(run())
+
+
+def test_sse_stream_names_each_event(serve_bot):
+    async def run():
+        async with serve_bot(3) as (server, client, connector, recipients):
+            async with client.post("/send", json={"message": "hello", "stream": "sse"}) as response:
+                assert response.content_type == "text/event-stream"
+                blocks = (await response.text()).strip().split("\n\n")
+            names = [block.splitlines()[0] for block in blocks]
+            assert names == ["event: start"] + ["event: result"] * 3 + ["event: summary"]
+            assert json.loads(blocks[-1].splitlines()[1][len("data: "):])["sent_count"] == 3
+
+    asyncio.run(run())
+
+
+def test_pending_results_bounds_recipients_waiting_on_a_slow_reader():
+    recipients = {f"conversation-{i}": {"service_url": "https://smba.example/amer/"} for i in range(40)}
+    waiting = {"now": 0, "peak": 0}
+
+    async def send_one(conversation_id, recipient_info):
+        waiting["now"] += 1
+        waiting["peak"] = max(waiting["peak"], waiting["now"])
+
+    async def on_result(conversation_id, error, entry):
+        await asyncio.sleep(0.001)
+        waiting["now"] -= 1
+
+    async def run():
+        engine = DeliveryEngine(rate_limiter=AdaptiveRateLimiter(global_rate=1e6, tenant_rate=1e6,
+                                                                 conversation_rate=1e6, conversation_burst=1e6))
+        return await engine.deliver(recipients, send_one, on_result=on_result, collect=False, pending_results=4)
+
+    result = asyncio.run(run())
+    assert result["sent_count"] == 40
+    assert "sent_to" not in result and "errors" not in result
+    assert waiting["peak"] == 4
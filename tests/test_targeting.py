@@ -0,0 +1,66 @@
+import pytest
+from synthetic import make_recipients
+from targeting_benchmark import linear_filter, queries
+
+from teamsbot import TargetingIndex
+
+RECIPIENTS = make_recipients(3000, personal_every=10)
+
+
+def indexed(recipients):
+    index = TargetingIndex()
+    for conversation_id, recipient_info in recipients.items():
+        index.add(conversation_id, recipient_info)
+    return index
+
+
+@pytest.mark.parametrize("name,query", sorted(queries(RECIPIENTS).items()))
+def test_match_agrees_with_the_linear_filter(name, query):
+    assert indexed(RECIPIENTS).match(*query) == list(linear_filter(RECIPIENTS, *query))
+
+
+def test_index_follows_updates_and_removals():
+    recipients = dict(RECIPIENTS)
+    index = indexed(recipients)
+    moved, removed = list(recipients)[1:3]
+    recipients[moved] = {**recipients[moved], "team_name": "Renamed Team", "tags": ["moved"]}
+    index.add(moved, recipients[moved])
+    del recipients[removed]
+    index.remove(removed)
+
+    for query in [*queries(recipients).values(), ([], ["moved"], ["renamed"], [], [])]:
+        assert index.match(*query) == list(linear_filter(recipients, *query))
+    assert index.facets()["teams"]["Renamed Team"] == 1
+
+
+def test_select_requires_every_filter():
+    selected = indexed(RECIPIENTS).select(tag="channel", team="team 1", tenant_id="tenant-1")
+    assert selected == {
+        conversation_id for conversation_id, recipient_info in RECIPIENTS.items()
+        if "channel" in recipient_info["tags"] and "team 1" in recipient_info["team_name"].lower()
+        and recipient_info["tenant_id"] == "tenant-1"
+    }
+    assert indexed(RECIPIENTS).select() is None
+
+
+@pytest.mark.parametrize("selection", [None, {"tag": "personal"}, {"tag": "channel"}])
+def test_pages_cover_every_match_once_in_registry_order(selection):
+    index = indexed(RECIPIENTS)
+    selected = index.select(**selection) if selection else None
+    pages = []
+    after = -1
+    while after is not None:
+        page, after = index.page(selected, after, 250)
+        pages.extend(page)
+    expected = [conversation_id for conversation_id in RECIPIENTS if selected is None or conversation_id in selected]
+    assert pages == expected
+
+
+def test_page_cursor_survives_changes_before_it():
+    recipients = make_recipients(10)
+    index = indexed(recipients)
+    first_page, after = index.page(None, -1, 4)
+    index.remove(first_page[0])
+    index.add("19:new@thread.tacv2", make_recipients(1, start=100)["19:synthetic100@thread.tacv2"])
+    second_page, _ = index.page(None, after, 4)
+    assert second_page == list(recipients)[4:8]
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from teamsbot import CompiledMessage
+
+RECIPIENT = {"team_name": "Platform", "display_name": "Ada"}
+
+
+def rendered_card(card):
+    body = json.loads("{" + CompiledMessage(card=card).render(RECIPIENT) + "}")
+    return body["attachments"][0]["content"]
+
+
+def text_block(text):
+    return {"type": "AdaptiveCard", "version": "1.4", "body": [{"type": "TextBlock", "text": text}]}
+
+
+def test_card_fields_are_personalized():
+    card = rendered_card(text_block("Hello {display_name} of {team_name}"))
+    assert card["body"][0]["text"] == "Hello Ada of Platform"
+
+
+def test_card_date_functions_pass_through():
+    text = "Due {{DATE(2026-10-17T09:00:00Z, SHORT)}} at {{TIME(2026-10-17T09:00:00Z)}} for {team_name}"
+    card = rendered_card(text_block(text))
+    assert card["body"][0]["text"] == (
+        "Due {{DATE(2026-10-17T09:00:00Z, SHORT)}} at {{TIME(2026-10-17T09:00:00Z)}} for Platform"
+    )
+
+
+def test_card_literal_json_braces_pass_through():
+    for text in ('{"status": "ok"}', "{", "}", "{}", "{unknown}", "{team_name", "{{team_name}}", "{team_name:>10}"):
+        assert rendered_card(text_block(text))["body"][0]["text"] == text
+
+
+def test_card_template_expressions_pass_through():
+    text = "${team_name} and ${$root.title}"
+    assert rendered_card(text_block(text))["body"][0]["text"] == text
+
+
+def test_marker_like_text_is_not_a_field():
+    text = "\x00team_name\x00 {team_name}"
+    message = CompiledMessage(text=text, card=text_block(text))
+    body = json.loads("{" + message.render(RECIPIENT) + "}")
+    assert body["text"] == text
+    assert body["attachments"][0]["content"]["body"][0]["text"] == "\x00team_name\x00 Platform"
+
+
+def test_content_hash_is_stable():
+    card = text_block("Hello {display_name}")
+    assert CompiledMessage(card=card).content_hash == CompiledMessage(card=card).content_hash
+    assert CompiledMessage(card=card).content_hash != CompiledMessage(card=text_block("Hello")).content_hash
+
+
+def test_message_and_template_are_rejected_together():
+    with pytest.raises(ValueError):
+        CompiledMessage(text="Hello", template="Hello {display_name}")
+
+
+def test_template_fields_are_escaped_into_the_body():
+    body = json.loads("{" + CompiledMessage(template='Hi {display_name}').render({"display_name": 'A "quoted"\nname'}) + "}")
+    assert body["text"] == 'Hi A "quoted"\nname'
+
+
+def test_merged_message_joins_texts_and_keeps_each_card():
+    message = CompiledMessage.merged([
+        ("Plain {braces}", None, None),
+        (None, "For {team_name}", text_block("Card one")),
+        (None, None, text_block("Card two {display_name}")),
+    ])
+    body = json.loads("{" + message.render(RECIPIENT) + "}")
+    assert body["text"] == "Plain {braces}\n\nFor Platform"
+    assert [attachment["content"]["body"][0]["text"] for attachment in body["attachments"]] == ["Card one", "Card two Ada"]
+
+
+def test_message_compiles_again_from_its_forwarded_contents():
+    for message in (CompiledMessage(template="Hello {display_name}", card=text_block("{team_name}")),
+                    CompiledMessage.merged([("one", None, None), (None, "two {team_name}", None)])):
+        forwarded = json.loads(json.dumps(message.contents))
+        assert CompiledMessage.from_contents(forwarded).content_hash == message.content_hash